@@ -8,9 +8,12 @@
 
 端点功能:
 1. POST /detect - 执行异常检测
-2. POST /predict - 时间序列预测
-3. GET /algorithms - 获取支持的算法列表
-4. GET /models/info - 获取模型信息
+2. POST /detect/batch - 多序列批量异常检测
+3. POST /detect/stream - 增量异常检测（只检测新数据点）
+4. POST /predict - 时间序列预测
+5. GET /algorithms - 获取支持的算法列表
+6. GET /models/info - 获取模型信息
+7. POST /models/train - 训练并持久化模型
 
 作者: AI监控团队
 版本: 2.0.0
@@ -21,16 +24,18 @@ from typing import List, Dict, Any, Optional
 
 from fastapi import APIRouter, HTTPException, Depends, Query, Body
 from fastapi.responses import JSONResponse
+import pandas as pd
 import structlog
 
 from app.models.schemas import (
     AnomalyDetectionRequest,
     AnomalyDetectionResponse,
+    BatchAnomalyDetectionResponse,
     AlgorithmType,
     APIResponse
 )
 from app.services.ai_service import AIAnomalyDetector
-from app.services.prometheus_service import PrometheusService
+from app.services.prometheus_registry import prometheus_services
 
 logger = structlog.get_logger(__name__)
 
@@ -39,7 +44,7 @@ router = APIRouter()
 
 # 服务实例（实际应用中应该使用依赖注入）
 ai_detector = AIAnomalyDetector()
-prometheus_service = PrometheusService()
+prometheus_service = prometheus_services.active()
 
 
 @router.post("/detect", response_model=AnomalyDetectionResponse)
@@ -73,35 +78,40 @@ async def detect_anomalies(
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=request.lookback_hours)
         
-        metrics_response = await prometheus_service.query_range(
+        metrics_result = await prometheus_service.query_range(
             query=request.metric_query,
             start_time=start_time,
             end_time=end_time,
-            step="1m"
+            step="1m",
+            columnar=True
         )
         
-        if not metrics_response.data:
+        if not metrics_result.series:
             raise HTTPException(
                 status_code=404,
                 detail=f"查询无数据: {request.metric_query}"
             )
         
         # 转换数据格式
-        time_series_data = []
-        for ts in metrics_response.data:
-            for point in ts.values:
-                time_series_data.append({
-                    "timestamp": point.timestamp.isoformat(),
-                    "value": point.value,
-                    "labels": point.labels
-                })
+        time_series_data = pd.concat(
+            [series.to_frame() for series in metrics_result.series],
+            ignore_index=True
+        )
+        
+        # 单序列查询可以复用 /models/train 训练好的模型
+        model_key = None
+        if len(metrics_result.series) == 1:
+            model_key = ai_detector.build_model_key(
+                request.metric_query, metrics_result.series[0].labels
+            )
         
         # 执行异常检测
         detection_result = await ai_detector.detect_anomalies(
             data=time_series_data,
             algorithm=request.algorithm,
             sensitivity=request.sensitivity,
-            threshold=request.threshold
+            threshold=request.threshold,
+            model_key=model_key
         )
         
         logger.info(
@@ -129,6 +139,187 @@ async def detect_anomalies(
         )
 
 
+@router.post("/detect/batch", response_model=BatchAnomalyDetectionResponse)
+async def detect_anomalies_batch(
+    request: AnomalyDetectionRequest
+) -> BatchAnomalyDetectionResponse:
+    """
+    多序列批量异常检测
+    
+    查询返回的每条序列按标签集独立检测，所有序列在一次
+    向量化计算中完成评分。批量模式支持 z_score 和 statistical 算法。
+    
+    Args:
+        request: 异常检测请求参数
+        
+    Returns:
+        BatchAnomalyDetectionResponse: 各序列的检测结果
+        
+    Raises:
+        HTTPException: 当算法不支持或检测失败时返回错误信息
+    """
+    try:
+        if request.algorithm not in (AlgorithmType.Z_SCORE, AlgorithmType.STATISTICAL):
+            raise HTTPException(
+                status_code=400,
+                detail=f"批量模式不支持算法: {request.algorithm.value}，请使用 z_score 或 statistical"
+            )
+        
+        logger.info(
+            "收到批量异常检测请求",
+            algorithm=request.algorithm.value,
+            lookback_hours=request.lookback_hours,
+            sensitivity=request.sensitivity
+        )
+        
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=request.lookback_hours)
+        
+        series_matrix = await prometheus_service.query_range_matrix(
+            query=request.metric_query,
+            start_time=start_time,
+            end_time=end_time,
+            step="1m"
+        )
+        
+        if series_matrix.series_count == 0:
+            raise HTTPException(
+                status_code=404,
+                detail=f"查询无数据: {request.metric_query}"
+            )
+        
+        execution_start = datetime.now()
+        results = await ai_detector.detect_anomalies_batch(
+            values=series_matrix.values,
+            timestamps=series_matrix.timestamps,
+            series_labels=series_matrix.labels,
+            metric_names=series_matrix.metric_names,
+            algorithm=request.algorithm,
+            sensitivity=request.sensitivity,
+            threshold=request.threshold
+        )
+        execution_time = (datetime.now() - execution_start).total_seconds()
+        
+        anomalous_series = sum(1 for result in results if result.anomaly_count > 0)
+        
+        logger.info(
+            "批量异常检测完成",
+            algorithm=request.algorithm.value,
+            series_count=len(results),
+            anomalous_series=anomalous_series
+        )
+        
+        return BatchAnomalyDetectionResponse(
+            success=True,
+            message="批量异常检测执行成功",
+            results=results,
+            series_count=len(results),
+            anomalous_series=anomalous_series,
+            algorithm_used=request.algorithm,
+            execution_time=execution_time,
+            request_params=request
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("批量异常检测失败", error=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"批量异常检测执行失败: {str(e)}"
+        )
+
+
+@router.post("/detect/stream", response_model=BatchAnomalyDetectionResponse)
+async def detect_anomalies_stream(
+    request: AnomalyDetectionRequest
+) -> BatchAnomalyDetectionResponse:
+    """
+    增量异常检测
+    
+    每条序列的特征运行状态保存在服务端，只查询和检测自上次调用以来的新数据点，
+    适合规则调度和仪表盘按分钟轮询。首次调用使用完整的回看窗口预热。
+    支持 z_score 和已训练模型的 isolation_forest。
+    
+    Args:
+        request: 异常检测请求参数
+        
+    Returns:
+        BatchAnomalyDetectionResponse: 各序列新增点的检测结果
+        
+    Raises:
+        HTTPException: 当算法不支持或检测失败时返回错误信息
+    """
+    try:
+        if request.algorithm not in (AlgorithmType.Z_SCORE, AlgorithmType.ISOLATION_FOREST):
+            raise HTTPException(
+                status_code=400,
+                detail=f"增量模式不支持算法: {request.algorithm.value}，请使用 z_score 或 isolation_forest"
+            )
+        
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=request.lookback_hours)
+        
+        # 已有运行状态时只查询新数据
+        latest = ai_detector.streaming_features.latest_timestamp(request.metric_query)
+        if latest is not None:
+            start_time = max(start_time, pd.Timestamp(latest).to_pydatetime())
+        
+        metrics_result = await prometheus_service.query_range(
+            query=request.metric_query,
+            start_time=start_time,
+            end_time=end_time,
+            step="1m",
+            columnar=True
+        )
+        
+        execution_start = datetime.now()
+        results = []
+        for series in metrics_result.series:
+            results.append(await ai_detector.detect_anomalies_stream(
+                data=series.to_frame(),
+                metric_query=request.metric_query,
+                labels=series.labels,
+                metric_name=series.metric_name,
+                algorithm=request.algorithm,
+                sensitivity=request.sensitivity,
+                threshold=request.threshold
+            ))
+        execution_time = (datetime.now() - execution_start).total_seconds()
+        
+        anomalous_series = sum(1 for result in results if result.anomaly_count > 0)
+        
+        logger.info(
+            "增量异常检测完成",
+            algorithm=request.algorithm.value,
+            series_count=len(results),
+            new_points=sum(result.total_points for result in results),
+            anomalous_series=anomalous_series
+        )
+        
+        return BatchAnomalyDetectionResponse(
+            success=True,
+            message="增量异常检测执行成功",
+            results=results,
+            series_count=len(results),
+            anomalous_series=anomalous_series,
+            algorithm_used=request.algorithm,
+            execution_time=execution_time,
+            request_params=request
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("增量异常检测失败", error=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"增量异常检测执行失败: {str(e)}"
+        )
+
+
 @router.post("/predict")
 async def predict_future_values(
     metric_query: str = Body(..., description="PromQL查询语句"),
@@ -160,28 +351,25 @@ async def predict_future_values(
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=lookback_hours)
         
-        metrics_response = await prometheus_service.query_range(
+        metrics_result = await prometheus_service.query_range(
             query=metric_query,
             start_time=start_time,
             end_time=end_time,
-            step="1m"
+            step="1m",
+            columnar=True
         )
         
-        if not metrics_response.data:
+        if not metrics_result.series:
             raise HTTPException(
                 status_code=404,
                 detail=f"查询无历史数据: {metric_query}"
             )
         
         # 转换数据格式
-        time_series_data = []
-        for ts in metrics_response.data:
-            for point in ts.values:
-                time_series_data.append({
-                    "timestamp": point.timestamp.isoformat(),
-                    "value": point.value,
-                    "labels": point.labels
-                })
+        time_series_data = pd.concat(
+            [series.to_frame() for series in metrics_result.series],
+            ignore_index=True
+        )
         
         # 执行预测
         prediction_result = await ai_detector.predict_future_values(
@@ -309,6 +497,8 @@ async def train_model(
     训练AI模型
     
     基于历史数据训练指定算法的异常检测模型。
+    查询返回的每条序列单独训练一个模型，按查询和标签集持久化，
+    之后 /detect 对同一序列只做评分。
     
     Args:
         algorithm: 训练的算法类型
@@ -330,45 +520,57 @@ async def train_model(
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=training_hours)
         
-        metrics_response = await prometheus_service.query_range(
+        metrics_result = await prometheus_service.query_range(
             query=metric_query,
             start_time=start_time,
             end_time=end_time,
-            step="1m"
+            step="1m",
+            columnar=True
         )
         
-        if not metrics_response.data:
+        if not metrics_result.series:
             raise HTTPException(
                 status_code=404,
                 detail=f"查询无训练数据: {metric_query}"
             )
         
-        # 转换数据格式
-        training_data = []
-        for ts in metrics_response.data:
-            for point in ts.values:
-                training_data.append({
-                    "timestamp": point.timestamp.isoformat(),
-                    "value": point.value,
-                    "labels": point.labels
-                })
-        
-        # TODO: 实现模型训练逻辑
-        # model_path = await ai_detector.train_model(training_data, algorithm)
+        # 每条序列单独训练
+        trained_models = []
+        training_samples = 0
+        for series in metrics_result.series:
+            metadata = await ai_detector.train_model(
+                data=series.to_frame(),
+                metric_query=metric_query,
+                labels=series.labels,
+                algorithm=algorithm
+            )
+            
+            training_samples += len(series)
+            trained_models.append({
+                "model_key": metadata.preprocessing_params["model_key"],
+                "labels": series.labels,
+                "version": metadata.version,
+                "samples": metadata.data_shape[0],
+                "features": metadata.data_shape[1],
+                "performance_metrics": metadata.performance_metrics
+            })
         
         return APIResponse(
             success=True,
             message=f"模型训练完成，算法: {algorithm.value}",
             data={
                 "algorithm": algorithm.value,
-                "training_samples": len(training_data),
+                "training_samples": training_samples,
                 "training_duration": training_hours,
-                "model_status": "trained"
+                "model_status": "trained",
+                "models": trained_models
             }
         )
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("模型训练失败", error=str(e))
         raise HTTPException(
@@ -11,6 +11,9 @@
 2. POST /query_range - 范围查询
 3. GET /labels - 获取标签列表
 4. GET /metadata - 获取指标元数据
+5. GET /cache/stats - 范围查询缓存统计
+6. GET /backend/stats - Prometheus熔断和并发限制统计
+7. GET /stream - 实时指标推送（SSE），相同查询共享一次轮询
 
 作者: AI监控团队
 版本: 2.0.0
@@ -19,7 +22,8 @@
 from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from fastapi.responses import StreamingResponse
 import structlog
 
 from app.models.schemas import (
@@ -27,15 +31,17 @@ from app.models.schemas import (
     MetricsResponse,
     APIResponse
 )
-from app.services.prometheus_service import PrometheusService
+from app.core.config import settings
+from app.services.live_query_hub import format_event, live_query_hub
+from app.services.prometheus_registry import prometheus_services
 
 logger = structlog.get_logger(__name__)
 
 # 创建路由器
 router = APIRouter()
 
-# 服务实例
-prometheus_service = PrometheusService()
+# 服务实例 - 跟随当前Prometheus配置
+prometheus_service = prometheus_services.active()
 
 
 @router.post("/query_range", response_model=MetricsResponse)
@@ -46,7 +52,8 @@ async def query_range(request: MetricsQueryRequest) -> MetricsResponse:
             query=request.query,
             start_time=request.start_time,
             end_time=request.end_time,
-            step=request.step
+            step=request.step,
+            max_points=request.max_points
         )
         
         return response
@@ -119,4 +126,82 @@ async def get_metadata() -> APIResponse:
         )
     except Exception as e:
         logger.error("获取指标元数据失败", error=str(e))
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/cache/stats", response_model=APIResponse)
+async def get_cache_stats() -> APIResponse:
+    """获取范围查询缓存命中统计"""
+    try:
+        return APIResponse(
+            success=True,
+            message="获取查询缓存统计成功",
+            data=prometheus_service.get_cache_stats()
+        )
+    except Exception as e:
+        logger.error("获取查询缓存统计失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/backend/stats", response_model=APIResponse)
+async def get_backend_stats() -> APIResponse:
+    """获取Prometheus熔断状态、并发上限、排队时间和拒绝次数"""
+    try:
+        return APIResponse(
+            success=True,
+            message="获取后端保护统计成功",
+            data=prometheus_service.get_guard_stats()
+        )
+    except Exception as e:
+        logger.error("获取后端保护统计失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stream")
+async def stream_metrics(
+    request: Request,
+    query: str = Query(..., description="PromQL查询语句"),
+    step: str = Query("15s", description="查询步长")
+) -> StreamingResponse:
+    """
+    以Server-Sent Events推送查询的新数据点
+
+    历史窗口先通过 /query_range 获取一次，之后只推送新数据点（samples事件）；
+    相同查询和步长的所有连接共享同一个Prometheus轮询。
+    """
+    try:
+        subscription = live_query_hub.subscribe(query, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        logger.warning("实时查询订阅失败", query=query, error=str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def events():
+        try:
+            yield format_event("subscribed", {"query": query, "step": subscription.key[1]})
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=settings.LIVE_QUERY_HEARTBEAT_SECONDS)
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            live_query_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stream/stats", response_model=APIResponse)
+async def get_stream_stats() -> APIResponse:
+    """获取实时查询的上游查询数、订阅者数和丢弃事件数"""
+    try:
+        return APIResponse(
+            success=True,
+            message="获取实时查询统计成功",
+            data=live_query_hub.get_stats()
+        )
+    except Exception as e:
+        logger.error("获取实时查询统计失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
@@ -7,9 +7,10 @@
 支持Slack、邮件、Webhook等多种通知方式。
 
 端点功能:
-1. POST /send - 发送通知
+1. POST /send - 发送通知（queued=true 时写入发件箱异步投递）
 2. GET /statistics - 通知统计
 3. POST /test - 测试通知渠道
+4. POST /templates/reload - 重新加载通知模板
 
 作者: AI监控团队
 版本: 2.0.0
@@ -17,7 +18,7 @@
 
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 import structlog
 
 from app.models.schemas import (
@@ -25,21 +26,38 @@ from app.models.schemas import (
     NotificationResponse,
     APIResponse
 )
-from app.services.notification_service import NotificationService
+from app.services.notification_outbox import notification_outbox
+from app.services.notification_service import notification_service
 
 logger = structlog.get_logger(__name__)
 
 # 创建路由器
 router = APIRouter()
 
-# 服务实例
-notification_service = NotificationService()
-
 
 @router.post("/send", response_model=NotificationResponse)
-async def send_notification(request: NotificationRequest) -> NotificationResponse:
+async def send_notification(
+    request: NotificationRequest,
+    queued: bool = Query(False, description="写入发件箱异步投递，失败自动重试")
+) -> NotificationResponse:
     """发送通知"""
     try:
+        if queued:
+            notification_id = await notification_outbox.enqueue(
+                title=request.title,
+                message=request.message,
+                severity=request.severity,
+                channels=request.channels,
+                recipients=request.recipients,
+                metadata=request.metadata
+            )
+            return NotificationResponse(
+                success=True,
+                message="通知已进入发送队列",
+                notification_id=str(notification_id),
+                statuses={}
+            )
+        
         response = await notification_service.send_notification_request(request)
         return response
     except Exception as e:
@@ -52,6 +70,7 @@ async def get_statistics() -> APIResponse:
     """获取通知统计信息"""
     try:
         stats = await notification_service.get_statistics()
+        stats["outbox"] = notification_outbox.get_stats()
         
         return APIResponse(
             success=True,
@@ -76,4 +95,22 @@ async def test_channels() -> APIResponse:
         )
     except Exception as e:
         logger.error("测试通知渠道失败", error=str(e))
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/templates/reload", response_model=APIResponse)
+async def reload_templates() -> APIResponse:
+    """重新加载通知模板，编译失败时保留当前模板"""
+    try:
+        count = notification_service.templates.reload()
+        
+        return APIResponse(
+            success=True,
+            message="通知模板已重新加载",
+            data={"templates": count}
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("重新加载通知模板失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
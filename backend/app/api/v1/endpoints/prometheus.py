@@ -16,14 +16,14 @@ from typing import Dict, Any
 from fastapi import APIRouter, HTTPException, Body, Request
 from fastapi.responses import Response
 import structlog
-import aiohttp
-import asyncio
+import httpx
 
 from app.models.schemas import APIResponse
 from app.core.config import settings
-from app.services.prometheus_service import PrometheusService
+from app.services.prometheus_registry import prometheus_services
 from app.services.config_service import config_service
 from app.services.config_db_service import config_db_service
+from app.services.http_clients import http_clients
 
 logger = structlog.get_logger(__name__)
 
@@ -31,6 +31,16 @@ logger = structlog.get_logger(__name__)
 router = APIRouter()
 
 
+def _prometheus_client(config: Dict[str, Any]) -> httpx.AsyncClient:
+    """获取Prometheus配置对应的共享HTTP客户端"""
+    return http_clients.get(
+        config['url'],
+        username=config.get('username'),
+        password=config.get('password'),
+        timeout=config.get('timeout') or 30
+    )
+
+
 @router.post("/config/validate-name", response_model=APIResponse)
 async def validate_config_name(request_data: Dict[str, str] = Body(...)) -> APIResponse:
     """验证配置名称"""
@@ -53,6 +63,9 @@ async def set_current_config(config_id: int) -> APIResponse:
     """设置当前使用的Prometheus配置"""
     try:
         result = await config_db_service.set_current_prometheus_config(config_id)
+        if result["success"]:
+            # 立即切换到新配置的服务，旧连接池延迟关闭
+            await prometheus_services.refresh()
         
         return APIResponse(
             success=result["success"],
@@ -151,15 +164,8 @@ async def test_prometheus_connection_options(request: Request) -> Response:
 async def test_prometheus_connection(config: Dict[str, Any] = Body(..., description="Prometheus配置")) -> APIResponse:
     """测试Prometheus连接"""
     try:
-        # 创建临时Prometheus服务实例用于测试
-        prometheus_service = PrometheusService()
-        
-        # 如果提供了URL，则使用提供的URL
-        if "url" in config and config["url"]:
-            prometheus_service.base_url = config["url"].rstrip('/')
-        
-        # 执行健康检查
-        is_healthy = await prometheus_service.health_check()
+        # 使用临时服务执行健康检查，未提供URL时测试默认配置
+        is_healthy = await prometheus_services.probe(config)
         
         if is_healthy:
             return APIResponse(
@@ -216,6 +222,7 @@ async def restore_prometheus_config(config_id: int) -> APIResponse:
         
         # 设置为当前配置
         await config_db_service.set_current_prometheus_config(config_id)
+        await prometheus_services.refresh()
         
         return APIResponse(
             success=True,
@@ -335,27 +342,25 @@ async def execute_promql_query(query_params: Dict[str, Any] = Body(...)) -> APIR
             }
         
         # 发送查询请求
-        timeout = aiohttp.ClientTimeout(total=30)
         try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return APIResponse(
-                            success=True,
-                            message="查询执行成功",
-                            data=result
-                        )
-                    else:
-                        error_text = await response.text()
-                        logger.error("Prometheus查询失败", status=response.status, error=error_text)
-                        raise HTTPException(status_code=response.status, detail=f"Prometheus查询失败: {error_text}")
-        except aiohttp.ClientError as e:
-            logger.error("连接Prometheus失败", error=str(e))
-            raise HTTPException(status_code=503, detail=f"无法连接到Prometheus服务器: {str(e)}")
-        except asyncio.TimeoutError:
+            response = await _prometheus_client(config).get(url, params=params)
+            if response.status_code == 200:
+                result = response.json()
+                return APIResponse(
+                    success=True,
+                    message="查询执行成功",
+                    data=result
+                )
+            else:
+                error_text = response.text
+                logger.error("Prometheus查询失败", status=response.status_code, error=error_text)
+                raise HTTPException(status_code=response.status_code, detail=f"Prometheus查询失败: {error_text}")
+        except httpx.TimeoutException:
             logger.error("Prometheus查询超时")
             raise HTTPException(status_code=504, detail="Prometheus查询超时")
+        except httpx.HTTPError as e:
+            logger.error("连接Prometheus失败", error=str(e))
+            raise HTTPException(status_code=503, detail=f"无法连接到Prometheus服务器: {str(e)}")
         
     except Exception as e:
         logger.error("PromQL查询失败", error=str(e))
@@ -375,19 +380,16 @@ async def get_prometheus_metrics() -> APIResponse:
         prometheus_url = config['url'].rstrip('/')
         url = f"{prometheus_url}/api/v1/label/__name__/values"
         
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return APIResponse(
-                        success=True,
-                        message="获取指标列表成功",
-                        data=result
-                    )
-                else:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=response.status, detail=error_text)
+        response = await _prometheus_client(config).get(url)
+        if response.status_code == 200:
+            result = response.json()
+            return APIResponse(
+                success=True,
+                message="获取指标列表成功",
+                data=result
+            )
+        else:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
         
     except Exception as e:
         logger.error("获取指标列表失败", error=str(e))
@@ -407,19 +409,16 @@ async def get_prometheus_targets() -> APIResponse:
         prometheus_url = config['url'].rstrip('/')
         url = f"{prometheus_url}/api/v1/targets"
         
-        timeout = aiohttp.ClientTimeout(total=30)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return APIResponse(
-                        success=True,
-                        message="获取监控目标成功",
-                        data=result
-                    )
-                else:
-                    error_text = await response.text()
-                    raise HTTPException(status_code=response.status, detail=error_text)
+        response = await _prometheus_client(config).get(url)
+        if response.status_code == 200:
+            result = response.json()
+            return APIResponse(
+                success=True,
+                message="获取监控目标成功",
+                data=result
+            )
+        else:
+            raise HTTPException(status_code=response.status_code, detail=response.text)
         
     except Exception as e:
         logger.error("获取监控目标失败", error=str(e))
@@ -10,13 +10,13 @@ import asyncio
 import time
 from datetime import datetime, timedelta
 import os
-import socket
-import requests
+import httpx
 from urllib.parse import urlparse
 import platform
 import subprocess
 
 from app.models.schemas import APIResponse
+from app.services.http_clients import http_clients
 
 logger = structlog.get_logger(__name__)
 
@@ -177,16 +177,25 @@ def get_system_info() -> Dict[str, Any]:
         return {}
 
 
-def check_service_health(service_name: str, port: int) -> Dict[str, Any]:
+async def _port_open(port: int, timeout: float = 1.0) -> bool:
+    """非阻塞检查本机端口是否可连接"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection('localhost', port), timeout=timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def check_service_health(service_name: str, port: int) -> Dict[str, Any]:
     """检查服务健康状态"""
     try:
-        # 基本端口检查 - 减少超时时间
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)  # 减少到1秒
-        result = sock.connect_ex(('localhost', port))
-        sock.close()
-        
-        if result != 0:
+        # 基本端口检查 - 1秒超时，不阻塞事件循环
+        if not await _port_open(port):
             return {
                 "status": "stopped",
                 "health": "unhealthy",
@@ -204,21 +213,21 @@ def check_service_health(service_name: str, port: int) -> Dict[str, Any]:
                 
         elif service_name == "前端服务" and port == 3000:
             try:
-                response = requests.get("http://localhost:3000", timeout=2)
+                response = await http_clients.get("http://localhost:3000", timeout=2).get("http://localhost:3000")
                 if response.status_code != 200:
                     health_status = "degraded"
                     message = f"前端服务响应异常: {response.status_code}"
-            except requests.RequestException:
+            except httpx.HTTPError:
                 health_status = "degraded"
                 message = "前端服务检查失败"
                 
         elif service_name == "Prometheus" and port == 9090:
             try:
-                response = requests.get("http://localhost:9090/-/healthy", timeout=2)
+                response = await http_clients.get("http://localhost:9090", timeout=2).get("http://localhost:9090/-/healthy")
                 if response.status_code != 200:
                     health_status = "degraded"
                     message = f"Prometheus健康检查失败: {response.status_code}"
-            except requests.RequestException:
+            except httpx.HTTPError:
                 health_status = "degraded"
                 message = "Prometheus连接失败"
         
@@ -329,7 +338,7 @@ async def get_services_status() -> APIResponse:
             for service_name, port in service_ports.items():
                 try:
                     # 使用快速健康检查
-                    health_info = check_service_health(service_name, port)
+                    health_info = await check_service_health(service_name, port)
                     
                     # 在已获取的连接列表中查找端口
                     port_connection = None
@@ -87,12 +87,35 @@ class Settings(BaseSettings):
     PROMETHEUS_URL: AnyHttpUrl = Field(default="http://localhost:9090", env="PROMETHEUS_URL")
     PROMETHEUS_TIMEOUT: int = Field(default=30, env="PROMETHEUS_TIMEOUT")
     PROMETHEUS_MAX_RETRIES: int = Field(default=3, env="PROMETHEUS_MAX_RETRIES")
+    PROMETHEUS_CACHE_BLOCK_SECONDS: int = Field(default=3600, env="PROMETHEUS_CACHE_BLOCK_SECONDS")  # 范围查询缓存块长度
+    PROMETHEUS_CACHE_MAX_BLOCKS: int = Field(default=2048, env="PROMETHEUS_CACHE_MAX_BLOCKS")  # 最大缓存块数
+    PROMETHEUS_CACHE_SETTLE_SECONDS: int = Field(default=120, env="PROMETHEUS_CACHE_SETTLE_SECONDS")  # 早于此延迟的块视为不再变化
+    PROMETHEUS_MAX_POINTS_PER_REQUEST: int = Field(default=10000, env="PROMETHEUS_MAX_POINTS_PER_REQUEST")  # 单次范围请求每条序列的最大点数（Prometheus上限11000）
+    PROMETHEUS_RANGE_CONCURRENCY: int = Field(default=4, env="PROMETHEUS_RANGE_CONCURRENCY")  # 长区间分段请求的并发数
+    PROMETHEUS_BREAKER_FAILURE_THRESHOLD: int = Field(default=5, env="PROMETHEUS_BREAKER_FAILURE_THRESHOLD")  # 连续失败多少次后熔断
+    PROMETHEUS_BREAKER_RESET_SECONDS: float = Field(default=30.0, env="PROMETHEUS_BREAKER_RESET_SECONDS")  # 熔断冷却时间（秒），之后放行探测请求
+    PROMETHEUS_LIMIT_INITIAL: int = Field(default=10, env="PROMETHEUS_LIMIT_INITIAL")  # 自适应并发上限初始值
+    PROMETHEUS_LIMIT_MIN: int = Field(default=2, env="PROMETHEUS_LIMIT_MIN")  # 自适应并发上限最小值
+    PROMETHEUS_LIMIT_MAX: int = Field(default=50, env="PROMETHEUS_LIMIT_MAX")  # 自适应并发上限最大值
+    PROMETHEUS_LIMIT_QUEUE_TIMEOUT: float = Field(default=5.0, env="PROMETHEUS_LIMIT_QUEUE_TIMEOUT")  # 最长排队时间（秒），超时直接拒绝
+    PROMETHEUS_LIMIT_SLOW_SECONDS: float = Field(default=5.0, env="PROMETHEUS_LIMIT_SLOW_SECONDS")  # 响应超过该时间视为过载
+    PROMETHEUS_RETRY_BACKOFF_SECONDS: float = Field(default=0.2, env="PROMETHEUS_RETRY_BACKOFF_SECONDS")  # 瞬时故障重试的基础退避（秒），带抖动且最长2秒
+    LIVE_QUERY_MIN_INTERVAL: float = Field(default=5.0, env="LIVE_QUERY_MIN_INTERVAL")  # 实时查询最短轮询间隔（秒）
+    LIVE_QUERY_QUEUE_SIZE: int = Field(default=100, env="LIVE_QUERY_QUEUE_SIZE")  # 每个实时订阅者缓存的事件数，超出丢弃最旧的
+    LIVE_QUERY_MAX_QUERIES: int = Field(default=50, env="LIVE_QUERY_MAX_QUERIES")  # 同时轮询的唯一实时查询数上限
+    LIVE_QUERY_HEARTBEAT_SECONDS: float = Field(default=15.0, env="LIVE_QUERY_HEARTBEAT_SECONDS")  # SSE保活注释的发送间隔（秒）
+    HTTP_POOL_MAX_CONNECTIONS: int = Field(default=20, env="HTTP_POOL_MAX_CONNECTIONS")                # 每个共享HTTP客户端的最大连接数
+    HTTP_POOL_MAX_KEEPALIVE: int = Field(default=10, env="HTTP_POOL_MAX_KEEPALIVE")                    # 每个共享HTTP客户端保留的空闲连接数
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = Field(default=30.0, env="HTTP_POOL_KEEPALIVE_EXPIRY")         # 空闲连接保留时间（秒）
+    HTTP_POOL_HTTP2: bool = Field(default=True, env="HTTP_POOL_HTTP2")                                  # 安装了h2时启用HTTP/2
     
     # ===== AI/ML配置 =====
     AI_MODEL_PATH: Path = Field(default=Path("./models"), env="AI_MODEL_PATH")
     AI_BATCH_SIZE: int = Field(default=1000, env="AI_BATCH_SIZE")
     AI_CACHE_TTL: int = Field(default=300, env="AI_CACHE_TTL")  # 5分钟
     AI_MAX_WORKERS: int = Field(default=2, env="AI_MAX_WORKERS")
+    AI_MAX_QUEUE_DEPTH: int = Field(default=32, env="AI_MAX_QUEUE_DEPTH")  # 检测任务最大排队数
+    AI_QUEUE_TIMEOUT: float = Field(default=10.0, env="AI_QUEUE_TIMEOUT")  # 排队等待超时（秒）
     
     # ===== 通知服务配置 =====
     # Slack配置
@@ -106,11 +129,44 @@ class Settings(BaseSettings):
     SMTP_USERNAME: Optional[str] = Field(default=None, env="SMTP_USERNAME")
     SMTP_PASSWORD: Optional[str] = Field(default=None, env="SMTP_PASSWORD")
     SMTP_USE_TLS: bool = Field(default=True, env="SMTP_USE_TLS")
+    SMTP_POOL_SIZE: int = Field(default=4, env="SMTP_POOL_SIZE")                                          # SMTP连接池最大连接数
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = Field(default=100, env="SMTP_MAX_MESSAGES_PER_CONNECTION")  # 单连接最多发送的邮件数
+    SMTP_IDLE_TIMEOUT: float = Field(default=120.0, env="SMTP_IDLE_TIMEOUT")                            # 空闲连接保留时间（秒）
+    SMTP_KEEPALIVE_INTERVAL: float = Field(default=30.0, env="SMTP_KEEPALIVE_INTERVAL")                 # 复用前NOOP探活的空闲阈值（秒）
+    NOTIFICATION_CHANNEL_CONCURRENCY: int = Field(default=10, env="NOTIFICATION_CHANNEL_CONCURRENCY")  # 每个通知渠道的并发发送数
+    NOTIFICATION_WORKERS: int = Field(default=4, env="NOTIFICATION_WORKERS")                            # 通知投递工作协程数
+    NOTIFICATION_MAX_RETRIES: int = Field(default=5, env="NOTIFICATION_MAX_RETRIES")                    # 首次投递失败后的最大重试次数
+    NOTIFICATION_RETRY_BASE_SECONDS: float = Field(default=5.0, env="NOTIFICATION_RETRY_BASE_SECONDS")  # 重试退避基数（秒）
+    NOTIFICATION_RETRY_MAX_SECONDS: float = Field(default=600.0, env="NOTIFICATION_RETRY_MAX_SECONDS")  # 重试退避上限（秒）
+    NOTIFICATION_POLL_INTERVAL: float = Field(default=5.0, env="NOTIFICATION_POLL_INTERVAL")            # 发件箱轮询间隔（秒）
+    NOTIFICATION_CLAIM_LEASE_SECONDS: int = Field(default=300, env="NOTIFICATION_CLAIM_LEASE_SECONDS")  # 投递租约，进程崩溃后超时重新投递
+    NOTIFICATION_DIGEST_WINDOWS: Dict[str, float] = Field(
+        default={"slack": 30, "email": 60},
+        env="NOTIFICATION_DIGEST_WINDOWS",
+        description="通知合并窗口（秒），键为渠道或\"渠道:严重程度\"，如 {\"email\": 60, \"email:low\": 300}；严重告警不合并"
+    )
+    NOTIFICATION_DIGEST_MAX_ITEMS: int = Field(default=50, env="NOTIFICATION_DIGEST_MAX_ITEMS")          # 单条摘要最多包含的通知数
+    NOTIFICATION_TEMPLATES: Dict[str, str] = Field(
+        default={},
+        env="NOTIFICATION_TEMPLATES",
+        description="自定义通知模板，键为\"渠道/严重程度\"、\"default/严重程度\"或\"digest/渠道\"，值为Jinja2模板"
+    )
+    NOTIFICATION_TEMPLATE_DIR: Optional[Path] = Field(default=None, env="NOTIFICATION_TEMPLATE_DIR")     # 自定义模板目录，文件名如 slack/high.j2
+    NOTIFICATION_TEMPLATE_CACHE_DIR: Optional[Path] = Field(default=None, env="NOTIFICATION_TEMPLATE_CACHE_DIR")  # 模板字节码缓存目录，未设置时只在内存中缓存
     
     # ===== 规则引擎配置 =====
     RULES_CHECK_INTERVAL: int = Field(default=60, env="RULES_CHECK_INTERVAL")  # 秒
     MAX_ALERT_FREQUENCY: int = Field(default=300, env="MAX_ALERT_FREQUENCY")   # 5分钟
     RULE_EXECUTION_TIMEOUT: int = Field(default=30, env="RULE_EXECUTION_TIMEOUT") # 30秒
+    RULES_MAX_CONCURRENCY: int = Field(default=20, env="RULES_MAX_CONCURRENCY")  # 并发评估的条件数上限
+    RULES_CACHE_REFRESH_SECONDS: int = Field(default=5, env="RULES_CACHE_REFRESH_SECONDS")  # 规则缓存跨进程校验间隔
+    
+    # ===== 告警管道配置 =====
+    ALERT_BATCH_SIZE: int = Field(default=500, env="ALERT_BATCH_SIZE")                # 单批写入的最大告警数
+    ALERT_FLUSH_INTERVAL_MS: int = Field(default=200, env="ALERT_FLUSH_INTERVAL_MS")  # 批次最长等待时间（毫秒）
+    ALERT_QUEUE_MAXSIZE: int = Field(default=10000, env="ALERT_QUEUE_MAXSIZE")        # 告警队列容量
+    ALERT_WRITE_RETRIES: int = Field(default=3, env="ALERT_WRITE_RETRIES")            # 批量写入失败（如数据库繁忙）后的重试次数
+    ALERT_WRITE_RETRY_MS: int = Field(default=100, env="ALERT_WRITE_RETRY_MS")        # 写入重试的基础退避时间（毫秒），每次翻倍
     
     # ===== 性能配置 =====
     ENABLE_METRICS: bool = Field(default=True, env="ENABLE_METRICS")
@@ -125,6 +181,7 @@ class Settings(BaseSettings):
     # ===== 配置存储 =====
     CONFIG_DIR: str = Field(default="./config", env="CONFIG_DIR")  # json 或 text
     LOG_FILE: Optional[str] = Field(default=None, env="LOG_FILE")
+    CONFIG_CACHE_POLL_INTERVAL: float = Field(default=2.0, env="CONFIG_CACHE_POLL_INTERVAL")  # 检查其他进程配置变更的间隔（秒）
     
     # ===== Sentry配置 =====
     SENTRY_DSN: Optional[AnyHttpUrl] = Field(default=None, env="SENTRY_DSN")
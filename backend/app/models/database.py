@@ -78,6 +78,7 @@ class InspectionRule(Base):
     
     # 执行配置
     cooldown_minutes: Mapped[int] = mapped_column(Integer, default=15, nullable=False)
+    evaluation_interval_seconds: Mapped[Optional[int]] = mapped_column(Integer)  # 为空时使用全局检查间隔
     schedule_cron: Mapped[Optional[str]] = mapped_column(String(100))  # Cron表达式
     
     # 标签和分类
@@ -91,6 +92,7 @@ class InspectionRule(Base):
     execution_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     triggered_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     last_executed: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    last_triggered: Mapped[Optional[datetime]] = mapped_column(DateTime)
     
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -170,13 +172,14 @@ class Notification(Base):
     alert_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("alerts.id"))
     
     # 发送状态
-    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)  # pending, sent, failed
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)  # pending, sending, sent, failed, suppressed
     sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
     failed_reason: Mapped[Optional[str]] = mapped_column(Text)
     
     # 重试机制
     retry_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     max_retries: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
+    next_attempt_at: Mapped[Optional[datetime]] = mapped_column(DateTime)  # 下次投递时间，发送中为租约到期时间
     
     # 附加信息
     extra_data: Mapped[Dict] = mapped_column(JSON, default=dict)
@@ -192,6 +195,7 @@ class Notification(Base):
         Index('ix_notifications_severity', 'severity'),
         Index('ix_notifications_created_at', 'created_at'),
         Index('ix_notifications_alert_id', 'alert_id'),
+        Index('ix_notifications_status_next_attempt', 'status', 'next_attempt_at'),
     )
 
 
@@ -51,6 +51,12 @@ class RuleOperator(str, Enum):
     NOT_EQUAL = "!="
 
 
+class ConditionEvaluationMode(str, Enum):
+    """规则条件评估模式"""
+    LATEST = "latest"        # 各序列窗口内最新值的平均值
+    SUSTAINED = "sustained"  # 整个持续时间内都满足（大于类取窗口最小值，小于类取最大值）
+
+
 # ===== 基础模型 =====
 
 class BaseSchema(BaseModel):
@@ -147,6 +153,7 @@ class MetricsQueryRequest(BaseSchema):
     start_time: datetime = Field(description="开始时间")
     end_time: datetime = Field(description="结束时间")
     step: str = Field(default="1m", description="查询步长")
+    max_points: Optional[int] = Field(default=None, ge=2, le=11000, description="每条序列最多返回的点数，超出时自动放大步长")
     
     @field_validator('end_time')
     @classmethod
@@ -205,6 +212,26 @@ class AnomalyDetectionResponse(APIResponse):
     request_params: AnomalyDetectionRequest = Field(description="请求参数")
 
 
+class SeriesAnomalyResult(BaseSchema):
+    """单条时间序列的异常检测结果（批量模式）"""
+    metric_name: str = Field(description="指标名称")
+    labels: Dict[str, str] = Field(default_factory=dict, description="序列标签")
+    anomalies: List[AnomalyPoint] = Field(default_factory=list, description="异常点列表")
+    total_points: int = Field(ge=0, description="有效数据点数")
+    anomaly_count: int = Field(ge=0, description="异常点数量")
+    overall_score: Annotated[float, Field(ge=0.0, le=1.0)] = Field(description="整体异常分数")
+
+
+class BatchAnomalyDetectionResponse(APIResponse):
+    """批量异常检测响应"""
+    results: List[SeriesAnomalyResult] = Field(description="各序列检测结果")
+    series_count: int = Field(ge=0, description="序列总数")
+    anomalous_series: int = Field(ge=0, description="存在异常的序列数")
+    algorithm_used: AlgorithmType = Field(description="使用的算法")
+    execution_time: float = Field(ge=0, description="执行耗时")
+    request_params: AnomalyDetectionRequest = Field(description="请求参数")
+
+
 # ===== 规则引擎 =====
 
 class RuleCondition(BaseSchema):
@@ -213,6 +240,10 @@ class RuleCondition(BaseSchema):
     operator: RuleOperator = Field(description="比较操作符")
     threshold: float = Field(description="阈值")
     duration_minutes: Annotated[int, Field(ge=1, le=1440)] = Field(default=5, description="持续时间（分钟）")
+    evaluation_mode: ConditionEvaluationMode = Field(
+        default=ConditionEvaluationMode.LATEST, description="评估模式"
+    )
+    per_series: bool = Field(default=False, description="逐序列评估，任一序列满足即满足")
 
 
 class InspectionRuleCreate(BaseSchema):
@@ -226,6 +257,9 @@ class InspectionRuleCreate(BaseSchema):
         default=[NotificationChannel.EMAIL], description="通知渠道"
     )
     cooldown_minutes: Annotated[int, Field(ge=1, le=1440)] = Field(default=15, description="冷却时间（分钟）")
+    evaluation_interval_seconds: Optional[Annotated[int, Field(ge=10, le=86400)]] = Field(
+        default=None, description="评估间隔（秒），为空时使用全局检查间隔"
+    )
     tags: List[str] = Field(default_factory=list, description="标签")
 
 
@@ -233,6 +267,7 @@ class InspectionRule(InspectionRuleCreate, TimestampMixin):
     """巡检规则（完整信息）"""
     id: int = Field(description="规则ID")
     last_executed: Optional[datetime] = Field(default=None, description="上次执行时间")
+    last_triggered: Optional[datetime] = Field(default=None, description="上次触发时间")
     execution_count: int = Field(default=0, description="执行次数")
     triggered_count: int = Field(default=0, description="触发次数")
 
@@ -311,7 +346,7 @@ class DashboardData(BaseSchema):
 # ===== 导出所有模型 =====
 __all__ = [
     # 枚举
-    "AlertSeverity", "AlgorithmType", "NotificationChannel", "RuleOperator",
+    "AlertSeverity", "AlgorithmType", "NotificationChannel", "RuleOperator", "ConditionEvaluationMode",
     # 基础类
     "BaseSchema", "TimestampMixin", "APIResponse", "PaginatedResponse",
     # 健康检查
@@ -322,6 +357,7 @@ __all__ = [
     "MetricDataPoint", "TimeSeriesData", "MetricsQueryRequest", "MetricsResponse",
     # AI异常检测
     "AnomalyDetectionRequest", "AnomalyPoint", "AnomalyDetectionResult", "AnomalyDetectionResponse",
+    "SeriesAnomalyResult", "BatchAnomalyDetectionResponse",
     # 规则引擎
     "RuleCondition", "InspectionRuleCreate", "InspectionRule", "RuleExecutionResult", "RulesExecutionResponse",
     # 通知系统
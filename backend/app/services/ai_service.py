@@ -24,7 +24,9 @@ AI异常检测服务 - 智能监控预警系统核心AI引擎
 """
 
 import asyncio
+import hashlib
 import json
+import os
 import pickle
 import time
 from datetime import datetime, timedelta
@@ -51,9 +53,12 @@ from app.models.schemas import (
     AnomalyDetectionResult,
     AnomalyPoint,
     AlgorithmType,
-    AlertSeverity
+    AlertSeverity,
+    SeriesAnomalyResult
 )
 from app.core.config import settings
+from app.services.detection_executor import DetectionExecutor, detection_executor
+from app.services.streaming_features import StreamingFeatureRegistry, streaming_feature_registry
 
 # 忽略sklearn和pandas的警告信息，保持日志清洁
 warnings.filterwarnings('ignore', category=UserWarning)
@@ -79,6 +84,33 @@ class ModelMetadata:
     hyperparameters: Dict[str, Any]  # 超参数配置
     feature_names: List[str]         # 特征名称列表
     preprocessing_params: Dict[str, Any]  # 预处理参数
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的字典"""
+        return {
+            "algorithm": self.algorithm,
+            "version": self.version,
+            "trained_at": self.trained_at.isoformat(),
+            "data_shape": list(self.data_shape),
+            "performance_metrics": self.performance_metrics,
+            "hyperparameters": self.hyperparameters,
+            "feature_names": self.feature_names,
+            "preprocessing_params": self.preprocessing_params
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ModelMetadata":
+        """从 to_dict 生成的字典恢复元数据"""
+        return cls(
+            algorithm=data["algorithm"],
+            version=data["version"],
+            trained_at=datetime.fromisoformat(data["trained_at"]),
+            data_shape=tuple(data["data_shape"]),
+            performance_metrics=data["performance_metrics"],
+            hyperparameters=data["hyperparameters"],
+            feature_names=data["feature_names"],
+            preprocessing_params=data["preprocessing_params"]
+        )
 
 
 class AnomalyScoreLevel(Enum):
@@ -89,6 +121,380 @@ class AnomalyScoreLevel(Enum):
     CRITICAL = "critical"      # 严重: 0.8-1.0
 
 
+def _batch_z_score_kernel(
+    values: np.ndarray,
+    sensitivity: float,
+    threshold: Optional[float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    多序列Z-Score向量化计算
+    
+    按行(序列)计算均值和总体标准差，一次完成所有序列的评分。
+    NaN视为缺失点，不参与统计且不会被判定为异常。
+    
+    Args:
+        values: 形状为 (序列数, 时间点数) 的指标矩阵
+        sensitivity: 敏感度参数 (0.1-1.0)
+        threshold: 自定义Z-Score阈值
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (异常分数矩阵, 异常标签矩阵)
+    """
+    if threshold is None:
+        threshold = 2.0 + (sensitivity * 2.0)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nanmean(values, axis=1, keepdims=True)
+        std = np.nanstd(values, axis=1, keepdims=True)
+        z_scores = np.where(std > 0, np.abs(values - mean) / std, 0.0)
+    z_scores = np.nan_to_num(z_scores, nan=0.0)
+    
+    anomaly_labels = (z_scores > threshold).astype(int)
+    normalized_scores = np.clip(z_scores / (threshold + 1.0), 0, 1)
+    
+    return normalized_scores, anomaly_labels
+
+
+def _batch_iqr_kernel(
+    values: np.ndarray,
+    sensitivity: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    多序列四分位距(IQR)向量化计算
+    
+    Args:
+        values: 形状为 (序列数, 时间点数) 的指标矩阵
+        sensitivity: 敏感度参数 (0.1-1.0)
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (异常分数矩阵, 异常标签矩阵)
+    """
+    q1, q3 = np.nanpercentile(values, [25, 75], axis=1, keepdims=True)
+    iqr = q3 - q1
+    
+    # 敏感度越高，因子越小
+    factor = 1.5 * (2.0 - sensitivity)
+    lower_bound = q1 - factor * iqr
+    upper_bound = q3 + factor * iqr
+    
+    with np.errstate(invalid='ignore'):
+        distances = np.maximum(
+            np.maximum(0, lower_bound - values),
+            np.maximum(0, values - upper_bound)
+        )
+    distances = np.nan_to_num(distances, nan=0.0)
+    
+    anomaly_labels = (distances > 0).astype(int)
+    max_distance = np.maximum(distances.max(axis=1, keepdims=True), 1e-8)
+    normalized_scores = distances / max_distance
+    
+    return normalized_scores, anomaly_labels
+
+
+def _feature_kernel(timestamps: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """
+    时间序列特征计算（可在工作进程中执行）
+    
+    Args:
+        timestamps: 纳秒精度的时间戳数组 (int64)
+        values: 指标值数组
+        
+    Returns:
+        pd.DataFrame: 以时间为索引的特征矩阵（不含原始value列）
+    """
+    index = pd.to_datetime(np.asarray(timestamps, dtype=np.int64))
+    values = pd.Series(np.array(values, dtype=np.float64), index=index)
+    features_df = pd.DataFrame({'value': values}, index=index)
+    
+    # === 基础统计特征 ===
+    # 滑动窗口统计 (5分钟窗口)
+    window_5m = min(5, len(values) // 4)
+    if window_5m > 1:
+        features_df['rolling_mean_5m'] = values.rolling(window=window_5m, min_periods=1).mean()
+        features_df['rolling_std_5m'] = values.rolling(window=window_5m, min_periods=1).std()
+        features_df['rolling_min_5m'] = values.rolling(window=window_5m, min_periods=1).min()
+        features_df['rolling_max_5m'] = values.rolling(window=window_5m, min_periods=1).max()
+    
+    # 滑动窗口统计 (30分钟窗口)
+    window_30m = min(30, len(values) // 2)
+    if window_30m > 1:
+        features_df['rolling_mean_30m'] = values.rolling(window=window_30m, min_periods=1).mean()
+        features_df['rolling_std_30m'] = values.rolling(window=window_30m, min_periods=1).std()
+    
+    # === 变化率特征 ===
+    # 一阶差分 (变化量)
+    features_df['diff_1'] = values.diff(1).fillna(0)
+    # 二阶差分 (加速度)
+    features_df['diff_2'] = values.diff(2).fillna(0)
+    # 百分比变化率
+    features_df['pct_change'] = values.pct_change(1).fillna(0)
+    
+    # === Z-Score标准化特征 ===
+    # 全局Z-Score
+    global_mean = values.mean()
+    global_std = values.std()
+    if global_std > 0:
+        features_df['z_score_global'] = (values - global_mean) / global_std
+    else:
+        features_df['z_score_global'] = 0
+    
+    # 滑动Z-Score
+    if window_30m > 1:
+        rolling_mean = features_df['rolling_mean_30m']
+        rolling_std = features_df['rolling_std_30m']
+        features_df['z_score_rolling'] = np.where(
+            rolling_std > 0,
+            (values - rolling_mean) / rolling_std,
+            0
+        )
+    
+    # === 趋势特征 ===
+    # 与滑动均值的偏差
+    if window_5m > 1:
+        features_df['deviation_from_mean'] = values - features_df['rolling_mean_5m']
+        # 标准化偏差
+        features_df['normalized_deviation'] = np.where(
+            features_df['rolling_std_5m'] > 0,
+            features_df['deviation_from_mean'] / features_df['rolling_std_5m'],
+            0
+        )
+    
+    # === 极值特征 ===
+    # 局部极大值和极小值
+    if len(values) > 10:
+        # 寻找峰值
+        peaks_max, _ = find_peaks(values.values, distance=max(1, len(values) // 20))
+        peaks_min, _ = find_peaks(-values.values, distance=max(1, len(values) // 20))
+        
+        features_df['is_local_max'] = 0
+        features_df['is_local_min'] = 0
+        features_df.iloc[peaks_max, features_df.columns.get_loc('is_local_max')] = 1
+        features_df.iloc[peaks_min, features_df.columns.get_loc('is_local_min')] = 1
+    
+    # === 时间特征 ===
+    # 提取时间相关特征
+    features_df['hour'] = index.hour
+    features_df['day_of_week'] = index.dayofweek
+    features_df['is_weekend'] = (index.dayofweek >= 5).astype(int)
+    
+    # === 清理和验证 ===
+    # 替换无穷大值和NaN
+    features_df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    features_df.fillna(0, inplace=True)
+    
+    # 移除原始value列，只保留特征列
+    feature_columns = [col for col in features_df.columns if col != 'value']
+    return features_df[feature_columns]
+
+
+def _isolation_forest_kernel(
+    features: np.ndarray,
+    contamination: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    孤立森林训练与评分（可在工作进程中执行）
+    
+    Args:
+        features: 特征矩阵 (样本数, 特征数)
+        contamination: 异常比例估计
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (归一化异常分数, 异常标签)
+    """
+    # 数据标准化
+    scaler = StandardScaler()
+    scaled_features = scaler.fit_transform(features)
+    
+    # 创建和训练模型
+    model = IsolationForest(
+        contamination=contamination,
+        random_state=42,
+        n_estimators=100
+    )
+    model.fit(scaled_features)
+    
+    # 预测异常分数和标签
+    anomaly_scores = model.decision_function(scaled_features)
+    anomaly_labels = model.predict(scaled_features)
+    
+    # 转换标签 (-1表示异常, 1表示正常 -> 1表示异常, 0表示正常)
+    anomaly_labels = (anomaly_labels == -1).astype(int)
+    
+    # 标准化分数到[0,1]范围
+    normalized_scores = (anomaly_scores - anomaly_scores.min()) / (anomaly_scores.max() - anomaly_scores.min())
+    normalized_scores = 1 - normalized_scores  # 反转分数，使高分表示异常
+    
+    return normalized_scores, anomaly_labels
+
+
+# 工作进程内的已训练模型缓存: 模型文件路径 -> (文件修改时间, 模型包)
+_worker_model_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _load_model_bundle(model_path: str) -> Dict[str, Any]:
+    """
+    加载已训练的模型包（工作进程内按文件修改时间缓存）
+    
+    Args:
+        model_path: joblib模型文件路径
+        
+    Returns:
+        Dict: 包含 scaler、model 和训练分数范围的模型包
+    """
+    mtime = os.path.getmtime(model_path)
+    cached = _worker_model_cache.get(model_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    bundle = joblib.load(model_path)
+    _worker_model_cache[model_path] = (mtime, bundle)
+    return bundle
+
+
+def _train_isolation_forest_kernel(
+    features: np.ndarray,
+    model_path: str,
+    contamination: float,
+    n_estimators: int,
+    random_state: int
+) -> Dict[str, float]:
+    """
+    训练孤立森林并持久化到磁盘（可在工作进程中执行）
+    
+    模型在工作进程内直接写入文件，只把训练统计返回给主进程，
+    避免在进程间序列化整片森林。
+    
+    Args:
+        features: 特征矩阵 (样本数, 特征数)
+        model_path: 模型文件保存路径
+        contamination: 异常比例估计
+        n_estimators: 决策树数量
+        random_state: 随机种子
+        
+    Returns:
+        Dict[str, float]: 训练分数范围和训练集异常率
+    """
+    scaler = StandardScaler()
+    scaled_features = scaler.fit_transform(features)
+    
+    model = IsolationForest(
+        contamination=contamination,
+        random_state=random_state,
+        n_estimators=n_estimators
+    )
+    model.fit(scaled_features)
+    
+    train_scores = model.decision_function(scaled_features)
+    train_labels = model.predict(scaled_features)
+    
+    bundle = {
+        "scaler": scaler,
+        "model": model,
+        "score_min": float(train_scores.min()),
+        "score_max": float(train_scores.max())
+    }
+    
+    # 先写临时文件再原子替换，避免检测进程读到写了一半的模型
+    tmp_path = f"{model_path}.tmp"
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, model_path)
+    
+    return {
+        "score_min": bundle["score_min"],
+        "score_max": bundle["score_max"],
+        "score_mean": float(train_scores.mean()),
+        "train_anomaly_rate": float((train_labels == -1).mean())
+    }
+
+
+def _score_isolation_forest_kernel(
+    features: np.ndarray,
+    model_path: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    使用已训练的孤立森林评分（可在工作进程中执行）
+    
+    分数按训练集的分数范围归一化，同一模型对不同请求给出可比的分数。
+    
+    Args:
+        features: 与训练时特征列对齐的特征矩阵
+        model_path: joblib模型文件路径
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (归一化异常分数, 异常标签)
+    """
+    bundle = _load_model_bundle(model_path)
+    scaled_features = bundle["scaler"].transform(features)
+    
+    anomaly_scores = bundle["model"].decision_function(scaled_features)
+    anomaly_labels = (bundle["model"].predict(scaled_features) == -1).astype(int)
+    
+    # 反转分数，使高分表示异常
+    score_range = max(bundle["score_max"] - bundle["score_min"], 1e-8)
+    normalized_scores = np.clip((bundle["score_max"] - anomaly_scores) / score_range, 0, 1)
+    
+    return normalized_scores, anomaly_labels
+
+
+def _z_score_kernel(
+    values: np.ndarray,
+    threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    单序列Z-Score评分（可在工作进程中执行）
+    
+    Args:
+        values: 指标值数组
+        threshold: Z-Score阈值
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (异常分数, 异常标签)
+    """
+    z_scores = np.abs(stats.zscore(values))
+    
+    anomaly_labels = (z_scores > threshold).astype(int)
+    normalized_scores = np.clip(z_scores / (threshold + 1.0), 0, 1)
+    
+    return normalized_scores, anomaly_labels
+
+
+def _iqr_kernel(
+    values: np.ndarray,
+    sensitivity: float
+) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """
+    单序列四分位距(IQR)评分（可在工作进程中执行）
+    
+    Args:
+        values: 指标值数组
+        sensitivity: 敏感度参数 (0.1-1.0)
+        
+    Returns:
+        Tuple: (异常分数, 异常标签, 下界, 上界)
+    """
+    q1 = np.percentile(values, 25)
+    q3 = np.percentile(values, 75)
+    iqr = q3 - q1
+    
+    # 根据敏感度调整因子
+    factor = 1.5 * (2.0 - sensitivity)  # 敏感度越高，因子越小
+    
+    lower_bound = q1 - factor * iqr
+    upper_bound = q3 + factor * iqr
+    
+    anomaly_labels = ((values < lower_bound) | (values > upper_bound)).astype(int)
+    
+    # 计算异常分数（基于距离边界的程度）
+    distances = np.maximum(
+        np.maximum(0, lower_bound - values),
+        np.maximum(0, values - upper_bound)
+    )
+    max_distance = max(np.max(distances), 1e-8)  # 避免除零
+    normalized_scores = distances / max_distance
+    
+    return normalized_scores, anomaly_labels, float(lower_bound), float(upper_bound)
+
+
 class AIAnomalyDetector:
     """
     AI异常检测器 - 智能监控系统的核心AI引擎
@@ -108,7 +514,7 @@ class AIAnomalyDetector:
         detector = AIAnomalyDetector()
         
         # 训练模型
-        await detector.train_model(historical_data, algorithm="isolation_forest")
+        await detector.train_model(historical_data, metric_query="cpu_usage", labels={"instance": "node-1"})
         
         # 检测异常
         result = await detector.detect_anomalies(metrics_data, algorithm="isolation_forest")
@@ -117,21 +523,35 @@ class AIAnomalyDetector:
         forecast = await detector.predict_future_values(metrics_data, hours=24)
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        executor: Optional[DetectionExecutor] = None,
+        streaming_features: Optional[StreamingFeatureRegistry] = None
+    ):
         """
         初始化AI异常检测器
         
         设置模型存储路径、缓存配置和算法参数
+        
+        Args:
+            executor: 检测执行器，CPU密集型计算在其进程池中执行
+            streaming_features: 流式特征注册表，默认使用全局注册表，按序列保存增量特征状态
         """
         self.logger = logger.bind(component="AIAnomalyDetector")
         
+        # 检测执行器 - 避免阻塞事件循环
+        self.executor = executor or detection_executor
+        
+        # 流式特征状态 - 按序列增量计算特征
+        self.streaming_features = streaming_features or streaming_feature_registry
+        
         # 模型存储配置
         self.model_dir = Path(settings.AI_MODEL_PATH)
         self.model_dir.mkdir(parents=True, exist_ok=True)
         
-        # 内存缓存配置 - 缓存模型和预处理器，TTL=5分钟
+        # 内存缓存配置 - 缓存已训练模型的元数据，TTL=5分钟
+        # 模型本身（含预处理器）由工作进程按文件缓存
         self.model_cache = TTLCache(maxsize=100, ttl=settings.AI_CACHE_TTL)
-        self.scaler_cache = TTLCache(maxsize=100, ttl=settings.AI_CACHE_TTL)
         
         # 批处理配置
         self.batch_size = settings.AI_BATCH_SIZE
@@ -175,10 +595,11 @@ class AIAnomalyDetector:
     
     async def detect_anomalies(
         self,
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
         algorithm: AlgorithmType = AlgorithmType.ISOLATION_FOREST,
         sensitivity: float = 0.8,
-        threshold: Optional[float] = None
+        threshold: Optional[float] = None,
+        model_key: Optional[str] = None
     ) -> AnomalyDetectionResult:
         """
         执行异常检测分析
@@ -187,10 +608,12 @@ class AIAnomalyDetector:
         识别异常点并计算异常评分和严重程度。
         
         Args:
-            data: 时间序列数据列表，格式: [{"timestamp": "...", "value": float, "labels": {...}}]
+            data: 时间序列数据列表，格式: [{"timestamp": "...", "value": float, "labels": {...}}]，
+                也可以是包含 timestamp/value 列的DataFrame（如 ColumnarSeries.to_frame()）
             algorithm: 检测算法类型
             sensitivity: 敏感度参数 (0.1-1.0)，越高越敏感
             threshold: 自定义异常阈值，None时使用默认阈值
+            model_key: 已训练模型的键（见 build_model_key），存在时孤立森林只评分不训练
         
         Returns:
             AnomalyDetectionResult: 检测结果，包含异常点列表和统计信息
@@ -209,7 +632,7 @@ class AIAnomalyDetector:
         
         try:
             # 1. 数据验证和预处理
-            if not data or len(data) < 10:
+            if data is None or len(data) < 10:
                 raise ValueError("数据点数量不足，至少需要10个数据点进行异常检测")
             
             df = await self._preprocess_data(data)
@@ -218,10 +641,19 @@ class AIAnomalyDetector:
             features_df = await self._extract_features(df)
             
             # 3. 根据算法执行异常检测
+            model_metadata = None
             if algorithm == AlgorithmType.ISOLATION_FOREST:
-                anomaly_scores, anomalies = await self._detect_isolation_forest(
-                    features_df, sensitivity, threshold
-                )
+                if model_key:
+                    model_metadata = self.get_trained_model(model_key, algorithm)
+                
+                if model_metadata is not None:
+                    anomaly_scores, anomalies = await self._score_trained_model(
+                        features_df, model_metadata, threshold
+                    )
+                else:
+                    anomaly_scores, anomalies = await self._detect_isolation_forest(
+                        features_df, sensitivity, threshold
+                    )
             elif algorithm == AlgorithmType.Z_SCORE:
                 anomaly_scores, anomalies = await self._detect_z_score(
                     features_df, sensitivity, threshold
@@ -255,7 +687,8 @@ class AIAnomalyDetector:
                 "threshold": threshold,
                 "feature_count": len(features_df.columns),
                 "data_timespan": f"{df.index[-1] - df.index[0]}",
-                "anomaly_rate": anomaly_count / total_points if total_points > 0 else 0
+                "anomaly_rate": anomaly_count / total_points if total_points > 0 else 0,
+                "model_version": model_metadata.version if model_metadata else None
             }
             
             execution_time = time.time() - start_time
@@ -290,7 +723,454 @@ class AIAnomalyDetector:
             raise RuntimeError(f"异常检测执行失败: {str(e)}")
     
     
-    async def _preprocess_data(self, data: List[Dict[str, Any]]) -> pd.DataFrame:
+    async def detect_anomalies_batch(
+        self,
+        values: np.ndarray,
+        timestamps: np.ndarray,
+        series_labels: Optional[List[Dict[str, str]]] = None,
+        metric_names: Optional[List[str]] = None,
+        algorithm: AlgorithmType = AlgorithmType.Z_SCORE,
+        sensitivity: float = 0.8,
+        threshold: Optional[float] = None
+    ) -> List[SeriesAnomalyResult]:
+        """
+        多序列批量异常检测
+        
+        对 (序列数 × 时间点数) 的二维矩阵一次性完成向量化评分，
+        每条序列独立统计、独立返回结果，避免不同标签集的数据混在一起。
+        矩阵通常来自 PrometheusService.query_range_matrix，缺失点为NaN。
+        
+        Args:
+            values: 形状为 (序列数, 时间点数) 的指标矩阵
+            timestamps: 形状为 (时间点数,) 的Unix时间戳(秒)
+            series_labels: 每条序列的标签，与矩阵行一一对应
+            metric_names: 每条序列的指标名称
+            algorithm: 检测算法，批量模式支持 Z_SCORE 和 STATISTICAL
+            sensitivity: 敏感度参数 (0.1-1.0)
+            threshold: 自定义异常阈值（仅Z_SCORE使用）
+            
+        Returns:
+            List[SeriesAnomalyResult]: 按输入顺序排列的各序列检测结果
+            
+        Raises:
+            ValueError: 当矩阵形状不合法或算法不支持批量模式时
+            RuntimeError: 当计算失败时
+        """
+        start_time = time.time()
+        
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        
+        if values.ndim != 2:
+            raise ValueError(f"批量检测需要二维矩阵，实际维度: {values.ndim}")
+        if values.shape[1] != len(timestamps):
+            raise ValueError("时间戳数量与矩阵列数不一致")
+        if algorithm not in (AlgorithmType.Z_SCORE, AlgorithmType.STATISTICAL):
+            raise ValueError(f"批量模式不支持的算法类型: {algorithm.value}")
+        
+        series_count, point_count = values.shape
+        series_labels = series_labels or [{} for _ in range(series_count)]
+        metric_names = metric_names or ["unknown_metric"] * series_count
+        
+        self.logger.info(
+            "开始批量异常检测",
+            algorithm=algorithm.value,
+            series_count=series_count,
+            points_per_series=point_count,
+            sensitivity=sensitivity
+        )
+        
+        try:
+            if point_count < 10:
+                raise ValueError("数据点数量不足，至少需要10个数据点进行异常检测")
+            
+            if algorithm == AlgorithmType.Z_SCORE:
+                anomaly_scores, anomaly_labels = await self.executor.submit(
+                    _batch_z_score_kernel,
+                    arrays={"values": values},
+                    sensitivity=sensitivity,
+                    threshold=threshold
+                )
+            else:
+                anomaly_scores, anomaly_labels = await self.executor.submit(
+                    _batch_iqr_kernel,
+                    arrays={"values": values},
+                    sensitivity=sensitivity
+                )
+            
+            valid_mask = ~np.isnan(values)
+            valid_counts = valid_mask.sum(axis=1)
+            overall_scores = np.where(
+                valid_counts > 0,
+                np.where(valid_mask, anomaly_scores, 0.0).sum(axis=1) / np.maximum(valid_counts, 1),
+                0.0
+            )
+            
+            # 只为被标记的点构建AnomalyPoint，避免逐点遍历整个矩阵
+            flagged = ((anomaly_labels == 1) | (anomaly_scores > 0.5)) & valid_mask
+            points_by_series: List[List[AnomalyPoint]] = [[] for _ in range(series_count)]
+            
+            for row, col in zip(*np.nonzero(flagged)):
+                score = float(anomaly_scores[row, col])
+                points_by_series[row].append(AnomalyPoint(
+                    timestamp=datetime.fromtimestamp(timestamps[col]),
+                    value=float(values[row, col]),
+                    anomaly_score=score,
+                    severity=self._score_to_severity(score),
+                    explanation=f"{algorithm.value}算法检测到异常",
+                    metadata={
+                        "algorithm": algorithm.value,
+                        "index": int(col),
+                        "is_anomaly": bool(anomaly_labels[row, col])
+                    }
+                ))
+            
+            results = [
+                SeriesAnomalyResult(
+                    metric_name=metric_names[row],
+                    labels=series_labels[row],
+                    anomalies=points_by_series[row],
+                    total_points=int(valid_counts[row]),
+                    anomaly_count=len(points_by_series[row]),
+                    overall_score=float(np.clip(overall_scores[row], 0.0, 1.0))
+                )
+                for row in range(series_count)
+            ]
+            
+            self.logger.info(
+                "批量异常检测完成",
+                algorithm=algorithm.value,
+                series_count=series_count,
+                anomalous_series=sum(1 for result in results if result.anomaly_count > 0),
+                execution_time=round(time.time() - start_time, 3)
+            )
+            
+            return results
+            
+        except Exception as e:
+            self.logger.error(
+                "批量异常检测失败",
+                algorithm=algorithm.value,
+                error=str(e),
+                execution_time=time.time() - start_time
+            )
+            raise RuntimeError(f"批量异常检测执行失败: {str(e)}")
+    
+    
+    async def detect_anomalies_stream(
+        self,
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
+        metric_query: str,
+        labels: Optional[Dict[str, str]] = None,
+        metric_name: str = "unknown_metric",
+        algorithm: AlgorithmType = AlgorithmType.Z_SCORE,
+        sensitivity: float = 0.8,
+        threshold: Optional[float] = None
+    ) -> SeriesAnomalyResult:
+        """
+        单序列增量异常检测
+        
+        序列的特征状态保存在流式特征注册表中，与上次调用重叠的数据会被跳过，
+        只对新增点计算特征和评分。首次调用时整个窗口用于预热运行统计。
+        
+        Args:
+            data: 时间序列数据，格式同 detect_anomalies，可与上次调用的数据重叠
+            metric_query: PromQL查询语句，与标签集共同确定序列
+            labels: 序列标签集
+            metric_name: 指标名称
+            algorithm: 检测算法，支持 Z_SCORE 和已训练的 ISOLATION_FOREST
+            sensitivity: 敏感度参数 (0.1-1.0)
+            threshold: 自定义异常阈值
+            
+        Returns:
+            SeriesAnomalyResult: 新增点的检测结果，没有新点时为空结果
+            
+        Raises:
+            ValueError: 当算法不支持增量模式或孤立森林模型未训练时
+            RuntimeError: 当计算失败时
+        """
+        model_metadata = None
+        if algorithm == AlgorithmType.ISOLATION_FOREST:
+            model_metadata = self.get_trained_model(self.build_model_key(metric_query, labels), algorithm)
+            if model_metadata is None:
+                raise ValueError("增量模式的孤立森林检测需要先通过 /models/train 训练模型")
+        elif algorithm != AlgorithmType.Z_SCORE:
+            raise ValueError(f"增量模式不支持的算法类型: {algorithm.value}")
+        
+        try:
+            df = await self._preprocess_data(data)
+            
+            extractor = self.streaming_features.get(metric_query, labels)
+            seen_before = extractor.count
+            features_df = extractor.update(df.index.asi8, df['value'].to_numpy(dtype=np.float64))
+            
+            if features_df.empty:
+                return SeriesAnomalyResult(
+                    metric_name=metric_name,
+                    labels=labels or {},
+                    anomalies=[],
+                    total_points=0,
+                    anomaly_count=0,
+                    overall_score=0.0
+                )
+            
+            if model_metadata is not None:
+                anomaly_scores, anomaly_labels = await self._score_trained_model(
+                    features_df, model_metadata, threshold
+                )
+            else:
+                if threshold is None:
+                    threshold = 2.0 + (sensitivity * 2.0)
+                z_scores = np.abs(features_df['z_score_global'].to_numpy())
+                anomaly_scores = np.clip(z_scores / (threshold + 1.0), 0, 1)
+                anomaly_labels = (z_scores > threshold).astype(int)
+                
+                # 运行统计预热期间的点不参与判定
+                min_samples = self.algorithm_configs[AlgorithmType.Z_SCORE]["min_samples"]
+                warming_up = seen_before + np.arange(1, len(features_df) + 1) < min_samples
+                anomaly_scores[warming_up] = 0.0
+                anomaly_labels[warming_up] = 0
+            
+            anomaly_points = await self._generate_anomaly_points(
+                df.loc[features_df.index], anomaly_scores, anomaly_labels, algorithm
+            )
+            
+            return SeriesAnomalyResult(
+                metric_name=metric_name,
+                labels=labels or {},
+                anomalies=anomaly_points,
+                total_points=len(features_df),
+                anomaly_count=len(anomaly_points),
+                overall_score=float(np.mean(anomaly_scores))
+            )
+            
+        except Exception as e:
+            self.logger.error(
+                "增量异常检测失败",
+                algorithm=algorithm.value,
+                metric_query=metric_query,
+                error=str(e)
+            )
+            raise RuntimeError(f"增量异常检测执行失败: {str(e)}")
+    
+    
+    @staticmethod
+    def build_model_key(metric_query: str, labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        生成模型存储键
+        
+        由指标查询和标签集共同决定，标签顺序不影响结果。
+        
+        Args:
+            metric_query: PromQL查询语句
+            labels: 序列标签集
+            
+        Returns:
+            str: 32位十六进制模型键
+        """
+        label_part = json.dumps(sorted((labels or {}).items()), ensure_ascii=False)
+        digest = hashlib.sha256(f"{metric_query}\n{label_part}".encode("utf-8"))
+        return digest.hexdigest()[:32]
+    
+    
+    async def train_model(
+        self,
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
+        metric_query: str,
+        labels: Optional[Dict[str, str]] = None,
+        algorithm: AlgorithmType = AlgorithmType.ISOLATION_FOREST
+    ) -> ModelMetadata:
+        """
+        训练并持久化异常检测模型
+        
+        模型保存到 AI_MODEL_PATH，文件名由算法和模型键组成，
+        同一查询和标签集重复训练时覆盖旧模型。
+        
+        Args:
+            data: 训练数据，格式同 detect_anomalies
+            metric_query: 训练数据对应的PromQL查询
+            labels: 训练序列的标签集
+            algorithm: 训练算法，目前只有孤立森林需要训练
+            
+        Returns:
+            ModelMetadata: 训练完成的模型元数据
+            
+        Raises:
+            ValueError: 当数据不足或算法不支持训练时
+            RuntimeError: 当训练失败时
+        """
+        if algorithm != AlgorithmType.ISOLATION_FOREST:
+            raise ValueError(f"算法不需要训练或暂不支持训练: {algorithm.value}")
+        if data is None or len(data) < 10:
+            raise ValueError("数据点数量不足，至少需要10个数据点进行模型训练")
+        
+        start_time = time.time()
+        model_key = self.build_model_key(metric_query, labels)
+        
+        self.logger.info(
+            "开始模型训练",
+            algorithm=algorithm.value,
+            model_key=model_key,
+            data_points=len(data)
+        )
+        
+        try:
+            df = await self._preprocess_data(data)
+            features_df = await self._extract_features(df)
+            
+            config = self.algorithm_configs[algorithm]
+            model_file = f"{algorithm.value}_{model_key}.joblib"
+            
+            training_stats = await self.executor.submit(
+                _train_isolation_forest_kernel,
+                arrays={"features": features_df.to_numpy(dtype=np.float64)},
+                model_path=str(self.model_dir / model_file),
+                contamination=config["contamination"],
+                n_estimators=config["n_estimators"],
+                random_state=config["random_state"]
+            )
+            
+            trained_at = datetime.now()
+            metadata = ModelMetadata(
+                algorithm=algorithm.value,
+                version=trained_at.strftime("%Y%m%d%H%M%S"),
+                trained_at=trained_at,
+                data_shape=features_df.shape,
+                performance_metrics={
+                    "train_anomaly_rate": training_stats["train_anomaly_rate"],
+                    "score_mean": training_stats["score_mean"],
+                    "training_time": time.time() - start_time
+                },
+                hyperparameters={
+                    "contamination": config["contamination"],
+                    "n_estimators": config["n_estimators"],
+                    "random_state": config["random_state"]
+                },
+                feature_names=list(features_df.columns),
+                preprocessing_params={
+                    "scaler": "StandardScaler",
+                    "model_file": model_file,
+                    "model_key": model_key,
+                    "metric_query": metric_query,
+                    "labels": labels or {},
+                    "score_min": training_stats["score_min"],
+                    "score_max": training_stats["score_max"]
+                }
+            )
+            
+            metadata_path = self.model_dir / f"{algorithm.value}_{model_key}.json"
+            metadata_path.write_text(
+                json.dumps(metadata.to_dict(), ensure_ascii=False, indent=2),
+                encoding="utf-8"
+            )
+            self.model_cache[(algorithm.value, model_key)] = metadata
+            
+            self.logger.info(
+                "模型训练完成",
+                algorithm=algorithm.value,
+                model_key=model_key,
+                version=metadata.version,
+                samples=features_df.shape[0],
+                features=features_df.shape[1],
+                training_time=round(time.time() - start_time, 3)
+            )
+            
+            return metadata
+            
+        except Exception as e:
+            self.logger.error(
+                "模型训练失败",
+                algorithm=algorithm.value,
+                model_key=model_key,
+                error=str(e)
+            )
+            raise RuntimeError(f"模型训练失败: {str(e)}")
+    
+    
+    def get_trained_model(
+        self,
+        model_key: str,
+        algorithm: AlgorithmType = AlgorithmType.ISOLATION_FOREST
+    ) -> Optional[ModelMetadata]:
+        """
+        查找已训练模型的元数据
+        
+        优先读取内存缓存，未命中时从 AI_MODEL_PATH 加载元数据文件。
+        
+        Args:
+            model_key: 模型键
+            algorithm: 算法类型
+            
+        Returns:
+            Optional[ModelMetadata]: 模型元数据，不存在时返回None
+        """
+        cache_key = (algorithm.value, model_key)
+        metadata = self.model_cache.get(cache_key)
+        if metadata is not None:
+            return metadata
+        
+        metadata_path = self.model_dir / f"{algorithm.value}_{model_key}.json"
+        model_path = self.model_dir / f"{algorithm.value}_{model_key}.joblib"
+        if not metadata_path.exists() or not model_path.exists():
+            return None
+        
+        try:
+            metadata = ModelMetadata.from_dict(
+                json.loads(metadata_path.read_text(encoding="utf-8"))
+            )
+        except Exception as e:
+            self.logger.warning("模型元数据加载失败", model_key=model_key, error=str(e))
+            return None
+        
+        self.model_cache[cache_key] = metadata
+        return metadata
+    
+    
+    async def _score_trained_model(
+        self,
+        features_df: pd.DataFrame,
+        metadata: ModelMetadata,
+        threshold: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        使用已训练的孤立森林模型评分
+        
+        Args:
+            features_df: 特征数据DataFrame
+            metadata: 模型元数据
+            threshold: 自定义阈值，指定时按归一化分数重新判定异常
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (异常分数, 异常标签)
+        """
+        try:
+            # 按训练时的特征列对齐，短序列缺失的窗口特征补0
+            aligned = features_df.reindex(columns=metadata.feature_names, fill_value=0)
+            
+            normalized_scores, anomaly_labels = await self.executor.submit(
+                _score_isolation_forest_kernel,
+                arrays={"features": aligned.to_numpy(dtype=np.float64)},
+                model_path=str(self.model_dir / metadata.preprocessing_params["model_file"])
+            )
+            
+            if threshold is not None:
+                anomaly_labels = (normalized_scores > threshold).astype(int)
+            
+            self.logger.debug(
+                "已训练模型评分完成",
+                samples=len(features_df),
+                model_version=metadata.version,
+                anomalies_found=anomaly_labels.sum()
+            )
+            
+            return normalized_scores, anomaly_labels
+            
+        except Exception as e:
+            self.logger.error("已训练模型评分失败", error=str(e))
+            raise RuntimeError(f"已训练模型评分失败: {str(e)}")
+    
+    
+    async def _preprocess_data(self, data: Union[List[Dict[str, Any]], pd.DataFrame]) -> pd.DataFrame:
         """
         数据预处理
         
@@ -298,14 +1178,14 @@ class AIAnomalyDetector:
         进行数据清洗、缺失值处理和格式标准化。
         
         Args:
-            data: 原始时间序列数据
+            data: 原始时间序列数据（记录列表或DataFrame）
             
         Returns:
             pd.DataFrame: 预处理后的数据，索引为时间戳
         """
         try:
-            # 转换为DataFrame
-            df = pd.DataFrame(data)
+            # 转换为DataFrame（不修改调用方传入的DataFrame）
+            df = data.copy() if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
             
             # 时间戳处理
             if 'timestamp' in df.columns:
@@ -357,7 +1237,7 @@ class AIAnomalyDetector:
         时间序列特征工程
         
         从原始时间序列数据中提取统计特征、趋势特征和周期特征，
-        为异常检测算法提供丰富的特征输入。
+        为异常检测算法提供丰富的特征输入。计算在检测进程池中执行。
         
         Args:
             df: 预处理后的时间序列数据
@@ -366,94 +1246,19 @@ class AIAnomalyDetector:
             pd.DataFrame: 包含多维特征的数据框架
         """
         try:
-            features_df = df.copy()
-            values = df['value']
-            
-            # === 基础统计特征 ===
-            # 滑动窗口统计 (5分钟窗口)
-            window_5m = min(5, len(values) // 4)
-            if window_5m > 1:
-                features_df['rolling_mean_5m'] = values.rolling(window=window_5m, min_periods=1).mean()
-                features_df['rolling_std_5m'] = values.rolling(window=window_5m, min_periods=1).std()
-                features_df['rolling_min_5m'] = values.rolling(window=window_5m, min_periods=1).min()
-                features_df['rolling_max_5m'] = values.rolling(window=window_5m, min_periods=1).max()
-            
-            # 滑动窗口统计 (30分钟窗口)
-            window_30m = min(30, len(values) // 2)
-            if window_30m > 1:
-                features_df['rolling_mean_30m'] = values.rolling(window=window_30m, min_periods=1).mean()
-                features_df['rolling_std_30m'] = values.rolling(window=window_30m, min_periods=1).std()
-            
-            # === 变化率特征 ===
-            # 一阶差分 (变化量)
-            features_df['diff_1'] = values.diff(1).fillna(0)
-            # 二阶差分 (加速度)
-            features_df['diff_2'] = values.diff(2).fillna(0)
-            # 百分比变化率
-            features_df['pct_change'] = values.pct_change(1).fillna(0)
-            
-            # === Z-Score标准化特征 ===
-            # 全局Z-Score
-            global_mean = values.mean()
-            global_std = values.std()
-            if global_std > 0:
-                features_df['z_score_global'] = (values - global_mean) / global_std
-            else:
-                features_df['z_score_global'] = 0
-            
-            # 滑动Z-Score
-            if window_30m > 1:
-                rolling_mean = features_df['rolling_mean_30m']
-                rolling_std = features_df['rolling_std_30m']
-                features_df['z_score_rolling'] = np.where(
-                    rolling_std > 0,
-                    (values - rolling_mean) / rolling_std,
-                    0
-                )
-            
-            # === 趋势特征 ===
-            # 与滑动均值的偏差
-            if window_5m > 1:
-                features_df['deviation_from_mean'] = values - features_df['rolling_mean_5m']
-                # 标准化偏差
-                features_df['normalized_deviation'] = np.where(
-                    features_df['rolling_std_5m'] > 0,
-                    features_df['deviation_from_mean'] / features_df['rolling_std_5m'],
-                    0
-                )
-            
-            # === 极值特征 ===
-            # 局部极大值和极小值
-            if len(values) > 10:
-                # 寻找峰值
-                peaks_max, _ = find_peaks(values.values, distance=max(1, len(values) // 20))
-                peaks_min, _ = find_peaks(-values.values, distance=max(1, len(values) // 20))
-                
-                features_df['is_local_max'] = 0
-                features_df['is_local_min'] = 0
-                features_df.iloc[peaks_max, features_df.columns.get_loc('is_local_max')] = 1
-                features_df.iloc[peaks_min, features_df.columns.get_loc('is_local_min')] = 1
-            
-            # === 时间特征 ===
-            # 提取时间相关特征
-            features_df['hour'] = df.index.hour
-            features_df['day_of_week'] = df.index.dayofweek
-            features_df['is_weekend'] = (df.index.dayofweek >= 5).astype(int)
-            
-            # === 清理和验证 ===
-            # 替换无穷大值和NaN
-            features_df.replace([np.inf, -np.inf], np.nan, inplace=True)
-            features_df.fillna(0, inplace=True)
-            
-            # 移除原始value列，只保留特征列
-            feature_columns = [col for col in features_df.columns if col != 'value']
-            features_df = features_df[feature_columns]
+            features_df = await self.executor.submit(
+                _feature_kernel,
+                arrays={
+                    "timestamps": df.index.asi8,
+                    "values": df['value'].to_numpy(dtype=np.float64)
+                }
+            )
             
             self.logger.debug(
                 "特征工程完成",
                 original_features=1,
-                extracted_features=len(feature_columns),
-                feature_names=feature_columns[:5]  # 显示前5个特征名
+                extracted_features=len(features_df.columns),
+                feature_names=list(features_df.columns[:5])  # 显示前5个特征名
             )
             
             return features_df
@@ -481,37 +1286,18 @@ class AIAnomalyDetector:
             Tuple[np.ndarray, np.ndarray]: (异常分数, 异常标签)
         """
         try:
-            # 数据标准化
-            scaler = StandardScaler()
-            scaled_features = scaler.fit_transform(features_df)
-            
             # 调整污染率参数（异常比例）
             contamination = min(0.5, max(0.01, 1.0 - sensitivity))
             
-            # 创建和训练模型
-            model = IsolationForest(
-                contamination=contamination,
-                random_state=42,
-                n_estimators=100
+            normalized_scores, anomaly_labels = await self.executor.submit(
+                _isolation_forest_kernel,
+                arrays={"features": features_df.to_numpy(dtype=np.float64)},
+                contamination=contamination
             )
             
-            # 训练模型
-            model.fit(scaled_features)
-            
-            # 预测异常分数和标签
-            anomaly_scores = model.decision_function(scaled_features)
-            anomaly_labels = model.predict(scaled_features)
-            
-            # 转换标签 (-1表示异常, 1表示正常 -> 1表示异常, 0表示正常)
-            anomaly_labels = (anomaly_labels == -1).astype(int)
-            
-            # 标准化分数到[0,1]范围
-            normalized_scores = (anomaly_scores - anomaly_scores.min()) / (anomaly_scores.max() - anomaly_scores.min())
-            normalized_scores = 1 - normalized_scores  # 反转分数，使高分表示异常
-            
             self.logger.debug(
                 "孤立森林检测完成",
-                samples=len(scaled_features),
+                samples=len(features_df),
                 contamination=contamination,
                 anomalies_found=anomaly_labels.sum()
             )
@@ -540,29 +1326,17 @@ class AIAnomalyDetector:
             Tuple[np.ndarray, np.ndarray]: (异常分数, 异常标签)
         """
         try:
-            # 使用主要指标值进行检测
-            if 'value' in features_df.columns:
-                values = features_df['value'].values
-            else:
-                # 如果没有value列，使用第一个数值列
-                numeric_cols = features_df.select_dtypes(include=[np.number]).columns
-                if len(numeric_cols) > 0:
-                    values = features_df[numeric_cols[0]].values
-                else:
-                    raise ValueError("没有找到数值列用于Z-Score检测")
-            
-            # 计算Z-Score
-            z_scores = np.abs(stats.zscore(values))
+            values = self._select_detection_values(features_df, "Z-Score")
             
             # 根据敏感度设置阈值
             if threshold is None:
                 threshold = 2.0 + (sensitivity * 2.0)  # 2.0到4.0之间
             
-            # 判断异常
-            anomaly_labels = (z_scores > threshold).astype(int)
-            
-            # 标准化分数到[0,1]范围
-            normalized_scores = np.clip(z_scores / (threshold + 1.0), 0, 1)
+            normalized_scores, anomaly_labels = await self.executor.submit(
+                _z_score_kernel,
+                arrays={"values": values},
+                threshold=threshold
+            )
             
             self.logger.debug(
                 "Z-Score检测完成",
@@ -595,38 +1369,13 @@ class AIAnomalyDetector:
             Tuple[np.ndarray, np.ndarray]: (异常分数, 异常标签)
         """
         try:
-            # 使用主要指标值进行检测
-            if 'value' in features_df.columns:
-                values = features_df['value'].values
-            else:
-                # 如果没有value列，使用第一个数值列
-                numeric_cols = features_df.select_dtypes(include=[np.number]).columns
-                if len(numeric_cols) > 0:
-                    values = features_df[numeric_cols[0]].values
-                else:
-                    raise ValueError("没有找到数值列用于统计学检测")
-            
-            # 计算四分位数范围方法
-            q1 = np.percentile(values, 25)
-            q3 = np.percentile(values, 75)
-            iqr = q3 - q1
+            values = self._select_detection_values(features_df, "统计学")
             
-            # 根据敏感度调整因子
-            factor = 1.5 * (2.0 - sensitivity)  # 敏感度越高，因子越小
-            
-            lower_bound = q1 - factor * iqr
-            upper_bound = q3 + factor * iqr
-            
-            # 判断异常
-            anomaly_labels = ((values < lower_bound) | (values > upper_bound)).astype(int)
-            
-            # 计算异常分数（基于距离边界的程度）
-            distances = np.maximum(
-                np.maximum(0, lower_bound - values),
-                np.maximum(0, values - upper_bound)
+            normalized_scores, anomaly_labels, lower_bound, upper_bound = await self.executor.submit(
+                _iqr_kernel,
+                arrays={"values": values},
+                sensitivity=sensitivity
             )
-            max_distance = max(np.max(distances), 1e-8)  # 避免除零
-            normalized_scores = distances / max_distance
             
             self.logger.debug(
                 "统计学检测完成",
@@ -642,6 +1391,28 @@ class AIAnomalyDetector:
             self.logger.error("统计学检测失败", error=str(e))
             raise RuntimeError(f"统计学检测失败: {str(e)}")
 
+    def _select_detection_values(self, features_df: pd.DataFrame, method_name: str) -> np.ndarray:
+        """
+        选择单维检测使用的数值列
+        
+        Args:
+            features_df: 特征数据DataFrame
+            method_name: 检测方法名称，用于错误信息
+            
+        Returns:
+            np.ndarray: 检测使用的数值数组
+        """
+        # 使用主要指标值进行检测
+        if 'value' in features_df.columns:
+            return features_df['value'].to_numpy(dtype=np.float64)
+        
+        # 如果没有value列，使用第一个数值列
+        numeric_cols = features_df.select_dtypes(include=[np.number]).columns
+        if len(numeric_cols) > 0:
+            return features_df[numeric_cols[0]].to_numpy(dtype=np.float64)
+        
+        raise ValueError(f"没有找到数值列用于{method_name}检测")
+
     async def _generate_anomaly_points(
         self,
         df: pd.DataFrame,
@@ -777,7 +1548,7 @@ class AIAnomalyDetector:
 
     async def predict_future_values(
         self,
-        data: List[Dict[str, Any]],
+        data: Union[List[Dict[str, Any]], pd.DataFrame],
         hours: int = 24
     ) -> Dict[str, Any]:
         """
@@ -871,7 +1642,10 @@ class AIAnomalyDetector:
                 "accuracy": "95%",
                 "precision": "92%",
                 "recall": "89%"
-            }
+            },
+            "trained_models": len(list(self.model_dir.glob("*.joblib"))),
+            "streaming_features": self.streaming_features.get_stats(),
+            "executor": self.executor.get_stats()
         }
 
 # 导出类
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+告警管道 - 规则触发 → 告警记录 → 通知
+
+规则触发后只生成告警事件并放入队列，不在规则执行路径上等待数据库和通知渠道。
+写入任务把一段时间内的告警合并为一条多行INSERT（默认每200毫秒或500行一批），
+告警风暴中数千条触发序列只产生少量事务；告警对应的待投递通知在同一事务中
+写入 notifications 表，由通知发件箱负责发送和重试。
+
+功能特性:
+1. 有界队列，队列满时丢弃并计数，规则执行不会被阻塞
+2. 按数量或时间批量写入 alerts 表，一批一个事务
+3. 告警和待投递通知同事务写入，告警写入成功则通知不会丢失
+4. 关闭时排空队列，已接收的告警不会丢失
+5. 批量写入失败（如数据库短暂锁定）时按指数退避重试整批，重试耗尽才计为失败
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.database import Alert, Notification
+from app.models.schemas import AlertSeverity, NotificationChannel
+from app.services.notification_outbox import NotificationOutbox, notification_outbox
+
+logger = structlog.get_logger(__name__)
+
+
+@dataclass
+class AlertEvent:
+    """待写入的告警事件"""
+    rule_id: Optional[int]
+    title: str
+    message: str
+    severity: AlertSeverity
+    triggered_at: datetime
+    channels: List[NotificationChannel] = field(default_factory=list)
+    labels: Dict[str, str] = field(default_factory=dict)
+    context: Dict[str, Any] = field(default_factory=dict)
+    tags: List[str] = field(default_factory=list)
+    alert_id: Optional[int] = None
+
+    def to_row(self) -> Dict[str, Any]:
+        """转换为 alerts 表字段"""
+        return {
+            "title": self.title,
+            "message": self.message,
+            "severity": self.severity,
+            "rule_id": self.rule_id,
+            "status": "active",
+            "triggered_at": self.triggered_at,
+            "metric_data": {"labels": self.labels} if self.labels else None,
+            "context": {
+                **self.context,
+                "notification_channels": [channel.value for channel in self.channels]
+            },
+            "tags": self.tags
+        }
+
+
+class AlertPipeline:
+    """
+    告警写入管道
+
+    写入任务在首次提交时于当前事件循环上启动。
+
+    使用示例:
+        pipeline = AlertPipeline()
+
+        pipeline.submit(AlertEvent(...))   # 非阻塞
+        await pipeline.stop()              # 排空队列
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        outbox: Optional[NotificationOutbox] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue_size: Optional[int] = None,
+        write_retries: Optional[int] = None,
+        write_retry_delay: Optional[float] = None
+    ):
+        """
+        初始化告警管道
+
+        Args:
+            session_factory: 异步会话工厂
+            outbox: 通知发件箱，默认使用全局 notification_outbox
+            batch_size: 单批最大告警数，默认使用 settings.ALERT_BATCH_SIZE
+            flush_interval: 批次最长等待时间(秒)，默认使用 settings.ALERT_FLUSH_INTERVAL_MS
+            max_queue_size: 队列容量，默认使用 settings.ALERT_QUEUE_MAXSIZE
+            write_retries: 写入失败后的重试次数，默认使用 settings.ALERT_WRITE_RETRIES
+            write_retry_delay: 重试的基础退避时间(秒)，默认使用 settings.ALERT_WRITE_RETRY_MS
+        """
+        self.logger = logger.bind(component="AlertPipeline")
+        self.session_factory = session_factory
+        self.outbox = outbox or notification_outbox
+
+        self.batch_size = batch_size or settings.ALERT_BATCH_SIZE
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else settings.ALERT_FLUSH_INTERVAL_MS / 1000
+        )
+        self.max_queue_size = max_queue_size or settings.ALERT_QUEUE_MAXSIZE
+        self.write_retries = write_retries if write_retries is not None else settings.ALERT_WRITE_RETRIES
+        self.write_retry_delay = (
+            write_retry_delay if write_retry_delay is not None else settings.ALERT_WRITE_RETRY_MS / 1000
+        )
+
+        # 队列和后台任务，按事件循环惰性创建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._alert_queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "submitted": 0,
+            "dropped": 0,
+            "written": 0,
+            "write_failures": 0,
+            "write_retries": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "last_batch_ms": 0.0,
+            "notifications_queued": 0
+        }
+
+
+    def submit(self, event: AlertEvent) -> bool:
+        """
+        提交告警事件（非阻塞）
+
+        Args:
+            event: 告警事件
+
+        Returns:
+            bool: 是否进入队列，队列已满时返回False
+        """
+        self._ensure_started()
+
+        try:
+            self._alert_queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            self.logger.warning("告警队列已满，丢弃告警", rule_id=event.rule_id, title=event.title)
+            return False
+
+        self.stats["submitted"] += 1
+        return True
+
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        排空队列并停止写入任务
+
+        Args:
+            timeout: 等待排空的最长时间(秒)
+        """
+        if self._writer is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._alert_queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning("告警队列排空超时", pending_alerts=self._alert_queue.qsize())
+
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+
+        self.logger.info("告警管道已停止", **self.stats)
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取管道统计"""
+        return {
+            **self.stats,
+            "queued_alerts": self._alert_queue.qsize() if self._alert_queue else 0,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000
+        }
+
+
+    def _ensure_started(self) -> None:
+        """在当前事件循环上启动写入任务"""
+        loop = asyncio.get_running_loop()
+        if self._writer is not None and self._loop is loop and not self._writer.done():
+            return
+
+        self._loop = loop
+        self._alert_queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._writer = loop.create_task(self._run_writer())
+
+
+    async def _run_writer(self) -> None:
+        """收集告警并按批写入"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._alert_queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                # 先取走已在队列中的告警，队列为空时才等待
+                if not self._alert_queue.empty():
+                    batch.append(self._alert_queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._alert_queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._alert_queue.task_done()
+
+
+    async def _flush(self, batch: List[AlertEvent]) -> None:
+        """写入一批告警，失败时按指数退避重试整批，重试耗尽后计为失败"""
+        start = time.perf_counter()
+
+        for attempt in range(self.write_retries + 1):
+            try:
+                notifications = await self._write_batch(batch)
+                break
+            except Exception as e:
+                if attempt >= self.write_retries:
+                    self.stats["write_failures"] += len(batch)
+                    self.logger.error("告警批量写入失败", batch_size=len(batch), attempts=attempt + 1, error=str(e))
+                    return
+                self.stats["write_retries"] += 1
+                self.logger.warning("告警批量写入失败，准备重试", batch_size=len(batch), attempt=attempt + 1, error=str(e))
+                await asyncio.sleep(self.write_retry_delay * 2 ** attempt)
+
+        duration_ms = (time.perf_counter() - start) * 1000
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        self.stats["last_batch_ms"] = round(duration_ms, 2)
+        self.stats["notifications_queued"] += notifications
+
+        self.logger.debug("告警批量写入完成", batch_size=len(batch), duration_ms=round(duration_ms, 2))
+
+        if notifications:
+            self.outbox.wake()
+
+
+    async def _write_batch(self, batch: List[AlertEvent]) -> int:
+        """
+        一个事务写入一批告警及其待投递通知
+
+        Returns:
+            int: 写入的待投递通知数
+        """
+        async with self.session_factory() as session:
+            alert_ids = (await session.scalars(
+                insert(Alert).returning(Alert.id, sort_by_parameter_order=True),
+                [event.to_row() for event in batch]
+            )).all()
+
+            for event, alert_id in zip(batch, alert_ids):
+                event.alert_id = alert_id
+
+            rows = [
+                self.outbox.build_row(
+                    title=event.title,
+                    message=event.message,
+                    severity=event.severity,
+                    channels=event.channels,
+                    metadata={"alert_id": event.alert_id, "rule_id": event.rule_id, "labels": event.labels},
+                    alert_id=event.alert_id
+                )
+                for event in batch if event.channels
+            ]
+            if rows:
+                await session.execute(insert(Notification), rows)
+
+            await session.commit()
+            return len(rows)
+
+
+# 全局告警管道
+alert_pipeline = AlertPipeline()
+
+
+# 导出类
+__all__ = ["AlertEvent", "AlertPipeline", "alert_pipeline"]
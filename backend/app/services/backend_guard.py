@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后端保护 - 熔断器和自适应并发限制
+
+Prometheus过载时，原实现对每个失败请求按 1、2、4 秒退避重试，
+规则条件和看板请求的重试叠加在一起反而加重过载。本模块在每个后端前增加两层保护：
+
+1. 熔断器：连续失败达到阈值后打开，冷却期内直接拒绝请求；
+   冷却结束后进入半开状态，只放行少量探测请求，成功则关闭，失败则重新打开
+2. AIMD并发限制：正常响应时并发上限缓慢增加，超时、429/503/504 或响应过慢时成倍减小；
+   超出上限的请求排队，排队超时直接拒绝
+3. 排队时间、拒绝次数和当前上限等统计，便于观察是否在主动降载
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+T = TypeVar("T")
+
+# 请求结果分类
+SUCCESS = "success"        # 正常响应
+REJECTED = "rejected"      # 后端正常但拒绝了请求（如查询语句错误），不影响熔断和限流
+FAILURE = "failure"        # 后端故障（连接失败、5xx）
+OVERLOAD = "overload"      # 后端过载（超时、429、503、504）
+
+
+class BackendUnavailableError(RuntimeError):
+    """熔断器打开或排队超时，请求没有发出"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    状态: closed（正常）-> open（拒绝请求）-> half_open（放行探测请求）-> closed/open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+        half_open_max_calls: int = 1
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            name: 后端名称，用于日志
+            failure_threshold: 连续失败多少次后打开，默认使用 settings.PROMETHEUS_BREAKER_FAILURE_THRESHOLD
+            reset_timeout: 打开后的冷却时间(秒)，默认使用 settings.PROMETHEUS_BREAKER_RESET_SECONDS
+            half_open_max_calls: 半开状态下同时放行的探测请求数
+        """
+        self.logger = logger.bind(component="CircuitBreaker", backend=name)
+        self.failure_threshold = failure_threshold or settings.PROMETHEUS_BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else settings.PROMETHEUS_BREAKER_RESET_SECONDS
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.stats = {
+            "opened": 0,
+            "rejected": 0
+        }
+
+
+    @property
+    def state(self) -> str:
+        """当前状态，冷却结束的打开状态视为半开"""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+
+    def before_call(self) -> None:
+        """请求前检查，不允许时抛出 BackendUnavailableError"""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probes >= self.half_open_max_calls):
+            self.stats["rejected"] += 1
+            raise BackendUnavailableError("后端熔断中，请求已拒绝")
+        if state == self.HALF_OPEN:
+            self._probes += 1
+
+
+    def on_success(self) -> None:
+        """记录成功，半开状态下关闭熔断器"""
+        if self._state == self.HALF_OPEN:
+            self.logger.info("熔断器关闭")
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probes = 0
+
+
+    def on_failure(self) -> None:
+        """记录失败，达到阈值或半开探测失败时打开熔断器"""
+        self._failures += 1
+        if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self._failures >= self.failure_threshold):
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.stats["opened"] += 1
+            self.logger.warning("熔断器打开", failures=self._failures, reset_timeout=self.reset_timeout)
+
+
+    def release(self) -> None:
+        """请求被取消时归还半开探测名额，不改变状态"""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器统计"""
+        return {
+            **self.stats,
+            "state": self.state,
+            "consecutive_failures": self._failures
+        }
+
+
+class AdaptiveLimiter:
+    """
+    AIMD并发限制器
+
+    每个正常响应使上限增加 1/上限（约每一轮上限个请求增加1）；过载信号使上限乘以
+    backoff_ratio，同一时间窗口内最多减小一次，避免一批并发失败把上限压到最低。
+    等待者按先进先出获得名额；排队超时的等待者在计时回调中直接失败，不会与发放名额竞争。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: Optional[int] = None,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        slow_seconds: Optional[float] = None,
+        backoff_ratio: float = 0.5,
+        decrease_interval: float = 1.0
+    ):
+        """
+        初始化并发限制器
+
+        Args:
+            name: 后端名称，用于日志
+            initial_limit: 初始并发上限，默认使用 settings.PROMETHEUS_LIMIT_INITIAL
+            min_limit: 并发下限，默认使用 settings.PROMETHEUS_LIMIT_MIN
+            max_limit: 并发上限的最大值，默认使用 settings.PROMETHEUS_LIMIT_MAX
+            queue_timeout: 最长排队时间(秒)，默认使用 settings.PROMETHEUS_LIMIT_QUEUE_TIMEOUT
+            slow_seconds: 响应超过该时间视为过载信号，默认使用 settings.PROMETHEUS_LIMIT_SLOW_SECONDS
+            backoff_ratio: 过载时上限的缩小比例
+            decrease_interval: 两次缩小之间的最短间隔(秒)
+        """
+        self.logger = logger.bind(component="AdaptiveLimiter", backend=name)
+        self.min_limit = min_limit or settings.PROMETHEUS_LIMIT_MIN
+        self.max_limit = max_limit or settings.PROMETHEUS_LIMIT_MAX
+        self.limit = float(initial_limit or settings.PROMETHEUS_LIMIT_INITIAL)
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.PROMETHEUS_LIMIT_QUEUE_TIMEOUT
+        self.slow_seconds = slow_seconds if slow_seconds is not None else settings.PROMETHEUS_LIMIT_SLOW_SECONDS
+        self.backoff_ratio = backoff_ratio
+        self.decrease_interval = decrease_interval
+
+        self._inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = float("-inf")
+
+        self.stats = {
+            "acquired": 0,
+            "queued": 0,
+            "rejected": 0,
+            "queue_seconds_total": 0.0,
+            "queue_seconds_max": 0.0,
+            "decreases": 0
+        }
+
+
+    async def acquire(self) -> float:
+        """
+        获取并发名额
+
+        Returns:
+            float: 排队时间(秒)
+
+        Raises:
+            BackendUnavailableError: 排队超时
+        """
+        if self._inflight < int(self.limit) and not self._waiters:
+            self._inflight += 1
+            self.stats["acquired"] += 1
+            return 0.0
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        timer = loop.call_later(self.queue_timeout, self._expire, waiter)
+        queued_at = time.monotonic()
+        self.stats["queued"] += 1
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # 名额已发放但调用方被取消时归还名额
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self._release_slot()
+            raise
+        finally:
+            timer.cancel()
+
+        queue_seconds = time.monotonic() - queued_at
+        self.stats["acquired"] += 1
+        self.stats["queue_seconds_total"] += queue_seconds
+        self.stats["queue_seconds_max"] = max(self.stats["queue_seconds_max"], queue_seconds)
+        return queue_seconds
+
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        归还名额并调整上限
+
+        Args:
+            latency: 请求耗时(秒)，None 表示请求没有完成（如被取消），不调整上限
+            overloaded: 是否收到过载信号
+        """
+        if overloaded or (latency is not None and latency > self.slow_seconds):
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self._last_decrease = now
+                self.limit = max(float(self.min_limit), self.limit * self.backoff_ratio)
+                self.stats["decreases"] += 1
+                self.logger.info("并发上限减小", limit=int(self.limit))
+        elif latency is not None:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        self._release_slot()
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流统计"""
+        return {
+            **self.stats,
+            "limit": int(self.limit),
+            "inflight": self._inflight,
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done())
+        }
+
+
+    def _release_slot(self) -> None:
+        """归还名额，并按上限依次唤醒等待者"""
+        self._inflight -= 1
+        while self._waiters and self._inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._inflight += 1
+            waiter.set_result(None)
+
+
+    def _expire(self, waiter: asyncio.Future) -> None:
+        """排队超时，直接拒绝"""
+        if waiter.done():
+            return
+        self.stats["rejected"] += 1
+        waiter.set_exception(BackendUnavailableError(f"后端繁忙，排队超过{self.queue_timeout}秒"))
+
+
+class BackendGuard:
+    """
+    单个后端的熔断器和并发限制器
+
+    使用示例:
+        guard = backend_guards.get("http://prometheus:9090")
+        response = await guard.call(send_request, classify_error)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        breaker: Optional[CircuitBreaker] = None,
+        limiter: Optional[AdaptiveLimiter] = None
+    ):
+        """
+        初始化后端保护
+
+        Args:
+            name: 后端名称
+            breaker: 熔断器，默认按 settings 创建
+            limiter: 并发限制器，默认按 settings 创建
+        """
+        self.name = name
+        self.breaker = breaker or CircuitBreaker(name)
+        self.limiter = limiter or AdaptiveLimiter(name)
+
+
+    async def call(
+        self,
+        send: Callable[[], Awaitable[T]],
+        classify: Callable[[BaseException], str]
+    ) -> T:
+        """
+        经过熔断器和并发限制执行一次请求
+
+        Args:
+            send: 发送请求的协程函数
+            classify: 把异常分类为 REJECTED / FAILURE / OVERLOAD
+
+        Returns:
+            send 的返回值
+
+        Raises:
+            BackendUnavailableError: 熔断或排队超时，请求没有发出
+        """
+        self.breaker.before_call()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.release()
+            raise
+
+        started = time.monotonic()
+        outcome = None
+        try:
+            result = await send()
+            outcome = SUCCESS
+            return result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            outcome = classify(e)
+            raise
+        finally:
+            latency = time.monotonic() - started if outcome is not None else None
+            self.limiter.release(latency, overloaded=outcome == OVERLOAD)
+            if outcome in (FAILURE, OVERLOAD):
+                self.breaker.on_failure()
+            elif outcome in (SUCCESS, REJECTED):
+                self.breaker.on_success()
+            else:
+                self.breaker.release()
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取后端保护统计"""
+        return {
+            "backend": self.name,
+            "circuit_breaker": self.breaker.get_stats(),
+            "limiter": self.limiter.get_stats()
+        }
+
+
+class BackendGuardRegistry:
+    """按后端地址共享的保护实例，同一个Prometheus的所有服务实例共用熔断和限流状态"""
+
+    def __init__(self):
+        self._guards: Dict[str, BackendGuard] = {}
+
+    def get(self, name: str) -> BackendGuard:
+        """获取后端保护，不存在时创建"""
+        guard = self._guards.get(name)
+        if guard is None:
+            guard = self._guards[name] = BackendGuard(name)
+        return guard
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取所有后端的保护统计"""
+        return {name: guard.get_stats() for name, guard in self._guards.items()}
+
+
+# 全局后端保护注册表
+backend_guards = BackendGuardRegistry()
+
+
+# 导出类
+__all__ = [
+    "AdaptiveLimiter",
+    "BackendGuard",
+    "BackendGuardRegistry",
+    "BackendUnavailableError",
+    "CircuitBreaker",
+    "backend_guards",
+    "SUCCESS",
+    "REJECTED",
+    "FAILURE",
+    "OVERLOAD"
+]
@@ -5,23 +5,136 @@
 
 提供配置的数据库存储和管理功能
 支持Prometheus、AI等各类配置的CRUD操作
+
+当前使用的Prometheus、Ollama和数据库配置缓存在进程内：
+本进程的写操作立即使缓存失效；其他进程的写操作通过定期查询配置表的
+变更标记（行数、最新更新时间、默认配置ID）发现，热点接口无需每次查询数据库。
 """
 
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Awaitable, Callable, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, func, case
 from sqlalchemy.orm import selectinload
 import structlog
 
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
 from app.models.config import SystemConfig, PrometheusConfig, OllamaConfig, DatabaseConfig, AIConfig
 
 logger = structlog.get_logger(__name__)
 
 
+# 缓存的配置类型及对应的配置表
+_CACHED_MODELS = {
+    "prometheus": PrometheusConfig,
+    "ollama": OllamaConfig,
+    "database": DatabaseConfig
+}
+
+
 class ConfigDBService:
     """配置数据库服务"""
     
+    def __init__(self, poll_interval: Optional[float] = None):
+        """
+        初始化配置数据库服务
+        
+        Args:
+            poll_interval: 检查其他进程配置变更的间隔(秒)，默认使用 settings.CONFIG_CACHE_POLL_INTERVAL
+        """
+        self.poll_interval = poll_interval if poll_interval is not None else settings.CONFIG_CACHE_POLL_INTERVAL
+        
+        # 配置类型 -> 版本号，写操作或发现外部变更时递增
+        self._versions: Dict[str, int] = {kind: 0 for kind in _CACHED_MODELS}
+        # 配置类型 -> (缓存时的版本号, 当前配置)
+        self._cache: Dict[str, Tuple[int, Optional[Dict[str, Any]]]] = {}
+        # 配置类型 -> 最近一次查询到的变更标记及查询时间
+        self._stamps: Dict[str, Tuple[Any, ...]] = {}
+        self._checked_at: Dict[str, float] = {}
+        
+        self.cache_stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "external_changes": 0
+        }
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取配置缓存统计"""
+        return {
+            **self.cache_stats,
+            "versions": dict(self._versions),
+            "cached": sorted(self._cache),
+            "poll_interval": self.poll_interval
+        }
+    
+    def invalidate_cache(self, kind: Optional[str] = None) -> None:
+        """使配置缓存失效，未指定类型时全部失效"""
+        for name in ([kind] if kind else list(_CACHED_MODELS)):
+            self._versions[name] += 1
+            self._cache.pop(name, None)
+            # 下次读取时重新记录变更标记，本进程的写入不再被当作外部变更
+            self._stamps.pop(name, None)
+            self._checked_at.pop(name, None)
+            self.cache_stats["invalidations"] += 1
+    
+    async def _get_cached(
+        self,
+        kind: str,
+        loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的当前配置，版本变化后重新加载
+        
+        加载期间发生写操作时结果不写入缓存，避免旧配置覆盖新版本。
+        """
+        await self._poll_changes(kind)
+        
+        version = self._versions[kind]
+        cached = self._cache.get(kind)
+        if cached is not None and cached[0] == version:
+            self.cache_stats["hits"] += 1
+            value = cached[1]
+        else:
+            self.cache_stats["misses"] += 1
+            value = await loader()
+            if self._versions[kind] == version:
+                self._cache[kind] = (version, value)
+        
+        return dict(value) if value is not None else None
+    
+    async def _poll_changes(self, kind: str) -> None:
+        """按间隔查询配置表的变更标记，发现其他进程的写入时递增版本"""
+        now = time.monotonic()
+        if kind in self._checked_at and now - self._checked_at[kind] < self.poll_interval:
+            return
+        self._checked_at[kind] = now
+        
+        model = _CACHED_MODELS[kind]
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(
+                        func.count(model.id),
+                        func.max(model.updated_at),
+                        func.max(case((model.is_default == True, model.id)))
+                    )
+                )
+                stamp = tuple(result.one())
+        except Exception as e:
+            logger.warning("检查配置变更失败", kind=kind, error=str(e))
+            self._versions[kind] += 1
+            self._stamps.pop(kind, None)
+            return
+        
+        previous = self._stamps.get(kind)
+        self._stamps[kind] = stamp
+        if previous is not None and previous != stamp:
+            self._versions[kind] += 1
+            self.cache_stats["external_changes"] += 1
+            logger.info("检测到配置变更", kind=kind, version=self._versions[kind])
+    
     async def get_prometheus_configs(self) -> List[Dict[str, Any]]:
         """获取所有Prometheus配置"""
         async with AsyncSessionLocal() as db:
@@ -49,7 +162,11 @@ class ConfigDBService:
             ]
     
     async def get_default_prometheus_config(self) -> Optional[Dict[str, Any]]:
-        """获取默认Prometheus配置"""
+        """获取默认Prometheus配置（进程内缓存）"""
+        return await self._get_cached("prometheus", self._load_default_prometheus_config)
+    
+    async def _load_default_prometheus_config(self) -> Optional[Dict[str, Any]]:
+        """从数据库读取默认Prometheus配置"""
         async with AsyncSessionLocal() as db:
             result = await db.execute(
                 select(PrometheusConfig).where(PrometheusConfig.is_default == True)
@@ -193,6 +310,8 @@ class ConfigDBService:
                 "success": False,
                 "message": f"配置保存失败: {str(e)}"
             }
+        finally:
+            self.invalidate_cache("prometheus")
     
     async def set_current_prometheus_config(self, config_id: int) -> Dict[str, Any]:
         """设置当前使用的Prometheus配置"""
@@ -244,6 +363,8 @@ class ConfigDBService:
             }
             logger.info("准备返回错误结果", result=error_result)
             return error_result
+        finally:
+            self.invalidate_cache("prometheus")
     
     async def get_ai_configs(self) -> List[Dict[str, Any]]:
         """获取所有AI配置"""
@@ -411,6 +532,8 @@ class ConfigDBService:
             logger.error("删除配置失败", error=str(e))
             await db.rollback()
             raise
+        finally:
+            self.invalidate_cache("prometheus")
 
     async def clear_config_history(self):
         """清空配置历史（保留当前配置）"""
@@ -429,6 +552,8 @@ class ConfigDBService:
             logger.error("清空配置历史失败", error=str(e))
             await db.rollback()
             raise
+        finally:
+            self.invalidate_cache("prometheus")
 
     # ==================== Ollama配置管理 ====================
     
@@ -524,38 +649,44 @@ class ConfigDBService:
                 "success": False,
                 "message": f"配置保存失败: {str(e)}"
             }
+        finally:
+            self.invalidate_cache("ollama")
     
     async def get_default_ollama_config(self) -> Dict[str, Any]:
-        """获取默认Ollama配置"""
+        """获取默认Ollama配置（进程内缓存）"""
         try:
-            async with AsyncSessionLocal() as db:
-                result = await db.execute(
-                    select(OllamaConfig).where(OllamaConfig.is_default == True)
-                )
-                config = result.scalar_one_or_none()
-                
-                if config:
-                    # 确保配置名称存在且有效
-                    name = config.name
-                    if not name or name.strip() == "" or "?" in name:
-                        name = "默认Ollama配置"
-                    
-                    return {
-                        "name": name,
-                        "enabled": config.is_enabled,
-                        "apiUrl": config.api_url,
-                        "model": config.model,
-                        "timeout": config.timeout,
-                        "maxTokens": config.max_tokens,
-                        "temperature": config.temperature,
-                        "id": config.id,
-                        "updatedAt": config.updated_at.isoformat() if config.updated_at else None
-                    }
-                return None
+            return await self._get_cached("ollama", self._load_default_ollama_config)
         except Exception as e:
             logger.error("获取默认Ollama配置失败", error=str(e))
             return None
     
+    async def _load_default_ollama_config(self) -> Optional[Dict[str, Any]]:
+        """从数据库读取默认Ollama配置"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(OllamaConfig).where(OllamaConfig.is_default == True)
+            )
+            config = result.scalar_one_or_none()
+            
+            if config:
+                # 确保配置名称存在且有效
+                name = config.name
+                if not name or name.strip() == "" or "?" in name:
+                    name = "默认Ollama配置"
+                
+                return {
+                    "name": name,
+                    "enabled": config.is_enabled,
+                    "apiUrl": config.api_url,
+                    "model": config.model,
+                    "timeout": config.timeout,
+                    "maxTokens": config.max_tokens,
+                    "temperature": config.temperature,
+                    "id": config.id,
+                    "updatedAt": config.updated_at.isoformat() if config.updated_at else None
+                }
+            return None
+    
     async def get_all_ollama_configs(self) -> List[Dict[str, Any]]:
         """获取所有Ollama配置"""
         try:
@@ -629,6 +760,8 @@ class ConfigDBService:
                 "success": False,
                 "message": f"设置当前配置失败: {str(e)}"
             }
+        finally:
+            self.invalidate_cache("ollama")
 
     # ==================== 数据库配置管理 ====================
 
@@ -725,52 +858,13 @@ class ConfigDBService:
                 "success": False,
                 "message": f"配置保存失败: {str(e)}"
             }
+        finally:
+            self.invalidate_cache("database")
 
     async def get_default_database_config(self) -> Dict[str, Any]:
-        """获取默认数据库配置"""
+        """获取默认数据库配置（进程内缓存）"""
         try:
-            async with AsyncSessionLocal() as db:
-                # 首先尝试获取默认配置
-                result = await db.execute(
-                    select(DatabaseConfig).where(DatabaseConfig.is_default == True)
-                )
-                config = result.scalars().first()
-                
-                if not config:
-                    # 如果没有默认配置，获取最新的一个
-                    result = await db.execute(
-                        select(DatabaseConfig).order_by(DatabaseConfig.updated_at.desc())
-                    )
-                    config = result.scalars().first()
-                
-                if config:
-                    # 确保名称不为空或异常
-                    config_name = config.name
-                    if not config_name or config_name.strip() == "" or "?" in config_name:
-                        config_name = "默认数据库配置"
-                    
-                    return {
-                        "id": config.id,
-                        "name": config_name,
-                        "host": config.host,
-                        "port": config.port,
-                        "database": config.database_name,
-                        "username": config.username,
-                        "password": config.password,
-                        "ssl": config.ssl_enabled,
-                        "connectionTimeout": config.connection_timeout,
-                        "queryTimeout": config.query_timeout,
-                        "poolSize": config.pool_size,
-                        "backupEnabled": config.backup_enabled,
-                        "backupSchedule": config.backup_schedule,
-                        "backupRetention": config.backup_retention,
-                        "backupPath": config.backup_path,
-                        "enabled": config.is_enabled,
-                        "isDefault": config.is_default,
-                        "updatedAt": config.updated_at.isoformat() if config.updated_at else None
-                    }
-                    
-                return None
+            return await self._get_cached("database", self._load_default_database_config)
                 
         except Exception as e:
             logger.error("获取默认数据库配置失败", error=str(e))
@@ -807,6 +901,51 @@ class ConfigDBService:
             
             return None
 
+    async def _load_default_database_config(self) -> Optional[Dict[str, Any]]:
+        """从数据库读取默认数据库配置，没有默认配置时使用最新的一个"""
+        async with AsyncSessionLocal() as db:
+            # 首先尝试获取默认配置
+            result = await db.execute(
+                select(DatabaseConfig).where(DatabaseConfig.is_default == True)
+            )
+            config = result.scalars().first()
+            
+            if not config:
+                # 如果没有默认配置，获取最新的一个
+                result = await db.execute(
+                    select(DatabaseConfig).order_by(DatabaseConfig.updated_at.desc())
+                )
+                config = result.scalars().first()
+            
+            if config:
+                # 确保名称不为空或异常
+                config_name = config.name
+                if not config_name or config_name.strip() == "" or "?" in config_name:
+                    config_name = "默认数据库配置"
+                
+                return {
+                    "id": config.id,
+                    "name": config_name,
+                    "host": config.host,
+                    "port": config.port,
+                    "database": config.database_name,
+                    "username": config.username,
+                    "password": config.password,
+                    "ssl": config.ssl_enabled,
+                    "connectionTimeout": config.connection_timeout,
+                    "queryTimeout": config.query_timeout,
+                    "poolSize": config.pool_size,
+                    "backupEnabled": config.backup_enabled,
+                    "backupSchedule": config.backup_schedule,
+                    "backupRetention": config.backup_retention,
+                    "backupPath": config.backup_path,
+                    "enabled": config.is_enabled,
+                    "isDefault": config.is_default,
+                    "updatedAt": config.updated_at.isoformat() if config.updated_at else None
+                }
+                
+            return None
+
     async def get_all_database_configs(self) -> List[Dict[str, Any]]:
         """获取所有数据库配置"""
         try:
@@ -906,6 +1045,8 @@ class ConfigDBService:
                 "success": False,
                 "message": f"设置当前配置失败: {str(e)}"
             }
+        finally:
+            self.invalidate_cache("database")
 
 
 # 全局配置数据库服务实例
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异常检测执行器 - CPU密集型计算的进程池调度层
+
+sklearn/pandas/numpy 计算会长时间占用CPU，如果直接在uvicorn事件循环中
+执行，模型训练期间所有请求（包括 /health）都会被阻塞。本模块将检测任务
+提交到独立的工作进程执行，事件循环只负责等待结果。
+
+功能特性:
+1. 进程池大小由 settings.AI_MAX_WORKERS 控制
+2. NumPy数组通过共享内存传递，避免大矩阵的序列化拷贝
+3. 有界排队与背压，队列满时快速拒绝
+4. 队列深度、等待时间等运行指标统计
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# 共享内存数组描述: (共享内存名称, 数组形状, dtype字符串)
+SharedArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+def _run_with_shared_arrays(
+    func: Callable[..., Any],
+    array_specs: Dict[str, SharedArraySpec],
+    kwargs: Dict[str, Any]
+) -> Any:
+    """
+    工作进程入口：挂载共享内存数组后执行检测函数
+
+    数组以只读视图的形式传给 func，func 的返回值不能引用这些视图
+    （需要返回新数组），否则共享内存无法安全关闭。
+
+    Args:
+        func: 模块级检测函数
+        array_specs: 数组参数名到共享内存描述的映射
+        kwargs: 其他关键字参数
+
+    Returns:
+        Any: 检测函数的返回值
+    """
+    segments = []
+    arrays = {}
+    try:
+        for arg_name, (shm_name, shape, dtype) in array_specs.items():
+            segment = shared_memory.SharedMemory(name=shm_name)
+            segments.append(segment)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+            array.flags.writeable = False
+            arrays[arg_name] = array
+
+        return func(**arrays, **kwargs)
+    finally:
+        # 先释放数组视图，再关闭共享内存
+        arrays.clear()
+        for segment in segments:
+            segment.close()
+
+
+class DetectionExecutor:
+    """
+    异常检测执行器
+
+    将CPU密集型检测函数调度到进程池中执行，
+    通过共享内存传递NumPy数组并对排队任务施加背压。
+
+    核心功能:
+    1. 惰性创建进程池，工作进程崩溃后自动重建
+    2. 数组参数写入共享内存，工作进程零拷贝读取
+    3. 排队上限和等待超时，防止任务无限堆积
+    4. 队列深度、拒绝数、平均等待时间统计
+
+    使用示例:
+        executor = DetectionExecutor()
+
+        scores, labels = await executor.submit(
+            _batch_z_score_kernel,
+            arrays={"values": matrix},
+            sensitivity=0.8,
+            threshold=None
+        )
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue_depth: Optional[int] = None,
+        queue_timeout: Optional[float] = None
+    ):
+        """
+        初始化检测执行器
+
+        Args:
+            max_workers: 工作进程数，默认使用 settings.AI_MAX_WORKERS
+            max_queue_depth: 最大排队任务数，默认使用 settings.AI_MAX_QUEUE_DEPTH
+            queue_timeout: 排队等待超时(秒)，默认使用 settings.AI_QUEUE_TIMEOUT
+        """
+        self.logger = logger.bind(component="DetectionExecutor")
+
+        self.max_workers = max(1, max_workers or settings.AI_MAX_WORKERS)
+        self.max_queue_depth = max_queue_depth if max_queue_depth is not None else settings.AI_MAX_QUEUE_DEPTH
+        self.queue_timeout = queue_timeout if queue_timeout is not None else settings.AI_QUEUE_TIMEOUT
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # 并发槽位 = 正在执行的任务 + 允许排队的任务，按事件循环惰性创建
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 运行状态
+        self._in_flight = 0
+        self._waiting = 0
+
+        # 执行统计
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "total_queue_wait": 0.0,
+            "total_execution_time": 0.0
+        }
+
+        self.logger.info(
+            "异常检测执行器初始化完成",
+            max_workers=self.max_workers,
+            max_queue_depth=self.max_queue_depth,
+            queue_timeout=self.queue_timeout
+        )
+
+
+    @property
+    def queue_depth(self) -> int:
+        """已提交但尚未分配到工作进程的任务数"""
+        return max(0, self._in_flight - self.max_workers) + self._waiting
+
+
+    async def submit(
+        self,
+        func: Callable[..., Any],
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+        **kwargs: Any
+    ) -> Any:
+        """
+        提交检测任务到进程池
+
+        Args:
+            func: 模块级（可被pickle的）检测函数
+            arrays: 通过共享内存传递的NumPy数组参数
+            **kwargs: 其他关键字参数，按常规方式序列化传递
+
+        Returns:
+            Any: 检测函数的返回值
+
+        Raises:
+            RuntimeError: 当排队已满且等待超时时
+        """
+        slots = self._get_slots()
+
+        wait_start = time.time()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            self.logger.warning(
+                "检测任务排队超时，拒绝执行",
+                queue_depth=self.queue_depth,
+                queue_timeout=self.queue_timeout
+            )
+            raise RuntimeError(f"异常检测任务队列已满，等待超过{self.queue_timeout}秒")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        self.stats["submitted"] += 1
+        self.stats["total_queue_wait"] += time.time() - wait_start
+
+        segments: List[shared_memory.SharedMemory] = []
+        execution_start = time.time()
+        try:
+            array_specs = {}
+            for arg_name, array in (arrays or {}).items():
+                array = np.ascontiguousarray(array)
+                segment = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                segments.append(segment)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                array_specs[arg_name] = (segment.name, array.shape, array.dtype.str)
+
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._get_pool(), _run_with_shared_arrays, func, array_specs, kwargs
+            )
+
+            self.stats["completed"] += 1
+            return result
+
+        except BrokenProcessPool as e:
+            self.stats["failed"] += 1
+            self.logger.error("检测进程池异常，将在下次提交时重建", error=str(e))
+            self._pool = None
+            raise RuntimeError(f"检测工作进程异常退出: {str(e)}")
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.stats["total_execution_time"] += time.time() - execution_start
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+            self._in_flight -= 1
+            slots.release()
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取执行器运行指标
+
+        Returns:
+            Dict: 队列深度、并发数和累计统计
+        """
+        finished = self.stats["completed"] + self.stats["failed"]
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_depth": self.max_queue_depth,
+            "queue_depth": self.queue_depth,
+            "in_flight": self._in_flight,
+            "submitted": self.stats["submitted"],
+            "completed": self.stats["completed"],
+            "failed": self.stats["failed"],
+            "rejected": self.stats["rejected"],
+            "average_queue_wait_ms": round(
+                self.stats["total_queue_wait"] / self.stats["submitted"] * 1000, 2
+            ) if self.stats["submitted"] else 0.0,
+            "average_execution_ms": round(
+                self.stats["total_execution_time"] / finished * 1000, 2
+            ) if finished else 0.0
+        }
+
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        关闭进程池
+
+        Args:
+            wait: 是否等待正在执行的任务完成
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+            self._pool = None
+            self.logger.info("异常检测进程池已关闭")
+
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """获取进程池，首次使用或崩溃后重新创建"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            self.logger.info("异常检测进程池已创建", max_workers=self.max_workers)
+        return self._pool
+
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """获取当前事件循环上的并发槽位信号量"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue_depth)
+            self._slots_loop = loop
+        return self._slots
+
+
+# 全局检测执行器实例
+detection_executor = DetectionExecutor()
+
+
+# 导出类
+__all__ = ["DetectionExecutor", "detection_executor"]
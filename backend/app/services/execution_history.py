@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则执行历史 - 固定内存的执行记录与滚动统计
+
+执行历史原来保存在列表中，超过1000条后切片保留500条，
+统计接口每次都要多次遍历整个列表计算24小时内的指标。
+本模块用固定长度的环形缓冲区保存最近的执行结果，
+同时按分钟汇总计数，滚动窗口内的合计随写入和过期增量维护，
+统计查询为常数时间，内存占用与执行次数无关。
+
+功能特性:
+1. 环形缓冲区保存最近N条执行结果
+2. 按分钟汇总执行数、触发数、成功数和耗时
+3. 滚动窗口合计增量维护，过期分钟桶按时间顺序移出
+4. 累计统计（自进程启动以来）
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional
+
+from app.models.schemas import RuleExecutionResult
+
+# 分钟桶字段下标
+_MINUTE, _EXECUTIONS, _TRIGGERED, _SUCCESSFUL, _DURATION_MS = range(5)
+
+
+class ExecutionHistory:
+    """
+    规则执行历史
+
+    使用示例:
+        history = ExecutionHistory(max_results=1000, window_minutes=1440)
+
+        history.record(result)
+        summary = history.window_summary()
+        recent = history.recent(50)
+    """
+
+    def __init__(self, max_results: int = 1000, window_minutes: int = 1440):
+        """
+        初始化执行历史
+
+        Args:
+            max_results: 保留的最近执行结果条数
+            window_minutes: 滚动统计窗口（分钟），默认24小时
+        """
+        self.window_minutes = window_minutes
+        self._results: Deque[RuleExecutionResult] = deque(maxlen=max_results)
+
+        # 分钟桶按时间顺序排列：[分钟, 执行数, 触发数, 成功数, 总耗时毫秒]
+        self._buckets: Deque[List[float]] = deque()
+        self._window = [0, 0, 0, 0, 0.0]
+
+        self.totals = {
+            "total_executions": 0,
+            "successful_executions": 0,
+            "failed_executions": 0,
+            "triggered_rules": 0
+        }
+
+    def record(self, result: RuleExecutionResult, now: Optional[float] = None) -> None:
+        """
+        记录一次执行结果
+
+        Args:
+            result: 规则执行结果
+            now: 记录时间戳(秒)，默认当前时间
+        """
+        now = time.time() if now is None else now
+        minute = int(now // 60)
+        successful = "error" not in result.metadata
+
+        self._results.append(result)
+
+        self.totals["total_executions"] += 1
+        self.totals["successful_executions" if successful else "failed_executions"] += 1
+        self.totals["triggered_rules"] += int(result.triggered)
+
+        if not self._buckets or self._buckets[-1][_MINUTE] != minute:
+            self._buckets.append([minute, 0, 0, 0, 0.0])
+        bucket = self._buckets[-1]
+
+        delta = (1, int(result.triggered), int(successful), result.duration_ms)
+        for index, value in enumerate(delta, start=_EXECUTIONS):
+            bucket[index] += value
+            self._window[index] += value
+
+        self._expire(minute)
+
+    def window_summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        滚动窗口内的执行统计
+
+        Args:
+            now: 当前时间戳(秒)，默认当前时间
+
+        Returns:
+            Dict: 执行数、触发数、平均耗时和成功率
+        """
+        now = time.time() if now is None else now
+        self._expire(int(now // 60))
+
+        executions = self._window[_EXECUTIONS]
+        return {
+            "total_executions": executions,
+            "triggered_executions": self._window[_TRIGGERED],
+            "average_duration_ms": self._window[_DURATION_MS] / executions if executions else 0,
+            "success_rate": self._window[_SUCCESSFUL] / executions if executions else 0
+        }
+
+    def recent(self, limit: Optional[int] = None) -> List[RuleExecutionResult]:
+        """
+        最近的执行结果，按时间倒序
+
+        Args:
+            limit: 返回条数上限
+
+        Returns:
+            List[RuleExecutionResult]: 执行结果列表
+        """
+        return list(islice(reversed(self._results), limit))
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def _expire(self, current_minute: int) -> None:
+        """移出窗口外的分钟桶，并从窗口合计中减去"""
+        oldest = current_minute - self.window_minutes
+        while self._buckets and self._buckets[0][_MINUTE] <= oldest:
+            bucket = self._buckets.popleft()
+            for index in range(_EXECUTIONS, _DURATION_MS + 1):
+                self._window[index] -= bucket[index]
+        if not self._buckets:
+            # 窗口清空时归零，避免耗时累计的浮点误差
+            self._window = [0, 0, 0, 0, 0.0]
+
+
+# 导出类
+__all__ = ["ExecutionHistory"]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端注册表 - 按目标服务复用连接池
+
+Prometheus配置端点每个请求新建一个 aiohttp.ClientSession，服务状态检查使用阻塞的
+requests.get，PrometheusService 又各自持有 httpx.AsyncClient；每个请求都要重新建立
+TCP（和TLS）连接，阻塞调用还会卡住事件循环。本模块：
+
+1. 按 (服务地址, 认证信息, 超时) 为每个目标维护一个长期存在的 httpx.AsyncClient
+2. 保持空闲连接复用，安装了 h2 时启用HTTP/2多路复用
+3. 客户端按事件循环惰性创建，由应用生命周期统一关闭
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# (服务地址, 用户名, 密码, 超时)
+ClientKey = Tuple[str, Optional[str], Optional[str], float]
+
+
+class HTTPClientRegistry:
+    """
+    共享HTTP客户端注册表
+
+    调用方每次请求前通过 get() 取客户端，不要自行关闭；
+    其他事件循环上创建的客户端不能复用，切换事件循环时丢弃。
+
+    使用示例:
+        client = http_clients.get("http://prometheus:9090", timeout=30)
+        response = await client.get("http://prometheus:9090/api/v1/query", params=params)
+
+        await http_clients.aclose_all()
+    """
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None
+    ):
+        """
+        初始化HTTP客户端注册表
+
+        Args:
+            max_connections: 每个客户端的最大连接数，默认使用 settings.HTTP_POOL_MAX_CONNECTIONS
+            max_keepalive_connections: 每个客户端保留的空闲连接数，默认使用 settings.HTTP_POOL_MAX_KEEPALIVE
+            keepalive_expiry: 空闲连接保留时间(秒)，默认使用 settings.HTTP_POOL_KEEPALIVE_EXPIRY
+            http2: 是否启用HTTP/2，默认使用 settings.HTTP_POOL_HTTP2；未安装 h2 时始终关闭
+        """
+        self.logger = logger.bind(component="HTTPClientRegistry")
+        self.limits = httpx.Limits(
+            max_connections=max_connections or settings.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or settings.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=keepalive_expiry if keepalive_expiry is not None else settings.HTTP_POOL_KEEPALIVE_EXPIRY
+        )
+        http2 = settings.HTTP_POOL_HTTP2 if http2 is None else http2
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+
+        self._clients: Dict[ClientKey, httpx.AsyncClient] = {}
+        self._clients_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.clients_created = 0
+
+
+    def get(
+        self,
+        base_url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        timeout: float = 30.0
+    ) -> httpx.AsyncClient:
+        """
+        获取目标服务对应的共享客户端
+
+        Args:
+            base_url: 服务地址
+            username: Basic认证用户名
+            password: Basic认证密码
+            timeout: 默认请求超时(秒)，单次请求可以覆盖
+
+        Returns:
+            httpx.AsyncClient: 共享客户端
+        """
+        self._check_loop()
+        key = self._key(base_url, username, password, timeout)
+
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                auth=(username, password or "") if username else None,
+                timeout=httpx.Timeout(timeout),
+                limits=self.limits,
+                http2=self.http2
+            )
+            self._clients[key] = client
+            self.clients_created += 1
+            self.logger.debug("创建共享HTTP客户端", base_url=key[0], http2=self.http2)
+        return client
+
+
+    async def close(
+        self,
+        base_url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        timeout: float = 30.0
+    ) -> None:
+        """关闭并移除目标服务对应的客户端，参数与 get() 相同"""
+        client = self._clients.pop(self._key(base_url, username, password, timeout), None)
+        if client is not None:
+            await client.aclose()
+
+
+    async def aclose_all(self) -> None:
+        """关闭所有客户端"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                self.logger.warning("关闭HTTP客户端失败", error=str(e))
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取客户端统计"""
+        return {
+            "clients": len(self._clients),
+            "clients_created": self.clients_created,
+            "http2": self.http2
+        }
+
+
+    @staticmethod
+    def _key(base_url: str, username: Optional[str], password: Optional[str], timeout: float) -> ClientKey:
+        """客户端键，地址去掉末尾斜杠"""
+        return (str(base_url).rstrip("/"), username or None, password or None, float(timeout))
+
+
+    def _check_loop(self) -> None:
+        """切换事件循环时丢弃旧客户端，其连接属于原事件循环"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._clients_loop is not loop:
+            self._clients = {}
+            self._clients_loop = loop
+
+
+# 全局HTTP客户端注册表
+http_clients = HTTPClientRegistry()
+
+
+# 导出类
+__all__ = ["HTTPClientRegistry", "http_clients"]
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时查询中心 - 多个订阅者共享同一个Prometheus轮询
+
+前端实时图表反复调用 /metrics/query_range，每次都重新获取和序列化整个时间窗口，
+N 个看板就是 N 倍的完整窗口查询。本模块：
+
+1. 相同的 (PromQL, 步长) 只订阅一次，由一个后台轮询任务按步长对齐的节拍查询Prometheus
+2. 每个节拍只查询上次之后的新时间段，并按序列过滤掉已推送的数据点
+3. 新数据只序列化一次，同一个SSE事件文本放入所有订阅者的队列
+4. 订阅者消费过慢时丢弃其最旧的事件，不阻塞轮询和其他订阅者
+5. 最后一个订阅者离开后停止轮询
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import json
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.services.prometheus_registry import prometheus_services
+from app.services.query_cache import parse_step_seconds
+
+logger = structlog.get_logger(__name__)
+
+# (PromQL, 步长秒数)
+LiveQueryKey = Tuple[str, int]
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """编码一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+class LiveSubscription:
+    """单个订阅者，事件为已编码的SSE文本"""
+
+    def __init__(self, key: LiveQueryKey, queue_size: int):
+        self.key = key
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def push(self, message: str) -> None:
+        """放入事件，队列已满时丢弃最旧的事件"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        等待下一条事件
+
+        Returns:
+            Optional[str]: SSE事件文本，超时返回 None
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class _LiveQuery:
+    """一个唯一查询的轮询任务和订阅者"""
+
+    def __init__(self, key: LiveQueryKey, interval: float):
+        self.key = key
+        self.interval = interval
+        self.subscribers: Set[LiveSubscription] = set()
+        self.task: Optional[asyncio.Task] = None
+        self.last_end: Optional[int] = None
+        self.last_sent: Dict[Any, float] = {}
+        self.ticks = 0
+
+
+class LiveQueryHub:
+    """
+    实时查询中心
+
+    使用示例:
+        subscription = live_query_hub.subscribe("up", "15s")
+        try:
+            message = await subscription.get(timeout=15)
+        finally:
+            live_query_hub.unsubscribe(subscription)
+    """
+
+    def __init__(
+        self,
+        service: Any = None,
+        min_interval: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        max_queries: Optional[int] = None
+    ):
+        """
+        初始化实时查询中心
+
+        Args:
+            service: Prometheus服务，默认跟随当前配置
+            min_interval: 最短轮询间隔(秒)，默认使用 settings.LIVE_QUERY_MIN_INTERVAL
+            queue_size: 每个订阅者的事件队列长度，默认使用 settings.LIVE_QUERY_QUEUE_SIZE
+            max_queries: 同时轮询的唯一查询数上限，默认使用 settings.LIVE_QUERY_MAX_QUERIES
+        """
+        self.logger = logger.bind(component="LiveQueryHub")
+        self.service = service if service is not None else prometheus_services.active()
+        self.min_interval = min_interval if min_interval is not None else settings.LIVE_QUERY_MIN_INTERVAL
+        self.queue_size = queue_size or settings.LIVE_QUERY_QUEUE_SIZE
+        self.max_queries = max_queries or settings.LIVE_QUERY_MAX_QUERIES
+
+        self._queries: Dict[LiveQueryKey, _LiveQuery] = {}
+        self.stats = {
+            "upstream_queries": 0,
+            "upstream_errors": 0,
+            "events_published": 0
+        }
+
+
+    def subscribe(self, query: str, step: str = "15s") -> LiveSubscription:
+        """
+        订阅一个查询的新数据点，相同查询和步长共享轮询
+
+        Args:
+            query: PromQL查询语句
+            step: 步长
+
+        Returns:
+            LiveSubscription: 订阅者
+
+        Raises:
+            ValueError: 步长格式无效
+            RuntimeError: 唯一查询数达到上限
+        """
+        key = (query.strip(), parse_step_seconds(step))
+        live = self._queries.get(key)
+        if live is None:
+            if len(self._queries) >= self.max_queries:
+                raise RuntimeError(f"实时查询数已达上限{self.max_queries}")
+            live = self._queries[key] = _LiveQuery(key, max(float(key[1]), self.min_interval))
+            live.task = asyncio.get_running_loop().create_task(self._run(live))
+            self.logger.info("开始实时查询", query=key[0], step=key[1])
+
+        subscription = LiveSubscription(key, self.queue_size)
+        live.subscribers.add(subscription)
+        return subscription
+
+
+    def unsubscribe(self, subscription: LiveSubscription) -> None:
+        """取消订阅，最后一个订阅者离开时停止轮询"""
+        live = self._queries.get(subscription.key)
+        if live is None:
+            return
+        live.subscribers.discard(subscription)
+        if not live.subscribers:
+            del self._queries[subscription.key]
+            live.task.cancel()
+            self.logger.info("停止实时查询", query=live.key[0], step=live.key[1])
+
+
+    async def close(self) -> None:
+        """停止所有轮询任务"""
+        queries, self._queries = self._queries, {}
+        tasks = [live.task for live in queries.values()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取实时查询统计"""
+        return {
+            **self.stats,
+            "queries": len(self._queries),
+            "subscribers": sum(len(live.subscribers) for live in self._queries.values()),
+            "dropped_events": sum(
+                subscription.dropped
+                for live in self._queries.values()
+                for subscription in live.subscribers
+            )
+        }
+
+
+    async def _run(self, live: _LiveQuery) -> None:
+        """按间隔轮询，单次失败只通知订阅者，不停止轮询"""
+        while True:
+            started = time.monotonic()
+            try:
+                await self._tick(live)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["upstream_errors"] += 1
+                self.logger.warning("实时查询失败", query=live.key[0], error=str(e))
+                self._publish(live, format_event("error", {"query": live.key[0], "error": str(e)}))
+            await asyncio.sleep(max(0.0, live.interval - (time.monotonic() - started)))
+
+
+    async def _tick(self, live: _LiveQuery) -> None:
+        """查询上次之后的新时间段，推送每条序列未推送过的数据点"""
+        query, step = live.key
+        end = math.floor(time.time() / step) * step
+        start = live.last_end + step if live.last_end is not None else end - step
+        if start > end:
+            return
+
+        result = await self.service.query_range(
+            query,
+            datetime.fromtimestamp(start),
+            datetime.fromtimestamp(end),
+            step=f"{step}s",
+            columnar=True
+        )
+        self.stats["upstream_queries"] += 1
+        live.last_end = end
+        live.ticks += 1
+
+        # 只保留本次结果中的序列，已消失的序列（如实例下线）不再占用内存
+        series = []
+        last_sent_by_key: Dict[Any, float] = {}
+        for item in result.series:
+            key = item.series_key
+            last_sent = live.last_sent.get(key)
+            mask = item.timestamps > last_sent if last_sent is not None else slice(None)
+            timestamps = item.timestamps[mask]
+            if not len(timestamps):
+                if last_sent is not None:
+                    last_sent_by_key[key] = last_sent
+                continue
+            last_sent_by_key[key] = float(timestamps[-1])
+            series.append({
+                "metric_name": item.metric_name,
+                "labels": item.labels,
+                "timestamps": timestamps.tolist(),
+                "values": [None if math.isnan(value) else value for value in item.values[mask].tolist()]
+            })
+
+        live.last_sent = last_sent_by_key
+
+        if series:
+            self._publish(live, format_event("samples", {"query": query, "step": step, "end": end, "series": series}))
+
+
+    def _publish(self, live: _LiveQuery, message: str) -> None:
+        """同一条已编码事件放入所有订阅者的队列"""
+        for subscription in live.subscribers:
+            subscription.push(message)
+        self.stats["events_published"] += 1
+
+
+# 全局实时查询中心
+live_query_hub = LiveQueryHub()
+
+
+# 导出类
+__all__ = ["LiveQueryHub", "LiveSubscription", "format_event", "live_query_hub"]
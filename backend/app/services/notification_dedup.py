@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知去重索引 - 固定长度指纹和最小堆过期
+
+原去重以完整的标题和内容字符串为键，每次发送前遍历整个字典清理过期记录，
+告警风暴期间每条通知的去重开销与近期通知数成正比；
+内容中的数值变化（如 "CPU 95%" 变为 "CPU 96%"）也会使同一告警无法去重。
+
+本模块：
+1. 对规范化后的标题、标签和严重程度计算16字节 blake2b 指纹
+2. 有标签时指纹不包含内容，数值变化的同一告警仍然去重；
+   没有标签时内容中的数字被掩码后参与指纹
+3. 过期时间放入最小堆，只从堆顶弹出到期记录，检查和写入均为 O(log n)
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import hashlib
+import heapq
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.models.schemas import AlertSeverity
+
+# 数字（含小数和百分号前的数值）统一掩码
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    """小写并合并空白"""
+    return _WHITESPACE.sub(" ", text.strip().lower())
+
+
+def notification_fingerprint(
+    title: str,
+    severity: AlertSeverity,
+    labels: Optional[Dict[str, str]] = None,
+    message: Optional[str] = None
+) -> bytes:
+    """
+    计算通知指纹
+
+    Args:
+        title: 通知标题
+        severity: 严重程度
+        labels: 告警标签，存在时不使用内容
+        message: 通知内容，没有标签时掩码数字后参与指纹
+
+    Returns:
+        bytes: 16字节指纹
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(_normalize(title).encode())
+    digest.update(b"\x00")
+    digest.update(severity.value.encode())
+
+    if labels:
+        for key in sorted(labels):
+            digest.update(b"\x00")
+            digest.update(f"{key}={labels[key]}".encode())
+    elif message:
+        digest.update(b"\x01")
+        digest.update(_NUMBER.sub("#", _normalize(message)).encode())
+
+    return digest.digest()
+
+
+class NotificationDedupIndex:
+    """
+    通知去重索引
+
+    _expires 保存每个指纹当前的过期时间，堆中与之不一致的条目是重复写入留下的旧条目，
+    弹出时直接丢弃。所有时间均为 time.monotonic() 时钟。
+
+    使用示例:
+        index = NotificationDedupIndex(window_seconds=300)
+
+        fingerprint = notification_fingerprint(title, severity, labels)
+        if not index.contains(fingerprint):
+            ...
+            index.add(fingerprint)
+    """
+
+    def __init__(self, window_seconds: float):
+        """
+        初始化去重索引
+
+        Args:
+            window_seconds: 去重窗口(秒)
+        """
+        self.window_seconds = window_seconds
+        self._expires: Dict[bytes, float] = {}
+        self._heap: List[Tuple[float, bytes]] = []
+
+    def contains(self, fingerprint: bytes, now: Optional[float] = None) -> bool:
+        """指纹是否在去重窗口内"""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        return fingerprint in self._expires
+
+    def add(self, fingerprint: bytes, now: Optional[float] = None) -> None:
+        """记录指纹，重复写入时延长过期时间"""
+        now = time.monotonic() if now is None else now
+        expires_at = now + self.window_seconds
+        self._expires[fingerprint] = expires_at
+        heapq.heappush(self._heap, (expires_at, fingerprint))
+        self._expire(now)
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def _expire(self, now: float) -> None:
+        """弹出到期的指纹"""
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, fingerprint = heapq.heappop(self._heap)
+            if self._expires.get(fingerprint) == expires_at:
+                del self._expires[fingerprint]
+
+
+# 导出类
+__all__ = ["NotificationDedupIndex", "notification_fingerprint"]
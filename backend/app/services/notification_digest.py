@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知摘要 - 按渠道和严重程度合并突发告警
+
+大量规则同时触发时，每条告警都单独发送一条Slack消息、邮件或Webhook请求，
+很快就会触发Slack限流并淹没收件箱。本模块为每个 (渠道, 严重程度, 接收人)
+维护一个合并窗口：窗口内到达的通知合并渲染为一条摘要消息，只调用一次发送接口。
+
+窗口从第一条通知到达时开始计时，到期或达到单条摘要上限时发送；
+每条通知都会得到摘要的发送结果，由调用方决定重试。
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.models.schemas import AlertSeverity, NotificationChannel, NotificationStatus
+
+logger = structlog.get_logger(__name__)
+
+# 发送一批通知：(渠道, 严重程度, 接收人, 通知列表) -> 发送状态，渠道未启用时返回None
+DigestSender = Callable[
+    [NotificationChannel, AlertSeverity, List[str], List[Any]],
+    Awaitable[Optional[NotificationStatus]]
+]
+
+
+@dataclass
+class _DigestBatch:
+    """合并窗口内的一批通知"""
+    channel: NotificationChannel
+    severity: AlertSeverity
+    recipients: List[str]
+    items: List[Any] = field(default_factory=list)
+    futures: List[asyncio.Future] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class NotificationDigest:
+    """
+    通知合并缓冲区
+
+    使用示例:
+        digest = NotificationDigest(send_batch)
+
+        status = await digest.add(NotificationChannel.SLACK, AlertSeverity.HIGH, [], item, window=30)
+        await digest.flush_all()
+    """
+
+    def __init__(self, send: DigestSender, max_items: Optional[int] = None):
+        """
+        初始化通知合并缓冲区
+
+        Args:
+            send: 批量发送函数
+            max_items: 单条摘要最多包含的通知数，默认使用 settings.NOTIFICATION_DIGEST_MAX_ITEMS
+        """
+        self.logger = logger.bind(component="NotificationDigest")
+        self.send = send
+        self.max_items = max_items or settings.NOTIFICATION_DIGEST_MAX_ITEMS
+
+        self._batches: Dict[Tuple[str, str, Tuple[str, ...]], _DigestBatch] = {}
+        self._flushing: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "batched": 0,
+            "digests_sent": 0,
+            "largest_digest": 0
+        }
+
+
+    def add(
+        self,
+        channel: NotificationChannel,
+        severity: AlertSeverity,
+        recipients: Optional[List[str]],
+        item: Any,
+        window: float
+    ) -> asyncio.Future:
+        """
+        把通知加入合并窗口
+
+        Args:
+            channel: 通知渠道
+            severity: 严重程度
+            recipients: 接收人列表，接收人不同的通知不会合并
+            item: 通知内容，原样传给发送函数
+            window: 合并窗口(秒)，只在窗口打开时使用
+
+        Returns:
+            asyncio.Future: 所在摘要的发送状态
+        """
+        loop = asyncio.get_running_loop()
+        recipients = list(recipients or [])
+        key = (channel.value, severity.value, tuple(recipients))
+
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = _DigestBatch(channel=channel, severity=severity, recipients=recipients)
+            batch.timer = loop.call_later(window, self._start_flush, key)
+            self._batches[key] = batch
+
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        self.stats["batched"] += 1
+
+        if len(batch.items) >= self.max_items:
+            self._start_flush(key)
+        return future
+
+
+    async def flush_all(self) -> None:
+        """立即发送所有未到期的窗口，并等待发送完成"""
+        for key in list(self._batches):
+            self._start_flush(key)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+
+    def pending(self) -> int:
+        """等待合并发送的通知数"""
+        return sum(len(batch.items) for batch in self._batches.values())
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        return {
+            **self.stats,
+            "open_windows": len(self._batches),
+            "pending": self.pending()
+        }
+
+
+    def _start_flush(self, key: Tuple[str, str, Tuple[str, ...]]) -> None:
+        """关闭窗口并在后台发送"""
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+
+        task = asyncio.get_running_loop().create_task(self._flush(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+
+    async def _flush(self, batch: _DigestBatch) -> None:
+        """发送一批通知，并把结果交给每条通知"""
+        try:
+            outcome = await self.send(batch.channel, batch.severity, batch.recipients, batch.items)
+        except Exception as e:
+            self.logger.error("通知摘要发送失败", channel=batch.channel.value, items=len(batch.items), error=str(e))
+            outcome = e
+
+        self.stats["digests_sent"] += 1
+        self.stats["largest_digest"] = max(self.stats["largest_digest"], len(batch.items))
+
+        for future in batch.futures:
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+
+# 导出类
+__all__ = ["NotificationDigest"]
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知发件箱 - 基于 notifications 表的持久化投递队列
+
+通知原来在请求或规则周期内直接发送，失败后只记录为 failed，不会重试。
+本模块把待发送通知作为 pending 记录写入 notifications 表，
+由后台投递协程从表中认领到期记录并发送：
+
+1. 写入即持久化，进程重启后未完成的通知继续投递
+2. 失败的渠道按指数退避加随机抖动重试，已成功的渠道不会重复发送
+3. 超过最大重试次数后标记为 failed 并保留失败原因
+4. 认领时设置租约，投递中进程崩溃的记录在租约到期后被重新认领
+5. 配置了合并窗口的渠道把突发通知合并为一条摘要发送，窗口期间记录保持认领状态
+
+认领使用带原值校验的条件UPDATE，多个工作进程共享同一张表时
+同一条记录只会被一个进程认领。
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.database import Notification
+from app.models.schemas import AlertSeverity, NotificationChannel
+from app.services.notification_digest import NotificationDigest
+from app.services.notification_service import notification_service as shared_notification_service
+
+logger = structlog.get_logger(__name__)
+
+# 等待投递的状态；sending 状态的 next_attempt_at 为租约到期时间
+_CLAIMABLE = ("pending", "sending")
+
+
+class NotificationOutbox:
+    """
+    通知发件箱
+
+    分发任务认领到期记录放入本地队列，投递协程从队列取出并发送。
+    本地队列容量等于投递协程数，认领速度受投递速度约束，
+    已认领的记录不会在本地积压到租约到期。
+
+    使用示例:
+        outbox = NotificationOutbox()
+        await outbox.start()
+
+        await outbox.enqueue(title="CPU告警", message="...", severity=AlertSeverity.HIGH,
+                             channels=[NotificationChannel.EMAIL])
+        await outbox.stop()
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        notification_service: Optional[Any] = None,
+        workers: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_base_delay: Optional[float] = None,
+        retry_max_delay: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        claim_lease: Optional[float] = None
+    ):
+        """
+        初始化通知发件箱
+
+        Args:
+            session_factory: 异步会话工厂
+            notification_service: 通知服务，默认使用全局通知服务
+            workers: 投递协程数，默认使用 settings.NOTIFICATION_WORKERS
+            max_retries: 最大重试次数，默认使用 settings.NOTIFICATION_MAX_RETRIES
+            retry_base_delay: 退避基数(秒)，默认使用 settings.NOTIFICATION_RETRY_BASE_SECONDS
+            retry_max_delay: 退避上限(秒)，默认使用 settings.NOTIFICATION_RETRY_MAX_SECONDS
+            poll_interval: 轮询间隔(秒)，默认使用 settings.NOTIFICATION_POLL_INTERVAL
+            claim_lease: 认领租约(秒)，默认使用 settings.NOTIFICATION_CLAIM_LEASE_SECONDS
+        """
+        self.logger = logger.bind(component="NotificationOutbox")
+        self.session_factory = session_factory
+        self.notification_service = notification_service
+
+        self.workers = workers or settings.NOTIFICATION_WORKERS
+        self.max_retries = max_retries if max_retries is not None else settings.NOTIFICATION_MAX_RETRIES
+        self.retry_base_delay = (
+            retry_base_delay if retry_base_delay is not None else settings.NOTIFICATION_RETRY_BASE_SECONDS
+        )
+        self.retry_max_delay = (
+            retry_max_delay if retry_max_delay is not None else settings.NOTIFICATION_RETRY_MAX_SECONDS
+        )
+        self.poll_interval = poll_interval if poll_interval is not None else settings.NOTIFICATION_POLL_INTERVAL
+        self.claim_lease = claim_lease if claim_lease is not None else settings.NOTIFICATION_CLAIM_LEASE_SECONDS
+
+        # 唤醒事件、本地队列和后台任务，按事件循环惰性创建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+        # 合并窗口中的通知，摘要发送后由后台任务写回结果
+        self.digest = NotificationDigest(self._send_digest)
+        self._completions: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "enqueued": 0,
+            "claimed": 0,
+            "claim_conflicts": 0,
+            "delivered": 0,
+            "retried": 0,
+            "failed": 0,
+            "suppressed": 0
+        }
+
+
+    def build_row(
+        self,
+        title: str,
+        message: str,
+        severity: AlertSeverity,
+        channels: List[NotificationChannel],
+        recipients: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        alert_id: Optional[int] = None,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        构造待投递的 notifications 记录，供调用方在自己的事务中写入
+
+        Args:
+            title: 通知标题
+            message: 通知内容
+            severity: 严重程度
+            channels: 通知渠道列表
+            recipients: 接收人列表
+            metadata: 附加元数据
+            alert_id: 关联告警ID
+            now: 写入时间
+
+        Returns:
+            Dict[str, Any]: notifications 表字段
+        """
+        now = now or datetime.now()
+        return {
+            "title": title,
+            "content": message,
+            "severity": severity,
+            "channels": [channel.value for channel in channels],
+            "recipients": list(recipients or []),
+            "alert_id": alert_id,
+            "status": "pending",
+            "retry_count": 0,
+            "max_retries": self.max_retries,
+            "next_attempt_at": now,
+            "extra_data": {"metadata": metadata or {}, "delivered_channels": []},
+            "created_at": now,
+            "updated_at": now
+        }
+
+
+    async def enqueue(
+        self,
+        title: str,
+        message: str,
+        severity: AlertSeverity,
+        channels: List[NotificationChannel],
+        recipients: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        alert_id: Optional[int] = None
+    ) -> int:
+        """
+        写入一条待投递通知并唤醒投递任务
+
+        Returns:
+            int: 通知记录ID
+        """
+        try:
+            async with self.session_factory() as session:
+                notification_id = await session.scalar(
+                    insert(Notification)
+                    .values(**self.build_row(title, message, severity, channels, recipients, metadata, alert_id))
+                    .returning(Notification.id)
+                )
+                await session.commit()
+        except Exception as e:
+            self.logger.error("通知入队失败", title=title, error=str(e))
+            raise RuntimeError(f"通知入队失败: {str(e)}")
+
+        self.stats["enqueued"] += 1
+        self.wake()
+        return notification_id
+
+
+    def wake(self) -> None:
+        """有新通知写入时立即唤醒分发任务"""
+        self._ensure_started()
+        self._wakeup.set()
+
+
+    async def start(self) -> None:
+        """启动投递任务，继续投递重启前未完成的通知"""
+        self._ensure_started()
+
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        等待已认领的通知投递完成并停止后台任务
+
+        未认领的记录留在表中，下次启动后继续投递。
+
+        Args:
+            timeout: 等待投递完成的最长时间(秒)
+        """
+        if self._dispatcher is None:
+            return
+
+        # 分发任务在认领间隙退出，不在数据库操作中途取消
+        self._stopping = True
+        self._wakeup.set()
+        done, _ = await asyncio.wait({self._dispatcher}, timeout=timeout)
+        if not done:
+            self._dispatcher.cancel()
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            # 未到期的合并窗口立即发送
+            await asyncio.wait_for(self.digest.flush_all(), timeout=timeout)
+            if self._completions:
+                await asyncio.wait_for(asyncio.gather(*self._completions, return_exceptions=True), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning("通知投递等待超时", pending=self._queue.qsize())
+
+        tasks = [self._dispatcher, *self._worker_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._worker_tasks = []
+
+        self.logger.info("通知发件箱已停止", **self.stats)
+
+
+    def retry_delay(self, attempt: int) -> float:
+        """
+        第 attempt 次失败后的重试等待时间
+
+        指数退避到上限后取 [delay/2, delay] 内的随机值，
+        接收方恢复时积压的重试不会在同一时刻集中到达。
+        """
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取发件箱统计"""
+        return {
+            **self.stats,
+            "in_flight": self._queue.qsize() if self._queue else 0,
+            "digest": self.digest.get_stats(),
+            "workers": self.workers,
+            "max_retries": self.max_retries
+        }
+
+
+    def _ensure_started(self) -> None:
+        """在当前事件循环上启动分发和投递任务"""
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is not None and self._loop is loop and not self._dispatcher.done():
+            return
+
+        self._loop = loop
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.workers)
+        self._dispatcher = loop.create_task(self._run_dispatcher())
+        self._worker_tasks = [loop.create_task(self._run_worker()) for _ in range(self.workers)]
+
+
+    async def _run_dispatcher(self) -> None:
+        """认领到期通知交给投递协程，没有到期通知时等待唤醒或下一个到期时间"""
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                claimed, next_due = await self._claim(self.workers)
+            except Exception as e:
+                self.logger.error("通知认领失败", error=str(e))
+                claimed, next_due = [], None
+
+            for row in claimed:
+                await self._queue.put(row)
+            if len(claimed) >= self.workers:
+                continue
+
+            wait = self.poll_interval
+            if next_due is not None:
+                wait = min(wait, max(0.0, (next_due - datetime.now()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+
+    async def _claim(self, limit: int) -> Tuple[List[Notification], Optional[datetime]]:
+        """
+        认领最多 limit 条到期通知
+
+        Returns:
+            Tuple: (认领的记录, 剩余记录中最早的到期时间)
+        """
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=self.claim_lease)
+
+        async with self.session_factory() as session:
+            candidates = (await session.execute(
+                select(Notification.id, Notification.next_attempt_at)
+                .where(Notification.status.in_(_CLAIMABLE), Notification.next_attempt_at <= now)
+                .order_by(Notification.next_attempt_at)
+                .limit(limit)
+            )).all()
+
+            claimed_ids = []
+            for notification_id, seen in candidates:
+                result = await session.execute(
+                    update(Notification)
+                    .where(
+                        Notification.id == notification_id,
+                        Notification.status.in_(_CLAIMABLE),
+                        Notification.next_attempt_at == seen
+                    )
+                    .values(status="sending", next_attempt_at=lease_until)
+                )
+                if result.rowcount:
+                    claimed_ids.append(notification_id)
+                else:
+                    self.stats["claim_conflicts"] += 1
+            await session.commit()
+
+            rows = []
+            if claimed_ids:
+                rows = (await session.execute(
+                    select(Notification).where(Notification.id.in_(claimed_ids)).order_by(Notification.next_attempt_at)
+                )).scalars().all()
+
+            next_due = None
+            if len(candidates) < limit:
+                next_due = await session.scalar(
+                    select(func.min(Notification.next_attempt_at)).where(Notification.status.in_(_CLAIMABLE))
+                )
+
+        self.stats["claimed"] += len(rows)
+        return list(rows), next_due
+
+
+    async def _run_worker(self) -> None:
+        """投递本地队列中的通知"""
+        while True:
+            row = await self._queue.get()
+            try:
+                await self._deliver(row)
+            except Exception as e:
+                # 状态未写回的记录在租约到期后重新认领
+                self.logger.error("通知投递异常", notification_id=row.id, error=str(e))
+            finally:
+                self._queue.task_done()
+
+
+    async def _deliver(self, row: Notification) -> None:
+        """
+        投递一条通知的未成功渠道
+
+        有合并窗口的渠道加入摘要缓冲区，由后台任务在摘要发送后写回结果，
+        投递协程不等待合并窗口。
+        """
+        service = self._get_service()
+        extra = dict(row.extra_data or {})
+        delivered = set(extra.get("delivered_channels", []))
+        channels = [NotificationChannel(channel) for channel in row.channels if channel not in delivered]
+        first_attempt = row.retry_count == 0 and not delivered
+        labels = (extra.get("metadata") or {}).get("labels")
+
+        if first_attempt and await service._is_duplicate_notification(row.title, row.content, row.severity, labels):
+            self.stats["suppressed"] += 1
+            await self._finish(row.id, status="suppressed", next_attempt_at=None)
+            return
+
+        immediate, digested = [], []
+        for channel in channels:
+            window = min(service.digest_window(channel, row.severity), self.claim_lease / 2)
+            (digested if window > 0 else immediate).append((channel, window))
+
+        statuses: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        if immediate:
+            try:
+                statuses = await service.deliver(
+                    title=row.title,
+                    message=row.content,
+                    severity=row.severity,
+                    channels=[channel for channel, _ in immediate],
+                    recipients=row.recipients or None,
+                    metadata=extra.get("metadata"),
+                    notification_id=str(row.id)
+                )
+            except Exception as e:
+                errors = {channel.value: str(e) for channel, _ in immediate}
+
+        if first_attempt:
+            await service._record_notification(row.title, row.content, row.severity, labels)
+
+        if digested:
+            futures = {
+                channel.value: self.digest.add(channel, row.severity, row.recipients, row, window)
+                for channel, window in digested
+            }
+            task = asyncio.get_running_loop().create_task(
+                self._complete_after_digest(row, extra, delivered, statuses, errors, futures)
+            )
+            self._completions.add(task)
+            task.add_done_callback(self._completions.discard)
+            return
+
+        await self._complete(row, extra, delivered, statuses, errors)
+
+
+    async def _complete_after_digest(
+        self,
+        row: Notification,
+        extra: Dict[str, Any],
+        delivered: Set[str],
+        statuses: Dict[str, Any],
+        errors: Dict[str, str],
+        futures: Dict[str, asyncio.Future]
+    ) -> None:
+        """等待摘要发送后写回投递结果"""
+        outcomes = await asyncio.gather(*futures.values(), return_exceptions=True)
+        for channel, outcome in zip(futures, outcomes):
+            if isinstance(outcome, BaseException):
+                errors[channel] = str(outcome) or type(outcome).__name__
+            elif outcome is not None:
+                statuses[channel] = outcome
+
+        try:
+            await self._complete(row, extra, delivered, statuses, errors)
+        except Exception as e:
+            # 状态未写回的记录在租约到期后重新认领
+            self.logger.error("通知投递异常", notification_id=row.id, error=str(e))
+
+
+    async def _complete(
+        self,
+        row: Notification,
+        extra: Dict[str, Any],
+        delivered: Set[str],
+        statuses: Dict[str, Any],
+        errors: Dict[str, str]
+    ) -> None:
+        """汇总各渠道结果并写回：全部成功、退避重试或最终失败"""
+        for channel, status in statuses.items():
+            if status.status == "sent":
+                delivered.add(channel)
+            else:
+                errors[channel] = status.error_message or status.status
+
+        extra["delivered_channels"] = sorted(delivered)
+        now = datetime.now()
+
+        if not errors:
+            # 未启用的渠道不返回状态，不再重试
+            self.stats["delivered"] += 1
+            await self._finish(
+                row.id, status="sent", sent_at=now, next_attempt_at=None, failed_reason=None, extra_data=extra
+            )
+            return
+
+        retry_count = row.retry_count + 1
+        failed_reason = "; ".join(f"{channel}: {error}" for channel, error in sorted(errors.items()))
+
+        if retry_count > row.max_retries:
+            self.stats["failed"] += 1
+            self.logger.error("通知投递最终失败", notification_id=row.id, retries=row.retry_count, reason=failed_reason)
+            await self._finish(
+                row.id, status="failed", retry_count=retry_count, next_attempt_at=None,
+                failed_reason=failed_reason, extra_data=extra
+            )
+            return
+
+        delay = self.retry_delay(retry_count)
+        self.stats["retried"] += 1
+        self.logger.warning(
+            "通知投递失败，稍后重试",
+            notification_id=row.id,
+            retry_count=retry_count,
+            delay_seconds=round(delay, 1),
+            reason=failed_reason
+        )
+        await self._finish(
+            row.id, status="pending", retry_count=retry_count, next_attempt_at=now + timedelta(seconds=delay),
+            failed_reason=failed_reason, extra_data=extra
+        )
+
+
+    async def _send_digest(
+        self,
+        channel: NotificationChannel,
+        severity: AlertSeverity,
+        recipients: List[str],
+        rows: List[Notification]
+    ) -> Optional[Any]:
+        """发送一个合并窗口内的通知，窗口内只有一条时按普通通知发送"""
+        service = self._get_service()
+
+        if len(rows) == 1:
+            row = rows[0]
+            statuses = await service.deliver(
+                title=row.title,
+                message=row.content,
+                severity=severity,
+                channels=[channel],
+                recipients=recipients or None,
+                metadata=(row.extra_data or {}).get("metadata"),
+                notification_id=str(row.id)
+            )
+            return statuses.get(channel.value)
+
+        return await service.deliver_digest(
+            channel,
+            severity,
+            [{"title": row.title, "message": row.content} for row in rows],
+            recipients or None,
+            notification_id=f"digest-{rows[0].id}"
+        )
+
+
+    async def _finish(self, notification_id: int, **values: Any) -> None:
+        """写回投递结果"""
+        async with self.session_factory() as session:
+            await session.execute(
+                update(Notification)
+                .where(Notification.id == notification_id, Notification.status == "sending")
+                .values(**values, updated_at=datetime.now())
+            )
+            await session.commit()
+
+
+    def _get_service(self) -> Any:
+        """获取通知服务，未指定时使用全局通知服务"""
+        if self.notification_service is None:
+            return shared_notification_service
+        return self.notification_service
+
+
+# 全局通知发件箱
+notification_outbox = NotificationOutbox()
+
+
+# 导出类
+__all__ = ["NotificationOutbox", "notification_outbox"]
@@ -19,12 +19,13 @@
 import asyncio
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from email.mime.text import MIMEText
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import uuid
 
 import httpx
 import structlog
-from jinja2 import Template
 
 from app.models.schemas import (
     NotificationRequest,
@@ -34,10 +35,20 @@ from app.models.schemas import (
     AlertSeverity
 )
 from app.core.config import settings
+from app.services.notification_dedup import NotificationDedupIndex, notification_fingerprint
+from app.services.notification_templates import NotificationTemplateRegistry
+from app.services.smtp_pool import SMTPConnectionPool
 
 logger = structlog.get_logger(__name__)
 
 
+def _error_text(error: BaseException) -> str:
+    """发送错误的描述，超时异常没有消息文本"""
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return str(error) or type(error).__name__
+
+
 class NotificationService:
     """
     通知服务 - 多渠道智能告警分发系统
@@ -72,30 +83,49 @@ class NotificationService:
             NotificationChannel.SLACK: {
                 "enabled": bool(settings.SLACK_WEBHOOK_URL),
                 "webhook_url": settings.SLACK_WEBHOOK_URL,
-                "timeout": 10
+                "timeout": 10,
+                "max_concurrency": settings.NOTIFICATION_CHANNEL_CONCURRENCY
             },
             NotificationChannel.EMAIL: {
                 "enabled": bool(settings.SMTP_HOST),
                 "smtp_host": settings.SMTP_HOST,
                 "smtp_port": settings.SMTP_PORT,
-                "timeout": 30
+                "timeout": 30,
+                "max_concurrency": settings.NOTIFICATION_CHANNEL_CONCURRENCY
             },
             NotificationChannel.WEBHOOK: {
                 "enabled": True,
-                "timeout": 15
+                "timeout": 15,
+                "max_concurrency": settings.NOTIFICATION_CHANNEL_CONCURRENCY
             }
         }
         
+        # 每个渠道的并发发送槽位，按事件循环惰性创建
+        self._channel_slots: Dict[NotificationChannel, asyncio.Semaphore] = {}
+        self._channel_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         # HTTP客户端
         self.http_client = httpx.AsyncClient(timeout=30.0)
         
-        # 通知模板
-        self.templates = {
-            AlertSeverity.LOW: "⚠️ [低级别告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}",
-            AlertSeverity.MEDIUM: "🟡 [中等告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}\n请及时关注。",
-            AlertSeverity.HIGH: "🔴 [高级别告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}\n⚠️ 请立即处理！",
-            AlertSeverity.CRITICAL: "🚨 [严重告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}\n🚨 需要立即处理！"
-        }
+        # SMTP连接池，复用已登录的连接
+        self.smtp_pool: Optional[SMTPConnectionPool] = None
+        if settings.SMTP_HOST:
+            self.smtp_pool = SMTPConnectionPool(
+                hostname=settings.SMTP_HOST,
+                port=settings.SMTP_PORT,
+                username=settings.SMTP_USERNAME,
+                password=settings.SMTP_PASSWORD,
+                use_tls=settings.SMTP_USE_TLS,
+                timeout=self.channel_configs[NotificationChannel.EMAIL]["timeout"]
+            )
+        
+        # 邮件固定头部，每封邮件只设置收件人、日期和正文
+        self.email_headers = {"Subject": "智能监控预警系统通知"}
+        if settings.SMTP_USERNAME:
+            self.email_headers["From"] = settings.SMTP_USERNAME
+        
+        # 通知模板，启动时按渠道和严重程度预编译
+        self.templates = NotificationTemplateRegistry()
         
         # 通知统计
         self.notification_stats = {
@@ -106,7 +136,7 @@ class NotificationService:
         
         # 去重配置
         self.dedup_window = timedelta(minutes=5)
-        self.recent_notifications = {}
+        self.dedup_index = NotificationDedupIndex(self.dedup_window.total_seconds())
         
         self.logger.info(
             "通知服务初始化完成",
@@ -150,7 +180,8 @@ class NotificationService:
             )
             
             # 检查去重
-            if await self._is_duplicate_notification(title, message, severity):
+            labels = (metadata or {}).get("labels")
+            if await self._is_duplicate_notification(title, message, severity, labels):
                 return NotificationResponse(
                     success=True,
                     message="通知已去重，跳过发送",
@@ -158,31 +189,8 @@ class NotificationService:
                     statuses={}
                 )
             
-            # 渲染通知内容
-            rendered_content = await self._render_content(title, message, severity, metadata)
-            
-            # 并发发送到各个渠道
-            statuses = {}
-            successful_channels = 0
-            
-            for channel in channels:
-                if self.channel_configs[channel]["enabled"]:
-                    try:
-                        status = await self._send_to_channel(
-                            channel, rendered_content, recipients, notification_id
-                        )
-                        statuses[channel.value] = status
-                        if status.status == "sent":
-                            successful_channels += 1
-                    except Exception as e:
-                        statuses[channel.value] = NotificationStatus(
-                            notification_id=notification_id,
-                            channel=channel,
-                            status="failed",
-                            error_message=str(e)
-                        )
-                else:
-                    self.logger.warning("通知渠道未启用", channel=channel.value)
+            statuses = await self.deliver(title, message, severity, channels, recipients, metadata, notification_id)
+            successful_channels = sum(1 for status in statuses.values() if status.status == "sent")
             
             # 更新统计
             self.notification_stats["total_sent"] += 1
@@ -192,7 +200,7 @@ class NotificationService:
                 self.notification_stats["failed_sent"] += 1
             
             # 记录去重信息
-            await self._record_notification(title, message, severity)
+            await self._record_notification(title, message, severity, labels)
             
             execution_time = time.time() - start_time
             is_success = successful_channels > 0
@@ -220,6 +228,111 @@ class NotificationService:
             raise RuntimeError(f"通知发送失败: {str(e)}")
     
     
+    async def deliver(
+        self,
+        title: str,
+        message: str,
+        severity: AlertSeverity,
+        channels: List[NotificationChannel],
+        recipients: Optional[List[str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        notification_id: Optional[str] = None
+    ) -> Dict[str, NotificationStatus]:
+        """
+        渲染通知内容并并发发送到各渠道，不做去重和统计
+        
+        未启用的渠道跳过，不出现在返回结果中。
+        
+        Args:
+            title: 通知标题
+            message: 通知内容
+            severity: 严重程度
+            channels: 通知渠道列表
+            recipients: 接收人列表
+            metadata: 附加元数据
+            notification_id: 通知ID
+            
+        Returns:
+            Dict[str, NotificationStatus]: 各渠道发送状态
+        """
+        notification_id = notification_id or str(uuid.uuid4())
+        
+        # 并发发送到各个渠道，按完成顺序汇总结果；使用同一模板的渠道共享渲染结果
+        statuses = {}
+        sends = []
+        rendered: Dict[int, str] = {}
+        for channel in channels:
+            if not self.channel_configs[channel]["enabled"]:
+                self.logger.warning("通知渠道未启用", channel=channel.value)
+                continue
+            template_key = id(self.templates.get(channel, severity))
+            if template_key not in rendered:
+                rendered[template_key] = self._render_content(channel, title, message, severity, metadata)
+            sends.append(self._send_to_channel(channel, rendered[template_key], recipients, notification_id))
+        
+        for completed in asyncio.as_completed(sends):
+            status = await completed
+            statuses[status.channel.value] = status
+            self.logger.debug(
+                "通知渠道发送完成",
+                notification_id=notification_id,
+                channel=status.channel.value,
+                status=status.status
+            )
+        
+        return statuses
+    
+    
+    def digest_window(self, channel: NotificationChannel, severity: AlertSeverity) -> float:
+        """
+        渠道和严重程度对应的合并窗口(秒)，0表示立即发送
+        
+        "渠道:严重程度" 的配置优先于渠道配置；严重告警和未启用的渠道不合并。
+        """
+        if severity == AlertSeverity.CRITICAL or not self.channel_configs[channel]["enabled"]:
+            return 0.0
+        windows = settings.NOTIFICATION_DIGEST_WINDOWS
+        window = windows.get(f"{channel.value}:{severity.value}", windows.get(channel.value, 0))
+        return float(window or 0)
+    
+    
+    async def deliver_digest(
+        self,
+        channel: NotificationChannel,
+        severity: AlertSeverity,
+        notifications: List[Dict[str, Any]],
+        recipients: Optional[List[str]] = None,
+        notification_id: Optional[str] = None
+    ) -> NotificationStatus:
+        """
+        把多条通知渲染为一条汇总消息，通过一次调用发送到指定渠道
+        
+        Args:
+            channel: 通知渠道
+            severity: 严重程度
+            notifications: 通知列表，每项包含 title 和 message
+            recipients: 接收人列表
+            notification_id: 通知ID
+            
+        Returns:
+            NotificationStatus: 发送状态
+        """
+        notification_id = notification_id or str(uuid.uuid4())
+        try:
+            content = self.templates.render_digest(
+                channel,
+                count=len(notifications),
+                severity=severity.value.upper(),
+                items=notifications,
+                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            )
+        except Exception as e:
+            self.logger.error("汇总内容渲染失败", error=str(e))
+            content = "\n".join(f"[{severity.value.upper()}] {item['title']}" for item in notifications)
+        
+        return await self._send_to_channel(channel, content, recipients, notification_id)
+    
+    
     async def send_notification_request(self, request: NotificationRequest) -> NotificationResponse:
         """
         发送通知请求
@@ -239,19 +352,19 @@ class NotificationService:
             metadata=request.metadata
         )
 
-    async def _render_content(
-        self, 
-        title: str, 
-        message: str, 
-        severity: AlertSeverity, 
+    def _render_content(
+        self,
+        channel: NotificationChannel,
+        title: str,
+        message: str,
+        severity: AlertSeverity,
         metadata: Optional[Dict[str, Any]]
     ) -> str:
-        """渲染通知内容"""
+        """使用渠道和严重程度对应的预编译模板渲染通知内容"""
         try:
-            template_str = self.templates.get(severity, self.templates[AlertSeverity.MEDIUM])
-            template = Template(template_str)
-            
-            return template.render(
+            return self.templates.render(
+                channel,
+                severity,
                 title=title,
                 message=message,
                 severity=severity.value.upper(),
@@ -285,7 +398,7 @@ class NotificationService:
                 notification_id=notification_id,
                 channel=channel,
                 status="failed",
-                error_message=str(e)
+                error_message=_error_text(e)
             )
     
     
@@ -298,12 +411,10 @@ class NotificationService:
         
         payload = {"text": content}
         
-        response = await self.http_client.post(
-            str(config["webhook_url"]),
-            json=payload,
-            timeout=config["timeout"]
+        await self._call_target(
+            NotificationChannel.SLACK,
+            lambda: self._post_json(str(config["webhook_url"]), payload, config["timeout"])
         )
-        response.raise_for_status()
         
         return NotificationStatus(
             notification_id=notification_id,
@@ -332,33 +443,18 @@ class NotificationService:
         """
         try:
             # 检查SMTP配置
-            if not settings.SMTP_HOST:
+            if self.smtp_pool is None:
                 raise RuntimeError("SMTP服务器未配置")
             
-            import aiosmtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-            from email.utils import formatdate
-            
             # 创建邮件内容
-            msg = MIMEMultipart()
-            msg['From'] = settings.SMTP_USERNAME
+            msg = MIMEText(content, 'plain', 'utf-8')
+            for header, value in self.email_headers.items():
+                msg[header] = value
             msg['To'] = ', '.join(recipients) if recipients else settings.SMTP_USERNAME
             msg['Date'] = formatdate(localtime=True)
-            msg['Subject'] = "智能监控预警系统通知"
-            
-            # 添加文本内容
-            msg.attach(MIMEText(content, 'plain', 'utf-8'))
             
-            # 发送邮件
-            await aiosmtplib.send(
-                msg,
-                hostname=settings.SMTP_HOST,
-                port=settings.SMTP_PORT,
-                username=settings.SMTP_USERNAME,
-                password=settings.SMTP_PASSWORD,
-                use_tls=settings.SMTP_USE_TLS
-            )
+            # 通过连接池发送邮件
+            await self._call_target(NotificationChannel.EMAIL, lambda: self.smtp_pool.send(msg))
             
             return NotificationStatus(
                 notification_id=notification_id,
@@ -368,12 +464,12 @@ class NotificationService:
             )
             
         except Exception as e:
-            self.logger.error("邮件发送失败", error=str(e))
+            self.logger.error("邮件发送失败", error=_error_text(e))
             return NotificationStatus(
                 notification_id=notification_id,
                 channel=NotificationChannel.EMAIL,
                 status="failed",
-                error_message=str(e)
+                error_message=_error_text(e)
             )
 
     async def _send_webhook(
@@ -405,22 +501,27 @@ class NotificationService:
                 "source": "smart-monitoring-system"
             }
             
-            # 发送到所有URL
+            # 并发发送到所有URL，每个URL独立超时
+            timeout = self.channel_configs[NotificationChannel.WEBHOOK]["timeout"]
+            outcomes = await asyncio.gather(
+                *(
+                    self._call_target(
+                        NotificationChannel.WEBHOOK,
+                        lambda url=webhook_url: self._post_json(url, payload, timeout)
+                    )
+                    for webhook_url in recipients
+                ),
+                return_exceptions=True
+            )
+            
             success_count = 0
             last_error = None
-            
-            for webhook_url in recipients:
-                try:
-                    response = await self.http_client.post(
-                        webhook_url,
-                        json=payload,
-                        timeout=self.channel_configs[NotificationChannel.WEBHOOK]["timeout"]
-                    )
-                    response.raise_for_status()
+            for webhook_url, outcome in zip(recipients, outcomes):
+                if isinstance(outcome, BaseException):
+                    last_error = outcome
+                    self.logger.warning("Webhook发送失败", url=webhook_url, error=_error_text(outcome))
+                else:
                     success_count += 1
-                except Exception as e:
-                    last_error = e
-                    self.logger.warning("Webhook发送失败", url=webhook_url, error=str(e))
             
             if success_count > 0:
                 return NotificationStatus(
@@ -430,40 +531,77 @@ class NotificationService:
                     sent_at=datetime.now()
                 )
             else:
-                raise last_error or RuntimeError("所有Webhook发送都失败")
+                raise RuntimeError(f"所有Webhook发送都失败: {_error_text(last_error)}")
                 
         except Exception as e:
-            self.logger.error("Webhook发送失败", error=str(e))
+            self.logger.error("Webhook发送失败", error=_error_text(e))
             return NotificationStatus(
                 notification_id=notification_id,
                 channel=NotificationChannel.WEBHOOK,
                 status="failed",
-                error_message=str(e)
+                error_message=_error_text(e)
             )
 
     
-    async def _is_duplicate_notification(self, title: str, message: str, severity: AlertSeverity) -> bool:
-        """检查是否为重复通知"""
-        dedup_key = f"{title}:{message}:{severity.value}"
-        
-        # 清理过期记录
-        now = datetime.now()
-        cutoff_time = now - self.dedup_window
-        
-        expired_keys = [
-            key for key, timestamp in self.recent_notifications.items()
-            if timestamp < cutoff_time
-        ]
-        for key in expired_keys:
-            del self.recent_notifications[key]
+    async def _call_target(
+        self,
+        channel: NotificationChannel,
+        send: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        在渠道并发槽位内向单个目标发送，超过渠道超时时间视为失败
         
-        return dedup_key in self.recent_notifications
+        Args:
+            channel: 通知渠道
+            send: 发送协程工厂
+            
+        Returns:
+            Any: 发送结果
+            
+        Raises:
+            asyncio.TimeoutError: 目标响应超时
+        """
+        async with self._get_channel_slots(channel):
+            return await asyncio.wait_for(send(), timeout=self.channel_configs[channel]["timeout"])
     
     
-    async def _record_notification(self, title: str, message: str, severity: AlertSeverity) -> None:
+    def _get_channel_slots(self, channel: NotificationChannel) -> asyncio.Semaphore:
+        """获取当前事件循环上渠道的并发信号量"""
+        loop = asyncio.get_running_loop()
+        if self._channel_slots_loop is not loop:
+            self._channel_slots = {}
+            self._channel_slots_loop = loop
+        if channel not in self._channel_slots:
+            self._channel_slots[channel] = asyncio.Semaphore(self.channel_configs[channel]["max_concurrency"])
+        return self._channel_slots[channel]
+    
+    
+    async def _post_json(self, url: str, payload: Dict[str, Any], timeout: float) -> None:
+        """POST JSON到目标URL，非2xx响应抛出异常"""
+        response = await self.http_client.post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+    
+    
+    async def _is_duplicate_notification(
+        self,
+        title: str,
+        message: str,
+        severity: AlertSeverity,
+        labels: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """检查是否为重复通知，有标签时按标题、标签和严重程度判断"""
+        return self.dedup_index.contains(notification_fingerprint(title, severity, labels, message))
+    
+    
+    async def _record_notification(
+        self,
+        title: str,
+        message: str,
+        severity: AlertSeverity,
+        labels: Optional[Dict[str, str]] = None
+    ) -> None:
         """记录通知用于去重"""
-        dedup_key = f"{title}:{message}:{severity.value}"
-        self.recent_notifications[dedup_key] = datetime.now()
+        self.dedup_index.add(notification_fingerprint(title, severity, labels, message))
     
     
     async def get_statistics(self) -> Dict[str, Any]:
@@ -475,9 +613,11 @@ class NotificationService:
                 for channel, config in self.channel_configs.items()
             },
             "dedup_stats": {
-                "active_dedups": len(self.recent_notifications),
+                "active_dedups": len(self.dedup_index),
                 "dedup_window_minutes": self.dedup_window.total_seconds() / 60
-            }
+            },
+            "smtp_pool": self.smtp_pool.get_stats() if self.smtp_pool else None,
+            "templates": self.templates.get_stats()
         }
     
     
@@ -515,10 +655,21 @@ class NotificationService:
         return self
     
     
+    async def close(self) -> None:
+        """关闭SMTP连接池和HTTP客户端"""
+        if self.smtp_pool is not None:
+            await self.smtp_pool.close()
+        await self.http_client.aclose()
+    
+    
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器退出"""
-        await self.http_client.aclose()
+        await self.close()
+
+
+# 全局通知服务 - 端点和发件箱共用同一个HTTP客户端、SMTP连接池和去重索引
+notification_service = NotificationService()
 
 
 # 导出类
-__all__ = ["NotificationService"]
\ No newline at end of file
+__all__ = ["NotificationService", "notification_service"]
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知模板注册表 - 预编译的渠道和严重程度模板
+
+原实现每条通知都通过 Template(template_str) 重新解析和编译模板，
+告警风暴期间大量CPU时间花在重复编译同一段模板上。本模块：
+
+1. 所有模板在加载时通过同一个 Jinja Environment 编译一次，发送时只做字典查找和渲染
+2. 模板按 "渠道/严重程度" 查找，未定制时回退到 "default/严重程度"；
+   汇总模板按 "digest/渠道" 查找，回退到 "digest/default"
+3. 运维人员可以通过配置 NOTIFICATION_TEMPLATES 或模板目录覆盖内置模板
+4. 配置了字节码缓存目录时，未修改的模板在重启和重新加载后直接读取字节码
+5. reload() 在后台编译全部模板后整体替换，编译失败时保留原模板
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+from jinja2 import DictLoader, Environment, FileSystemBytecodeCache, Template, TemplateError
+
+from app.core.config import settings
+from app.models.schemas import AlertSeverity, NotificationChannel
+
+logger = structlog.get_logger(__name__)
+
+# 内置通知模板
+DEFAULT_TEMPLATES: Dict[str, str] = {
+    "default/low": "⚠️ [低级别告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}",
+    "default/medium": "🟡 [中等告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}\n请及时关注。",
+    "default/high": "🔴 [高级别告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}\n⚠️ 请立即处理！",
+    "default/critical": "🚨 [严重告警] {{ title }}\n{{ message }}\n时间: {{ timestamp }}\n🚨 需要立即处理！",
+    # 告警汇总模板，合并窗口内的多条告警渲染为一条消息
+    "digest/default": (
+        "📋 [告警汇总] {{ count }}条{{ severity }}告警\n"
+        "{% for item in items %}{{ loop.index }}. {{ item.title }}\n   {{ item.message }}\n{% endfor %}"
+        "时间: {{ timestamp }}"
+    )
+}
+
+# 模板目录中的模板文件后缀
+_TEMPLATE_SUFFIX = ".j2"
+
+
+class NotificationTemplateRegistry:
+    """
+    通知模板注册表
+
+    编译结果保存在一个以 (渠道, 严重程度) 和 ("digest", 渠道) 为键的字典中，
+    重新加载时整体替换该字典，发送路径上的读取不需要加锁。
+
+    使用示例:
+        registry = NotificationTemplateRegistry()
+
+        content = registry.render(NotificationChannel.SLACK, AlertSeverity.HIGH, title=..., message=...)
+        registry.reload()
+    """
+
+    def __init__(
+        self,
+        templates: Optional[Dict[str, str]] = None,
+        template_dir: Optional[Path] = None,
+        cache_dir: Optional[Path] = None
+    ):
+        """
+        初始化通知模板注册表
+
+        Args:
+            templates: 自定义模板，默认使用 settings.NOTIFICATION_TEMPLATES
+            template_dir: 自定义模板目录，默认使用 settings.NOTIFICATION_TEMPLATE_DIR
+            cache_dir: 字节码缓存目录，默认使用 settings.NOTIFICATION_TEMPLATE_CACHE_DIR
+        """
+        self.logger = logger.bind(component="NotificationTemplateRegistry")
+        self.templates = templates if templates is not None else settings.NOTIFICATION_TEMPLATES
+        self.template_dir = template_dir if template_dir is not None else settings.NOTIFICATION_TEMPLATE_DIR
+        self.cache_dir = cache_dir if cache_dir is not None else settings.NOTIFICATION_TEMPLATE_CACHE_DIR
+
+        self._compiled: Dict[Tuple[str, str], Template] = {}
+        self._custom_sources = 0
+        self.reloads = 0
+
+        try:
+            self.reload()
+        except RuntimeError:
+            # 自定义模板有误时使用内置模板启动，修正后可重新加载
+            self._compiled = self._compile(dict(DEFAULT_TEMPLATES))
+            self._custom_sources = 0
+
+
+    def reload(self) -> int:
+        """
+        重新读取并编译全部模板，成功后整体替换
+
+        Returns:
+            int: 编译的模板数
+        """
+        try:
+            sources = dict(DEFAULT_TEMPLATES)
+            custom = self._load_custom_sources()
+            sources.update(custom)
+            compiled = self._compile(sources)
+        except (TemplateError, OSError) as e:
+            self.logger.error("通知模板加载失败，保留当前模板", error=str(e))
+            raise RuntimeError(f"通知模板加载失败: {str(e)}")
+
+        self._compiled = compiled
+        self._custom_sources = len(custom)
+        self.reloads += 1
+        self.logger.info("通知模板已加载", templates=len(sources), custom=len(custom))
+        return len(sources)
+
+
+    def get(self, channel: NotificationChannel, severity: AlertSeverity) -> Template:
+        """获取渠道和严重程度对应的已编译模板"""
+        return self._compiled[(channel.value, severity.value)]
+
+
+    def get_digest(self, channel: NotificationChannel) -> Template:
+        """获取渠道对应的已编译汇总模板"""
+        return self._compiled[("digest", channel.value)]
+
+
+    def render(self, channel: NotificationChannel, severity: AlertSeverity, **context: Any) -> str:
+        """渲染通知内容"""
+        return self.get(channel, severity).render(**context)
+
+
+    def render_digest(self, channel: NotificationChannel, **context: Any) -> str:
+        """渲染汇总内容"""
+        return self.get_digest(channel).render(**context)
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取模板统计"""
+        return {
+            "templates": len(set(map(id, self._compiled.values()))),
+            "custom_sources": self._custom_sources,
+            "reloads": self.reloads,
+            "bytecode_cache_dir": str(self.cache_dir) if self.cache_dir else None
+        }
+
+
+    def _load_custom_sources(self) -> Dict[str, str]:
+        """读取模板目录和配置中的自定义模板，配置优先"""
+        sources: Dict[str, str] = {}
+        if self.template_dir:
+            root = Path(self.template_dir)
+            for path in sorted(root.rglob(f"*{_TEMPLATE_SUFFIX}")):
+                name = path.relative_to(root).with_suffix("").as_posix()
+                sources[name] = path.read_text(encoding="utf-8")
+        sources.update(self.templates or {})
+        return sources
+
+
+    def _compile(self, sources: Dict[str, str]) -> Dict[Tuple[str, str], Template]:
+        """编译全部模板，并为每个渠道和严重程度解析出实际使用的模板"""
+        bytecode_cache = None
+        if self.cache_dir:
+            Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(self.cache_dir))
+
+        environment = Environment(loader=DictLoader(sources), bytecode_cache=bytecode_cache, auto_reload=False)
+        templates = {name: environment.get_template(name) for name in sources}
+
+        compiled: Dict[Tuple[str, str], Template] = {}
+        for channel in NotificationChannel:
+            for severity in AlertSeverity:
+                name = next(
+                    candidate for candidate in (
+                        f"{channel.value}/{severity.value}",
+                        f"default/{severity.value}",
+                        "default/medium"
+                    )
+                    if candidate in templates
+                )
+                compiled[(channel.value, severity.value)] = templates[name]
+
+            digest_name = f"digest/{channel.value}"
+            compiled[("digest", channel.value)] = templates.get(digest_name, templates["digest/default"])
+
+        return compiled
+
+
+# 导出类
+__all__ = ["NotificationTemplateRegistry", "DEFAULT_TEMPLATES"]
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus服务注册表 - 跟随当前Prometheus配置切换服务实例
+
+PrometheusService 原本只在构造时读取 settings.PROMETHEUS_URL，各端点模块的单例
+在页面上切换当前配置后仍然访问旧地址；连接测试每次新建服务和客户端且从不关闭。本模块：
+
+1. 按当前启用的 PrometheusConfig（地址、认证、超时、重试次数）构建唯一的 PrometheusService
+2. 当前配置变化时一次性替换服务实例，旧服务的连接池在请求超时后关闭
+3. 没有数据库配置或读取失败时使用 settings 中的默认配置
+4. 端点模块通过 active() 代理始终访问当前服务
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import inspect
+from typing import Any, Dict, Optional, Set, Tuple
+
+import structlog
+
+from app.services.config_db_service import config_db_service
+from app.services.http_clients import http_clients
+from app.services.prometheus_service import PrometheusService
+
+logger = structlog.get_logger(__name__)
+
+# (配置ID, 地址, 用户名, 密码, 超时, 重试次数)，None 表示使用 settings 默认配置
+ServiceKey = Optional[Tuple[Any, ...]]
+
+
+def _config_key(config: Optional[Dict[str, Any]]) -> ServiceKey:
+    """配置中影响服务实例的字段"""
+    if not config or not config.get("url"):
+        return None
+    return (
+        config.get("id"),
+        config["url"].rstrip("/"),
+        config.get("username") or None,
+        config.get("password") or None,
+        config.get("timeout"),
+        config.get("max_retries")
+    )
+
+
+def _client_key(service: PrometheusService) -> Tuple[Any, ...]:
+    """服务使用的共享HTTP客户端键"""
+    return (service.base_url, service.username, service.password, service.timeout)
+
+
+class PrometheusServiceRegistry:
+    """
+    Prometheus服务注册表
+
+    get() 每次读取当前配置（走配置缓存，不访问数据库），配置未变时直接返回现有服务；
+    比较和替换之间没有 await，并发调用不会构建出两个服务。
+
+    使用示例:
+        service = await prometheus_services.get()
+        result = await service.query_instant("up")
+
+        prometheus_service = prometheus_services.active()
+        result = await prometheus_service.query_instant("up")
+    """
+
+    def __init__(self):
+        """初始化Prometheus服务注册表"""
+        self.logger = logger.bind(component="PrometheusServiceRegistry")
+        self._key: ServiceKey = None
+        self._service = PrometheusService()
+        self._retiring: Set[asyncio.Task] = set()
+        self.swaps = 0
+
+
+    @property
+    def current(self) -> PrometheusService:
+        """最近一次解析出的服务实例"""
+        return self._service
+
+
+    async def get(self) -> PrometheusService:
+        """
+        获取当前配置对应的服务实例，配置变化时替换
+
+        Returns:
+            PrometheusService: 当前服务
+        """
+        try:
+            config = await config_db_service.get_default_prometheus_config()
+        except Exception as e:
+            self.logger.warning("读取当前Prometheus配置失败，继续使用现有服务", error=str(e))
+            return self._service
+
+        key = _config_key(config)
+        if key != self._key:
+            self._swap(key, config)
+        return self._service
+
+
+    async def refresh(self) -> PrometheusService:
+        """切换当前配置后立即重建服务"""
+        config_db_service.invalidate_cache("prometheus")
+        return await self.get()
+
+
+    async def probe(self, config: Dict[str, Any]) -> bool:
+        """
+        用临时服务测试一个Prometheus配置的连通性
+
+        临时服务的连接池在测试后关闭，与当前服务共用连接池时保留。
+        """
+        service = self._build(config)
+        try:
+            return await service.health_check()
+        finally:
+            if _client_key(service) != _client_key(self._service):
+                await http_clients.close(*_client_key(service))
+
+
+    async def close(self) -> None:
+        """取消等待中的旧连接池关闭任务，连接池由 http_clients 统一关闭"""
+        for task in list(self._retiring):
+            task.cancel()
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+
+
+    def active(self) -> "ActivePrometheusService":
+        """始终转发到当前服务的代理，供端点模块作为单例使用"""
+        return ActivePrometheusService(self)
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计"""
+        return {
+            "base_url": self._service.base_url,
+            "config_id": self._key[0] if self._key else None,
+            "swaps": self.swaps,
+            "retiring_pools": len(self._retiring)
+        }
+
+
+    def _swap(self, key: ServiceKey, config: Optional[Dict[str, Any]]) -> None:
+        """替换当前服务，旧服务的连接池延迟关闭"""
+        old = self._service
+        self._service = self._build(config)
+        self._key = key
+        self.swaps += 1
+        self.logger.info("Prometheus服务已切换", base_url=self._service.base_url, config_id=key[0] if key else None)
+
+        if _client_key(old) != _client_key(self._service):
+            task = asyncio.get_running_loop().create_task(self._retire(old))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+
+
+    async def _retire(self, service: PrometheusService) -> None:
+        """等待旧服务进行中的请求结束后关闭其连接池，期间被重新启用则保留"""
+        await asyncio.sleep(service.timeout)
+        if _client_key(service) != _client_key(self._service):
+            await http_clients.close(*_client_key(service))
+
+
+    @staticmethod
+    def _build(config: Optional[Dict[str, Any]]) -> PrometheusService:
+        """按配置构建服务，没有配置时使用 settings 默认值"""
+        if not config or not config.get("url"):
+            return PrometheusService()
+        return PrometheusService(
+            base_url=config["url"],
+            timeout=config.get("timeout"),
+            max_retries=config.get("max_retries"),
+            username=config.get("username"),
+            password=config.get("password")
+        )
+
+
+class ActivePrometheusService:
+    """
+    当前Prometheus服务代理
+
+    异步方法调用前先解析当前服务；同步方法和属性读取最近一次解析出的服务。
+    """
+
+    def __init__(self, registry: PrometheusServiceRegistry):
+        self._registry = registry
+
+    def __getattr__(self, name: str) -> Any:
+        if inspect.iscoroutinefunction(getattr(PrometheusService, name, None)):
+            async def call(*args: Any, **kwargs: Any) -> Any:
+                service = await self._registry.get()
+                return await getattr(service, name)(*args, **kwargs)
+            return call
+        return getattr(self._registry.current, name)
+
+
+# 全局Prometheus服务注册表
+prometheus_services = PrometheusServiceRegistry()
+
+
+# 导出类
+__all__ = ["PrometheusServiceRegistry", "ActivePrometheusService", "prometheus_services"]
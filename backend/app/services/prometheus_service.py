@@ -13,23 +13,38 @@ Prometheus数据服务 - 时间序列数据采集与查询
 4. 查询结果缓存优化
 5. 错误处理和重试机制
 6. 指标元数据管理
+7. 共享HTTP连接池，按服务地址复用连接
+8. 长区间按单次请求点数上限分段并发获取
+9. 按后端熔断和自适应并发限制，过载时快速失败
 
 作者: AI监控团队
 版本: 2.0.0
 """
 
 import asyncio
+import math
+import random
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple, Union
 from urllib.parse import urljoin
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 import httpx
+import numpy as np
+import pandas as pd
 import structlog
-from cachetools import TTLCache
 
 from app.core.config import settings
+from app.services.backend_guard import FAILURE, OVERLOAD, REJECTED, BackendGuard, BackendUnavailableError, backend_guards
+from app.services.http_clients import http_clients
+from app.services.query_cache import RangeBlockCache, coarsen_step, parse_step_seconds
 from app.models.schemas import (
     MetricsQueryRequest,
     MetricsResponse, 
@@ -40,6 +55,210 @@ from app.models.schemas import (
 
 logger = structlog.get_logger(__name__)
 
+# 响应体JSON解析，优先使用orjson
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# 本地时区，与 datetime.fromtimestamp 的换算保持一致
+_LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+# 表示Prometheus过载的HTTP状态码
+_OVERLOAD_STATUS_CODES = {429, 503, 504}
+
+
+def _classify_error(error: BaseException) -> str:
+    """把请求异常分类为过载、后端故障或查询被拒绝"""
+    if isinstance(error, httpx.TimeoutException):
+        return OVERLOAD
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        if status_code in _OVERLOAD_STATUS_CODES:
+            return OVERLOAD
+        if status_code < 500:
+            return REJECTED
+    return FAILURE
+
+
+@dataclass
+class ColumnarSeries:
+    """
+    列式存储的单条时间序列
+    
+    时间戳和数值各为一个float64数组，标签集整条序列共享一份，
+    避免为每个数据点创建pydantic对象和复制标签。
+    """
+    metric_name: str                 # 指标名称
+    labels: Dict[str, str]           # 序列标签（不含__name__）
+    timestamps: np.ndarray           # Unix时间戳(秒)，float64
+    values: np.ndarray               # 指标值，float64
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    @property
+    def series_key(self) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+        """序列标识：指标名称 + 排序后的标签"""
+        return self.metric_name, tuple(sorted(self.labels.items()))
+    
+    def slice(self, start_ts: float, end_ts: float) -> "ColumnarSeries":
+        """
+        截取时间范围 [start_ts, end_ts) 内的数据点
+        
+        Args:
+            start_ts: 开始时间戳(秒)，包含
+            end_ts: 结束时间戳(秒)，不包含
+            
+        Returns:
+            ColumnarSeries: 共享标签集的新序列
+        """
+        mask = (self.timestamps >= start_ts) & (self.timestamps < end_ts)
+        return ColumnarSeries(
+            metric_name=self.metric_name,
+            labels=self.labels,
+            timestamps=self.timestamps[mask],
+            values=self.values[mask]
+        )
+    
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转换为异常检测使用的DataFrame
+        
+        Returns:
+            pd.DataFrame: 包含 timestamp（本地时间）和 value 两列
+        """
+        timestamps = pd.to_datetime(self.timestamps, unit="s", utc=True)
+        return pd.DataFrame({
+            "timestamp": timestamps.tz_convert(_LOCAL_TZ).tz_localize(None),
+            "value": self.values
+        })
+    
+    def to_time_series(self) -> TimeSeriesData:
+        """转换为API响应使用的 TimeSeriesData"""
+        return TimeSeriesData(
+            metric_name=self.metric_name,
+            labels=self.labels,
+            values=[
+                MetricDataPoint(
+                    timestamp=datetime.fromtimestamp(timestamp),
+                    value=value,
+                    labels=self.labels
+                )
+                for timestamp, value in zip(self.timestamps.tolist(), self.values.tolist())
+            ]
+        )
+
+
+@dataclass
+class ColumnarRangeResult:
+    """
+    列式范围查询结果
+    
+    供规则引擎、异常检测等内部调用方直接使用，
+    只有在HTTP边界才通过 to_metrics_response 转换为pydantic模型。
+    """
+    query: str                                                   # PromQL查询语句
+    series: List[ColumnarSeries] = field(default_factory=list)   # 各条序列
+    execution_time: float = 0.0                                  # 查询耗时(秒)
+    step_seconds: int = 0                                        # 实际使用的步长(秒)
+    
+    @property
+    def total_points(self) -> int:
+        """所有序列的数据点总数"""
+        return sum(len(series) for series in self.series)
+    
+    def to_metrics_response(self) -> MetricsResponse:
+        """转换为 MetricsResponse"""
+        return MetricsResponse(
+            success=True,
+            message="查询执行成功",
+            data=[series.to_time_series() for series in self.series],
+            query=self.query,
+            execution_time=self.execution_time
+        )
+
+
+@dataclass
+class SeriesMatrix:
+    """
+    多序列对齐矩阵
+    
+    将范围查询返回的多条序列按时间戳对齐堆叠为二维数组，
+    供批量异常检测等向量化计算直接使用。
+    """
+    timestamps: np.ndarray                 # 时间戳(秒)，形状 (时间点数,)
+    values: np.ndarray                     # 指标值，形状 (序列数, 时间点数)，缺失为NaN
+    labels: List[Dict[str, str]] = field(default_factory=list)  # 每条序列的标签
+    metric_names: List[str] = field(default_factory=list)       # 每条序列的指标名称
+    
+    @property
+    def series_count(self) -> int:
+        """序列数量"""
+        return self.values.shape[0]
+    
+    @classmethod
+    def from_time_series(cls, time_series_data: List[TimeSeriesData]) -> "SeriesMatrix":
+        """
+        由时间序列列表构建对齐矩阵
+        
+        所有序列的时间戳取并集，缺失位置填充NaN。
+        
+        Args:
+            time_series_data: 时间序列数据列表
+            
+        Returns:
+            SeriesMatrix: 对齐后的矩阵
+        """
+        series_timestamps = [
+            np.array([point.timestamp.timestamp() for point in ts.values], dtype=np.float64)
+            for ts in time_series_data
+        ]
+        series_values = [
+            np.array([point.value for point in ts.values], dtype=np.float64)
+            for ts in time_series_data
+        ]
+        
+        if series_timestamps:
+            timestamps = np.unique(np.concatenate(series_timestamps))
+        else:
+            timestamps = np.empty(0, dtype=np.float64)
+        
+        values = np.full((len(time_series_data), len(timestamps)), np.nan, dtype=np.float64)
+        for row, (ts, vals) in enumerate(zip(series_timestamps, series_values)):
+            values[row, np.searchsorted(timestamps, ts)] = vals
+        
+        return cls(
+            timestamps=timestamps,
+            values=values,
+            labels=[dict(ts.labels) for ts in time_series_data],
+            metric_names=[ts.metric_name for ts in time_series_data]
+        )
+    
+    @classmethod
+    def from_columnar(cls, series_list: List[ColumnarSeries]) -> "SeriesMatrix":
+        """
+        由列式序列构建对齐矩阵
+        
+        Args:
+            series_list: 列式序列列表
+            
+        Returns:
+            SeriesMatrix: 对齐后的矩阵
+        """
+        if series_list:
+            timestamps = np.unique(np.concatenate([series.timestamps for series in series_list]))
+        else:
+            timestamps = np.empty(0, dtype=np.float64)
+        
+        values = np.full((len(series_list), len(timestamps)), np.nan, dtype=np.float64)
+        for row, series in enumerate(series_list):
+            values[row, np.searchsorted(timestamps, series.timestamps)] = series.values
+        
+        return cls(
+            timestamps=timestamps,
+            values=values,
+            labels=[dict(series.labels) for series in series_list],
+            metric_names=[series.metric_name for series in series_list]
+        )
+
 
 class PrometheusService:
     """
@@ -69,23 +288,47 @@ class PrometheusService:
         is_healthy = await service.health_check()
     """
     
-    def __init__(self):
-        """初始化Prometheus服务"""
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None
+    ):
+        """
+        初始化Prometheus服务
+        
+        Args:
+            base_url: Prometheus地址，默认使用 settings.PROMETHEUS_URL
+            timeout: 请求超时(秒)，默认使用 settings.PROMETHEUS_TIMEOUT
+            max_retries: 最大重试次数，默认使用 settings.PROMETHEUS_MAX_RETRIES
+            username: Basic认证用户名
+            password: Basic认证密码
+        """
         self.logger = logger.bind(component="PrometheusService")
         
         # 服务器配置
-        self.base_url = str(settings.PROMETHEUS_URL).rstrip('/')
-        self.timeout = settings.PROMETHEUS_TIMEOUT
-        self.max_retries = settings.PROMETHEUS_MAX_RETRIES
-        
-        # HTTP客户端配置
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(self.timeout),
-            limits=httpx.Limits(max_connections=20, max_keepalive_connections=5)
-        )
+        self.base_url = str(base_url or settings.PROMETHEUS_URL).rstrip('/')
+        self.timeout = timeout or settings.PROMETHEUS_TIMEOUT
+        self.max_retries = max_retries if max_retries is not None else settings.PROMETHEUS_MAX_RETRIES
+        self.username = username
+        self.password = password
+        
+        # 范围查询分块缓存 - 已完成的时间块长期缓存，头部区间实时查询
+        self.range_cache = RangeBlockCache()
+        
+        # 进行中的范围和即时请求 - 相同参数的并发请求共享同一次HTTP调用
+        self._inflight_fetches: Dict[Tuple[Any, ...], asyncio.Future] = {}
+        self.coalesced_fetches = 0
         
-        # 查询结果缓存 - TTL=30秒
-        self.query_cache = TTLCache(maxsize=100, ttl=30)
+        # 长区间分段 - 单次请求点数不超过Prometheus的每序列上限，分段并发获取
+        self.max_points_per_request = settings.PROMETHEUS_MAX_POINTS_PER_REQUEST
+        self.range_concurrency = settings.PROMETHEUS_RANGE_CONCURRENCY
+        self.chunked_fetches = 0
+        
+        # 瞬时故障重试的基础退避时间
+        self.retry_backoff = settings.PROMETHEUS_RETRY_BACKOFF_SECONDS
         
         self.logger.info(
             "Prometheus服务初始化完成",
@@ -95,24 +338,53 @@ class PrometheusService:
         )
     
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """当前Prometheus地址对应的共享HTTP客户端"""
+        return http_clients.get(self.base_url, self.username, self.password, timeout=self.timeout)
+    
+    
+    @property
+    def guard(self) -> BackendGuard:
+        """当前Prometheus地址对应的熔断器和并发限制器，同一地址的服务实例共用"""
+        return backend_guards.get(self.base_url)
+    
+    
+    def get_guard_stats(self) -> Dict[str, Any]:
+        """
+        获取熔断器和并发限制统计
+        
+        Returns:
+            Dict: 熔断状态、拒绝次数、当前并发上限、排队次数和排队时间
+        """
+        return self.guard.get_stats()
+    
+    
     async def query_range(
         self,
         query: str,
         start_time: datetime,
         end_time: datetime,
-        step: str = "1m"
-    ) -> MetricsResponse:
+        step: str = "1m",
+        columnar: bool = False,
+        max_points: Optional[int] = None
+    ) -> Union[MetricsResponse, ColumnarRangeResult]:
         """
         执行范围查询获取时间序列数据
         
+        结果以列式格式解析和缓存，内部调用方可以传 columnar=True
+        直接使用NumPy数组，只有HTTP接口才需要转换为pydantic模型。
+        
         Args:
             query: PromQL查询语句
             start_time: 查询开始时间
             end_time: 查询结束时间  
             step: 查询步长，如"1m", "5m", "1h"
+            columnar: 为True时返回 ColumnarRangeResult
+            max_points: 每条序列最多需要的点数，按请求步长超出时自动放大步长
             
         Returns:
-            MetricsResponse: 查询结果包含时间序列数据
+            Union[MetricsResponse, ColumnarRangeResult]: 查询结果包含时间序列数据
             
         Raises:
             httpx.HTTPError: HTTP请求失败
@@ -129,11 +401,15 @@ class PrometheusService:
             if start_time >= end_time:
                 raise ValueError("开始时间必须早于结束时间")
             
-            # 检查缓存
-            cache_key = f"{query}:{start_time.isoformat()}:{end_time.isoformat()}:{step}"
-            if cache_key in self.query_cache:
-                self.logger.debug("使用缓存查询结果", query=query)
-                return self.query_cache[cache_key]
+            step_seconds = parse_step_seconds(step)
+            start_ts = start_time.timestamp()
+            end_ts = end_time.timestamp()
+            
+            if max_points:
+                coarse_step = coarsen_step(start_ts, end_ts, step_seconds, max_points)
+                if coarse_step != step_seconds:
+                    self.logger.debug("按最大点数放大查询步长", step=step, step_seconds=coarse_step, max_points=max_points)
+                    step_seconds = coarse_step
             
             self.logger.info(
                 "执行Prometheus范围查询",
@@ -143,44 +419,64 @@ class PrometheusService:
                 step=step
             )
             
-            # 构建查询参数
-            params = {
-                "query": query,
-                "start": start_time.timestamp(),
-                "end": end_time.timestamp(),
-                "step": step
-            }
+            # 按步长对齐划分时间块
+            block = self.range_cache.block_size(step_seconds)
+            block_starts, head_start = self.range_cache.plan(
+                start_ts, end_ts, step_seconds, now_ts=time.time()
+            )
             
-            # 执行查询
-            url = urljoin(self.base_url, "/api/v1/query_range")
-            response_data = await self._execute_request("GET", url, params=params)
+            pieces: List[List[ColumnarSeries]] = []
+            missing_blocks: List[int] = []
+            for block_start in block_starts:
+                cached = self.range_cache.get(query, step_seconds, block_start)
+                pieces.append(cached)
+                if cached is None:
+                    missing_blocks.append(block_start)
             
-            # 解析响应数据
-            time_series_data = await self._parse_range_response(response_data)
+            # 连续的未命中块合并为一次查询，结果拆分后写入缓存
+            fetched_blocks: Dict[int, List[ColumnarSeries]] = {}
+            for run in self._contiguous_runs(missing_blocks, block):
+                run_series = await self._fetch_range_series(
+                    query, run[0], run[-1] + block - step_seconds, step_seconds
+                )
+                for block_start in run:
+                    block_series = [
+                        piece for piece in (
+                            series.slice(block_start, block_start + block) for series in run_series
+                        )
+                        if len(piece)
+                    ]
+                    self.range_cache.put(query, step_seconds, block_start, block_series)
+                    fetched_blocks[block_start] = block_series
             
-            execution_time = time.time() - execution_start
+            pieces = [
+                piece if piece is not None else fetched_blocks[block_start]
+                for piece, block_start in zip(pieces, block_starts)
+            ]
+            
+            # 包含当前时间的头部区间每次实时查询
+            if head_start is not None:
+                self.range_cache.record_head_fetch()
+                pieces.append(await self._fetch_range_series(query, head_start, end_ts, step_seconds))
             
-            # 构建响应
-            metrics_response = MetricsResponse(
-                success=True,
-                message="查询执行成功",
-                data=time_series_data,
+            columnar_result = ColumnarRangeResult(
                 query=query,
-                execution_time=execution_time
+                series=self._stitch_series(pieces, start_ts, end_ts),
+                step_seconds=step_seconds
             )
-            
-            # 缓存结果
-            self.query_cache[cache_key] = metrics_response
+            columnar_result.execution_time = time.time() - execution_start
             
             self.logger.info(
                 "Prometheus查询完成",
                 query=query,
-                series_count=len(time_series_data),
-                total_points=sum(len(ts.values) for ts in time_series_data),
-                execution_time=round(execution_time, 3)
+                series_count=len(columnar_result.series),
+                total_points=columnar_result.total_points,
+                cached_blocks=len(block_starts) - len(missing_blocks),
+                fetched_blocks=len(missing_blocks),
+                execution_time=round(columnar_result.execution_time, 3)
             )
             
-            return metrics_response
+            return columnar_result if columnar else columnar_result.to_metrics_response()
             
         except Exception as e:
             execution_time = time.time() - execution_start
@@ -193,17 +489,245 @@ class PrometheusService:
             raise RuntimeError(f"Prometheus查询失败: {str(e)}")
     
     
-    async def query_instant(self, query: str, timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    async def _fetch_range_series(
+        self,
+        query: str,
+        start_ts: float,
+        end_ts: float,
+        step_seconds: int
+    ) -> List[ColumnarSeries]:
+        """
+        向Prometheus请求一段范围数据
+        
+        参数完全相同的并发请求只发出一次HTTP调用，其余调用方等待同一结果。
+        
+        Args:
+            query: PromQL查询语句
+            start_ts: 开始时间戳(秒)，已按步长对齐
+            end_ts: 结束时间戳(秒)，包含
+            step_seconds: 步长(秒)
+            
+        Returns:
+            List[ColumnarSeries]: 解析后的列式序列
+        """
+        return await self._coalesce(
+            (query, start_ts, end_ts, step_seconds),
+            lambda: self._request_range_series(query, start_ts, end_ts, step_seconds)
+        )
+    
+    
+    async def _coalesce(self, key: Tuple[Any, ...], request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        合并参数完全相同的并发请求
+        
+        Args:
+            key: 请求参数键
+            request: 没有进行中的相同请求时调用，发起HTTP请求
+            
+        Returns:
+            请求结果，所有等待方共享同一个对象
+        """
+        fetch = self._inflight_fetches.get(key)
+        
+        if fetch is not None:
+            self.coalesced_fetches += 1
+            self.logger.debug("合并进行中的相同请求", query=key[0])
+        else:
+            fetch = asyncio.ensure_future(request())
+            self._inflight_fetches[key] = fetch
+            fetch.add_done_callback(lambda done: self._inflight_fetches.pop(key, None))
+            # 所有等待方都被取消时避免"异常未被获取"的警告
+            fetch.add_done_callback(lambda done: done.cancelled() or done.exception())
+        
+        # shield: 单个调用方超时取消不影响其他等待同一请求的调用方
+        return await asyncio.shield(fetch)
+    
+    
+    async def _request_range_series(
+        self,
+        query: str,
+        start_ts: float,
+        end_ts: float,
+        step_seconds: int
+    ) -> List[ColumnarSeries]:
+        """
+        请求一段范围数据，点数超过单次请求上限时分段并发请求后拼接
+        
+        Prometheus拒绝每条序列超过11000点的范围查询，30天1分钟步长的训练数据
+        需要拆分为多段；各段按步长对齐、互不重叠，并发数受 range_concurrency 限制。
+        """
+        chunks = self._split_range(start_ts, end_ts, step_seconds)
+        if len(chunks) == 1:
+            return await self._request_range_chunk(query, start_ts, end_ts, step_seconds)
+        
+        self.chunked_fetches += 1
+        self.logger.debug("范围查询分段请求", query=query, chunks=len(chunks))
+        slots = asyncio.Semaphore(self.range_concurrency)
+        
+        async def fetch_chunk(chunk_start: float, chunk_end: float) -> List[ColumnarSeries]:
+            async with slots:
+                return await self._request_range_chunk(query, chunk_start, chunk_end, step_seconds)
+        
+        tasks = [asyncio.ensure_future(fetch_chunk(*chunk)) for chunk in chunks]
+        try:
+            pieces = await asyncio.gather(*tasks)
+        except BaseException:
+            # 任一分段失败时取消其余分段
+            for task in tasks:
+                task.cancel()
+            raise
+        
+        return self._stitch_series(list(pieces), start_ts, end_ts)
+    
+    
+    def _split_range(self, start_ts: float, end_ts: float, step_seconds: int) -> List[Tuple[float, float]]:
+        """按单次请求点数上限把区间拆分为步长对齐的子区间，结束时间包含"""
+        span = self.max_points_per_request * step_seconds
+        chunks = []
+        chunk_start = start_ts
+        while chunk_start <= end_ts:
+            chunks.append((chunk_start, min(chunk_start + span - step_seconds, end_ts)))
+            chunk_start += span
+        return chunks or [(start_ts, end_ts)]
+    
+    
+    async def _request_range_chunk(
+        self,
+        query: str,
+        start_ts: float,
+        end_ts: float,
+        step_seconds: int
+    ) -> List[ColumnarSeries]:
+        """执行 /api/v1/query_range 请求并解析为列式序列"""
+        params = {
+            "query": query,
+            "start": start_ts,
+            "end": end_ts,
+            "step": step_seconds
+        }
+        
+        url = urljoin(self.base_url, "/api/v1/query_range")
+        response_data = await self._execute_request("GET", url, params=params)
+        
+        return self._parse_range_columnar(response_data)
+    
+    
+    @staticmethod
+    def _contiguous_runs(block_starts: List[int], block: int) -> List[List[int]]:
+        """将块起始时间列表按连续性分组"""
+        runs: List[List[int]] = []
+        for block_start in block_starts:
+            if runs and runs[-1][-1] + block == block_start:
+                runs[-1].append(block_start)
+            else:
+                runs.append([block_start])
+        return runs
+    
+    
+    @staticmethod
+    def _stitch_series(
+        pieces: List[List[ColumnarSeries]],
+        start_ts: float,
+        end_ts: float
+    ) -> List[ColumnarSeries]:
+        """
+        按序列标识拼接各时间块的数据，并截取到查询范围
+        
+        Args:
+            pieces: 按时间顺序排列的各段序列列表
+            start_ts: 查询开始时间戳(秒)
+            end_ts: 查询结束时间戳(秒)，包含
+            
+        Returns:
+            List[ColumnarSeries]: 拼接后的序列，按首次出现的顺序排列
+        """
+        grouped: Dict[Tuple, List[ColumnarSeries]] = {}
+        for piece in pieces:
+            for series in piece:
+                grouped.setdefault(series.series_key, []).append(series)
+        
+        stitched = []
+        for parts in grouped.values():
+            if len(parts) == 1:
+                merged = parts[0]
+            else:
+                merged = ColumnarSeries(
+                    metric_name=parts[0].metric_name,
+                    labels=parts[0].labels,
+                    timestamps=np.concatenate([part.timestamps for part in parts]),
+                    values=np.concatenate([part.values for part in parts])
+                )
+            merged = merged.slice(start_ts, np.nextafter(end_ts, np.inf))
+            if len(merged):
+                stitched.append(merged)
+        
+        return stitched
+    
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取范围查询缓存统计
+        
+        Returns:
+            Dict: 命中率、缓存块数量、请求合并次数和累计计数
+        """
+        return {
+            **self.range_cache.get_stats(),
+            "coalesced_fetches": self.coalesced_fetches,
+            "chunked_fetches": self.chunked_fetches,
+            "inflight_fetches": len(self._inflight_fetches)
+        }
+    
+    
+    async def query_range_matrix(
+        self,
+        query: str,
+        start_time: datetime,
+        end_time: datetime,
+        step: str = "1m",
+        max_points: Optional[int] = None
+    ) -> SeriesMatrix:
+        """
+        执行范围查询并返回按时间对齐的多序列矩阵
+        
+        Args:
+            query: PromQL查询语句
+            start_time: 查询开始时间
+            end_time: 查询结束时间
+            step: 查询步长
+            max_points: 每条序列最多需要的点数
+            
+        Returns:
+            SeriesMatrix: 形状为 (序列数, 时间点数) 的对齐矩阵
+        """
+        columnar_result = await self.query_range(
+            query, start_time, end_time, step, columnar=True, max_points=max_points
+        )
+        return SeriesMatrix.from_columnar(columnar_result.series)
+    
+    
+    async def query_instant(
+        self,
+        query: str,
+        timestamp: Optional[datetime] = None,
+        columnar: bool = False
+    ) -> Union[Dict[str, Any], ColumnarRangeResult]:
         """
         执行即时查询获取单个时间点数据
         
+        查询时间按秒取整；同一秒内相同查询的并发请求（如调度周期和手动触发的规则执行）
+        只发出一次HTTP调用。
+        
         Args:
             query: PromQL查询语句
             timestamp: 查询时间点，None表示当前时间
+            columnar: 为True时返回每条序列只有一个点的 ColumnarRangeResult
             
         Returns:
-            Dict: 查询结果数据
+            Union[Dict, ColumnarRangeResult]: 查询结果数据
         """
+        execution_start = time.time()
+        
         try:
             if timestamp is None:
                 timestamp = datetime.now()
@@ -212,13 +736,23 @@ class PrometheusService:
             
             params = {
                 "query": query,
-                "time": timestamp.timestamp()
+                "time": float(math.floor(timestamp.timestamp()))
             }
             
             url = urljoin(self.base_url, "/api/v1/query")
-            response_data = await self._execute_request("GET", url, params=params)
+            response_data = await self._coalesce(
+                (query, params["time"]),
+                lambda: self._execute_request("GET", url, params=params)
+            )
             
-            return response_data
+            if not columnar:
+                return response_data
+            
+            return ColumnarRangeResult(
+                query=query,
+                series=self._parse_instant_columnar(response_data),
+                execution_time=time.time() - execution_start
+            )
             
         except Exception as e:
             self.logger.error("Prometheus即时查询失败", query=query, error=str(e))
@@ -298,7 +832,10 @@ class PrometheusService:
     
     async def _execute_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
         """
-        执行HTTP请求，包含重试机制
+        执行HTTP请求，经过熔断器和自适应并发限制
+        
+        过载（超时、429/503/504）和查询错误（4xx）不重试，立即失败以免放大Prometheus压力；
+        连接失败等瞬时故障按带抖动的短退避重试，熔断器打开后剩余重试直接失败。
         
         Args:
             method: HTTP方法
@@ -307,9 +844,17 @@ class PrometheusService:
             
         Returns:
             Dict: 响应数据
+            
+        Raises:
+            BackendUnavailableError: 熔断或排队超时，请求没有发出
         """
         last_error = None
         
+        async def send() -> httpx.Response:
+            response = await self.client.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response
+        
         for attempt in range(self.max_retries + 1):
             try:
                 self.logger.debug(
@@ -320,13 +865,19 @@ class PrometheusService:
                     max_retries=self.max_retries + 1
                 )
                 
-                response = await self.client.request(method, url, **kwargs)
-                response.raise_for_status()
+                response = await self.guard.call(send, _classify_error)
+                return _json_loads(response.content)
                 
-                return response.json()
+            except BackendUnavailableError as e:
+                self.logger.warning("Prometheus请求被拒绝", method=method, url=url, error=str(e))
+                raise
                 
             except httpx.HTTPError as e:
                 last_error = e
+                if _classify_error(e) != FAILURE:
+                    self.logger.warning("HTTP请求失败，不重试", method=method, url=url, error=str(e))
+                    raise RuntimeError(f"HTTP请求失败: {str(e)}")
+                
                 self.logger.warning(
                     "HTTP请求失败，准备重试",
                     method=method,
@@ -336,8 +887,9 @@ class PrometheusService:
                 )
                 
                 if attempt < self.max_retries:
-                    # 指数退避重试
-                    await asyncio.sleep(2 ** attempt)
+                    # 带抖动的短退避，最长2秒
+                    delay = min(2.0, self.retry_backoff * 2 ** attempt)
+                    await asyncio.sleep(delay / 2 + random.uniform(0, delay / 2))
                 
             except Exception as e:
                 self.logger.error("HTTP请求发生非预期错误", method=method, url=url, error=str(e))
@@ -347,15 +899,18 @@ class PrometheusService:
         raise RuntimeError(f"HTTP请求失败，已重试{self.max_retries}次: {str(last_error)}")
     
     
-    async def _parse_range_response(self, response_data: Dict[str, Any]) -> List[TimeSeriesData]:
+    def _parse_range_columnar(self, response_data: Dict[str, Any]) -> List[ColumnarSeries]:
         """
-        解析Prometheus范围查询响应
+        解析Prometheus范围查询响应为列式序列
+        
+        每条序列的 [时间戳, "数值"] 对一次性转换为两个float64数组，
+        数值字符串由NumPy直接解析。
         
         Args:
             response_data: Prometheus API响应数据
             
         Returns:
-            List[TimeSeriesData]: 解析后的时间序列数据
+            List[ColumnarSeries]: 解析后的列式序列（跳过没有有效数据点的序列）
         """
         try:
             if response_data.get("status") != "success":
@@ -363,66 +918,122 @@ class PrometheusService:
                 raise RuntimeError(f"Prometheus查询失败: {error_msg}")
             
             result = response_data.get("data", {}).get("result", [])
-            time_series_list = []
+            series_list = []
             
             for series in result:
                 # 解析指标信息
-                metric_info = series.get("metric", {})
-                metric_name = metric_info.pop("__name__", "unknown_metric")
-                labels = metric_info
+                labels = dict(series.get("metric", {}))
+                metric_name = labels.pop("__name__", "unknown_metric")
                 
-                # 解析数据点
                 values_data = series.get("values", [])
-                data_points = []
+                if not values_data:
+                    continue
                 
-                for timestamp, value in values_data:
-                    try:
-                        data_point = MetricDataPoint(
-                            timestamp=datetime.fromtimestamp(float(timestamp)),
-                            value=float(value),
-                            labels=labels.copy()
-                        )
-                        data_points.append(data_point)
-                    except (ValueError, TypeError) as e:
-                        self.logger.warning(
-                            "跳过无效数据点",
-                            timestamp=timestamp,
-                            value=value,
-                            error=str(e)
-                        )
-                        continue
-                
-                # 创建时间序列对象
-                if data_points:  # 只添加有效数据点的序列
-                    time_series = TimeSeriesData(
+                timestamps, values = self._parse_sample_pairs(values_data)
+                if len(timestamps):  # 只添加有效数据点的序列
+                    series_list.append(ColumnarSeries(
                         metric_name=metric_name,
                         labels=labels,
-                        values=data_points
-                    )
-                    time_series_list.append(time_series)
+                        timestamps=timestamps,
+                        values=values
+                    ))
             
             self.logger.debug(
                 "Prometheus响应解析完成",
-                series_count=len(time_series_list),
-                total_points=sum(len(ts.values) for ts in time_series_list)
+                series_count=len(series_list),
+                total_points=sum(len(series) for series in series_list)
             )
             
-            return time_series_list
+            return series_list
             
         except Exception as e:
             self.logger.error("Prometheus响应解析失败", error=str(e))
             raise ValueError(f"响应解析失败: {str(e)}")
     
     
+    def _parse_instant_columnar(self, response_data: Dict[str, Any]) -> List[ColumnarSeries]:
+        """
+        解析Prometheus即时查询响应为列式序列
+        
+        vector结果的每个样本成为只有一个点的序列，scalar结果成为一条无标签序列。
+        
+        Args:
+            response_data: Prometheus API响应数据
+            
+        Returns:
+            List[ColumnarSeries]: 解析后的列式序列
+        """
+        if response_data.get("status") != "success":
+            error_msg = response_data.get("error", "Unknown error")
+            raise RuntimeError(f"Prometheus查询失败: {error_msg}")
+        
+        data = response_data.get("data", {})
+        result = data.get("result", [])
+        
+        if data.get("resultType") == "scalar":
+            samples = [({}, result)] if result else []
+        else:
+            samples = [(series.get("metric", {}), series.get("value")) for series in result]
+        
+        series_list = []
+        for metric_info, sample in samples:
+            if not sample:
+                continue
+            labels = dict(metric_info)
+            metric_name = labels.pop("__name__", "unknown_metric")
+            timestamps, values = self._parse_sample_pairs([sample])
+            if len(timestamps):
+                series_list.append(ColumnarSeries(
+                    metric_name=metric_name,
+                    labels=labels,
+                    timestamps=timestamps,
+                    values=values
+                ))
+        
+        return series_list
+    
+    
+    def _parse_sample_pairs(self, values_data: List[List[Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        将 [时间戳, "数值"] 列表转换为时间戳和数值数组
+        
+        Args:
+            values_data: Prometheus返回的样本列表
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (时间戳数组, 数值数组)
+        """
+        count = len(values_data)
+        try:
+            timestamps = np.fromiter((pair[0] for pair in values_data), dtype=np.float64, count=count)
+            values = np.fromiter((pair[1] for pair in values_data), dtype=np.float64, count=count)
+            return timestamps, values
+        except (ValueError, TypeError, IndexError):
+            pass
+        
+        # 存在无效样本时逐点解析并跳过无效点
+        timestamps_list, values_list = [], []
+        for pair in values_data:
+            try:
+                timestamp, value = float(pair[0]), float(pair[1])
+            except (ValueError, TypeError, IndexError) as e:
+                self.logger.warning("跳过无效数据点", sample=pair, error=str(e))
+                continue
+            timestamps_list.append(timestamp)
+            values_list.append(value)
+        
+        return np.array(timestamps_list, dtype=np.float64), np.array(values_list, dtype=np.float64)
+    
+    
     async def __aenter__(self):
         """异步上下文管理器入口"""
         return self
     
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """异步上下文管理器退出，关闭HTTP客户端"""
-        await self.client.aclose()
+        """异步上下文管理器退出，HTTP客户端由共享注册表在应用关闭时统一关闭"""
+        pass
 
 
 # 导出类
-__all__ = ["PrometheusService"]
\ No newline at end of file
+__all__ = ["PrometheusService", "ColumnarSeries", "ColumnarRangeResult", "SeriesMatrix"]
\ No newline at end of file
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+范围查询分块缓存 - 按步长对齐的Prometheus结果缓存
+
+调用方通常以 datetime.now() 作为查询结束时间，按精确时间戳做键的缓存几乎不会命中。
+本模块把查询窗口按步长对齐后切分为固定长度的时间块（默认1小时），
+已经完全落在过去的时间块内容不再变化，可以长期缓存；
+只有包含"现在"的头部区间需要每次向Prometheus查询。
+
+功能特性:
+1. Prometheus步长格式解析 (30s, 1m, 1h30m 等)，按最大点数放大步长
+2. 时间块划分：已完成的块走缓存，头部区间实时查询
+3. LRU淘汰，缓存块数量由 settings.PROMETHEUS_CACHE_MAX_BLOCKS 控制
+4. 命中/未命中/头部查询次数统计
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from cachetools import LRUCache
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# Prometheus时长单位（秒）
+_DURATION_UNITS = {
+    "ms": 0.001,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 604800,
+    "y": 31536000
+}
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+
+
+def parse_step_seconds(step: str) -> int:
+    """
+    解析Prometheus步长为整数秒
+
+    Args:
+        step: 步长，如 "60"、"30s"、"5m"、"1h30m"
+
+    Returns:
+        int: 步长秒数（至少为1）
+
+    Raises:
+        ValueError: 当步长格式无效时
+    """
+    step = str(step).strip()
+    try:
+        return max(1, math.ceil(float(step)))
+    except ValueError:
+        pass
+
+    parts = _DURATION_PATTERN.findall(step)
+    if not parts or "".join(number + unit for number, unit in parts) != step:
+        raise ValueError(f"无效的查询步长: {step}")
+
+    seconds = sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    return max(1, math.ceil(seconds))
+
+
+# 自动放大步长时选用的步长(秒)
+_COARSE_STEPS = (15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+
+
+def coarsen_step(start_ts: float, end_ts: float, step_seconds: int, max_points: int) -> int:
+    """
+    按最大点数选择步长
+
+    区间按原步长的点数不超过 max_points 时保持原步长，
+    否则选择满足点数限制的最小常用步长（超过1天时取整天）。
+
+    Args:
+        start_ts: 开始时间戳(秒)
+        end_ts: 结束时间戳(秒)
+        step_seconds: 请求的步长(秒)
+        max_points: 每条序列的最大点数
+
+    Returns:
+        int: 实际使用的步长(秒)
+    """
+    needed = math.ceil((end_ts - start_ts) / max(max_points - 1, 1))
+    if needed <= step_seconds:
+        return step_seconds
+    for candidate in _COARSE_STEPS:
+        if candidate >= needed:
+            return candidate
+    return math.ceil(needed / 86400) * 86400
+
+
+class RangeBlockCache:
+    """
+    范围查询时间块缓存
+
+    缓存键为 (查询语句, 步长, 块起始时间)，值由调用方决定（通常是该块内的序列列表）。
+    块长度是步长的整数倍，块边界都落在步长网格上，
+    因此任意时刻发起的滑动窗口查询都能复用相同的块。
+
+    使用示例:
+        cache = RangeBlockCache()
+
+        blocks, head_start = cache.plan(start_ts, end_ts, step_seconds, now_ts)
+        for block_start in blocks:
+            cached = cache.get(query, step_seconds, block_start)
+    """
+
+    def __init__(
+        self,
+        block_seconds: Optional[int] = None,
+        max_blocks: Optional[int] = None,
+        settle_seconds: Optional[int] = None
+    ):
+        """
+        初始化分块缓存
+
+        Args:
+            block_seconds: 目标块长度(秒)，默认使用 settings.PROMETHEUS_CACHE_BLOCK_SECONDS
+            max_blocks: 最大缓存块数，默认使用 settings.PROMETHEUS_CACHE_MAX_BLOCKS
+            settle_seconds: 数据稳定延迟(秒)，早于 now-settle 的块才视为已完成
+        """
+        self.block_seconds = block_seconds or settings.PROMETHEUS_CACHE_BLOCK_SECONDS
+        self.settle_seconds = (
+            settle_seconds if settle_seconds is not None else settings.PROMETHEUS_CACHE_SETTLE_SECONDS
+        )
+        self._blocks: LRUCache = LRUCache(maxsize=max_blocks or settings.PROMETHEUS_CACHE_MAX_BLOCKS)
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "head_fetches": 0
+        }
+
+    def block_size(self, step_seconds: int) -> int:
+        """给定步长下的块长度，取不超过目标长度的步长整数倍（至少一个步长）"""
+        return step_seconds * max(1, self.block_seconds // step_seconds)
+
+    def plan(
+        self,
+        start_ts: float,
+        end_ts: float,
+        step_seconds: int,
+        now_ts: float
+    ) -> Tuple[List[int], Optional[int]]:
+        """
+        划分查询区间
+
+        Args:
+            start_ts: 查询开始时间戳(秒)
+            end_ts: 查询结束时间戳(秒)
+            step_seconds: 步长(秒)
+            now_ts: 当前时间戳(秒)
+
+        Returns:
+            Tuple[List[int], Optional[int]]: (可缓存的已完成块起始时间列表, 头部区间起始时间)，
+            头部区间为None表示整个区间都由已完成的块覆盖
+        """
+        block = self.block_size(step_seconds)
+        horizon = now_ts - max(self.settle_seconds, step_seconds)
+
+        aligned_start = math.floor(start_ts / step_seconds) * step_seconds
+        block_start = math.floor(aligned_start / block) * block
+
+        complete_blocks = []
+        while block_start <= end_ts and block_start + block <= horizon:
+            complete_blocks.append(block_start)
+            block_start += block
+
+        head_start = None
+        if block_start <= end_ts:
+            head_start = max(block_start, aligned_start)
+
+        return complete_blocks, head_start
+
+    def get(self, query: str, step_seconds: int, block_start: int) -> Optional[Any]:
+        """读取缓存块，同时记录命中/未命中"""
+        value = self._blocks.get((query, step_seconds, block_start))
+        if value is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return value
+
+    def put(self, query: str, step_seconds: int, block_start: int, value: Any) -> None:
+        """写入已完成的块"""
+        self._blocks[(query, step_seconds, block_start)] = value
+
+    def record_head_fetch(self) -> None:
+        """记录一次头部区间实时查询"""
+        self.stats["head_fetches"] += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._blocks.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict: 命中率、缓存块数量和累计计数
+        """
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "blocks": len(self._blocks),
+            "max_blocks": self._blocks.maxsize,
+            "block_seconds": self.block_seconds,
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "head_fetches": self.stats["head_fetches"],
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+
+# 导出类
+__all__ = ["RangeBlockCache", "parse_step_seconds", "coarsen_step"]
@@ -20,11 +20,13 @@
 
 import asyncio
 import time
+from contextvars import ContextVar
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
+import numpy as np
 import structlog
 from rule_engine import Rule, Context
 
@@ -35,11 +37,17 @@ from app.models.schemas import (
     RuleExecutionResult,
     RulesExecutionResponse,
     RuleOperator,
+    ConditionEvaluationMode,
     AlertSeverity,
     NotificationChannel,
     APIResponse
 )
-from app.services.prometheus_service import PrometheusService
+from app.services.alert_pipeline import AlertEvent, AlertPipeline, alert_pipeline as default_alert_pipeline
+from app.services.execution_history import ExecutionHistory
+from app.services.prometheus_registry import prometheus_services
+from app.services.prometheus_service import ColumnarRangeResult, PrometheusService
+from app.services.rule_scheduler import RuleScheduler
+from app.services.rule_store import RuleStore
 from app.core.config import settings
 
 logger = structlog.get_logger(__name__)
@@ -56,6 +64,85 @@ class RuleExecutionContext:
     execution_count: int = 0
 
 
+@dataclass
+class EvaluationCycle:
+    """
+    一次批量执行周期的共享状态
+    
+    同一周期内的所有条件使用相同的查询时间点，
+    编译后PromQL相同的条件共享一次数据获取。
+    """
+    end_time: datetime
+    fetches: Dict[str, asyncio.Future] = field(default_factory=dict)
+    shared_fetches: int = 0
+
+
+@dataclass
+class ConditionEvaluation:
+    """
+    单个条件的评估结果
+    
+    聚合模式下 value 为跨序列平均值；逐序列模式下 value 为空，
+    offending_series 为所有满足条件的序列标签集。
+    """
+    met: bool
+    value: Optional[float] = None
+    series_count: int = 0
+    offending_series: List[Dict[str, str]] = field(default_factory=list)
+
+
+# 各操作符对应的向量化比较，等于/不等于使用与原实现相同的 1e-6 容差
+_COMPARATORS = {
+    RuleOperator.GREATER_THAN: np.greater,
+    RuleOperator.LESS_THAN: np.less,
+    RuleOperator.GREATER_EQUAL: np.greater_equal,
+    RuleOperator.LESS_EQUAL: np.less_equal,
+    RuleOperator.EQUAL: lambda values, threshold: np.isclose(values, threshold, rtol=0, atol=1e-6),
+    RuleOperator.NOT_EQUAL: lambda values, threshold: ~np.isclose(values, threshold, rtol=0, atol=1e-6)
+}
+
+# 执行结果元数据中保留的违规序列数量上限，完整列表见 ConditionEvaluation
+MAX_REPORTED_SERIES = 100
+
+# 持续模式下各操作符使用的窗口聚合函数：大于类要求窗口最小值满足，小于类要求最大值满足
+_SUSTAINED_FUNCTIONS = {
+    RuleOperator.GREATER_THAN: "min_over_time",
+    RuleOperator.GREATER_EQUAL: "min_over_time",
+    RuleOperator.LESS_THAN: "max_over_time",
+    RuleOperator.LESS_EQUAL: "max_over_time"
+}
+
+
+def compile_condition_query(condition: RuleCondition, step: str = "1m") -> str:
+    """
+    将规则条件编译为即时查询PromQL
+    
+    通过子查询在Prometheus端完成窗口内的取值和跨序列平均，
+    返回结果只有一个样本，而不是 duration_minutes 个点 × 序列数。
+    逐序列模式不做跨序列平均，每条序列返回一个样本。
+    
+    Args:
+        condition: 规则条件
+        step: 子查询分辨率
+        
+    Returns:
+        str: 即时查询PromQL
+    """
+    window = f"[{condition.duration_minutes}m:{step}]"
+    
+    if condition.evaluation_mode == ConditionEvaluationMode.SUSTAINED:
+        function = _SUSTAINED_FUNCTIONS[condition.operator]
+    else:
+        function = "last_over_time"
+    
+    expression = f"{function}(({condition.metric_query}){window})"
+    return expression if condition.per_series else f"avg({expression})"
+
+
+# 当前执行周期，由 execute_rules 设置，并发任务自动继承
+_current_cycle: ContextVar[Optional[EvaluationCycle]] = ContextVar("rule_evaluation_cycle", default=None)
+
+
 class RuleExecutionStatus(Enum):
     """规则执行状态"""
     SUCCESS = "success"
@@ -92,42 +179,70 @@ class RuleEngine:
         result = await engine.execute_rule(rule_id)
     """
     
-    def __init__(self, prometheus_service: Optional[PrometheusService] = None):
+    def __init__(
+        self,
+        prometheus_service: Optional[PrometheusService] = None,
+        rule_store: Optional[RuleStore] = None,
+        alert_pipeline: Optional[AlertPipeline] = None
+    ):
         """
         初始化规则引擎
         
         Args:
-            prometheus_service: Prometheus数据服务实例
+            prometheus_service: Prometheus数据服务实例，默认跟随当前Prometheus配置
+            rule_store: 规则存储，默认使用应用数据库
+            alert_pipeline: 告警管道，默认使用全局告警管道
         """
         self.logger = logger.bind(component="RuleEngine")
         
         # 服务依赖
-        self.prometheus_service = prometheus_service or PrometheusService()
+        self.prometheus_service = prometheus_service or prometheus_services.active()
+        
+        # 规则存储 - 数据库持久化，读取走进程内缓存
+        self.rule_store = rule_store or RuleStore()
         
-        # 规则存储 - 在实际应用中应该使用数据库
-        self.rules: Dict[int, InspectionRule] = {}
-        self.rule_counter = 0
+        # 触发的规则生成告警，批量写入后发送通知
+        self.alert_pipeline = alert_pipeline or default_alert_pipeline
         
         # 执行历史和统计
-        self.execution_history: List[RuleExecutionResult] = []
-        self.execution_stats = {
-            "total_executions": 0,
-            "successful_executions": 0,
-            "failed_executions": 0,
-            "triggered_rules": 0
-        }
+        self.execution_history = ExecutionHistory(max_results=1000, window_minutes=24 * 60)
         
         # 执行配置
-        self.max_execution_time = 60  # 单个规则最大执行时间（秒）
-        self.batch_size = 50          # 批量执行规则数量
+        self.condition_timeout = settings.RULE_EXECUTION_TIMEOUT  # 单个条件最大评估时间（秒）
+        self.max_concurrency = settings.RULES_MAX_CONCURRENCY     # 全局并发评估的条件数
+        
+        # 条件评估并发槽位，按事件循环惰性创建
+        self._evaluation_slots: Optional[asyncio.Semaphore] = None
+        self._evaluation_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # 按规则间隔调度的到期时间堆
+        self.scheduler = RuleScheduler()
+        
+        # 调度周期统计
+        self.cycle_stats = {
+            "cycles": 0,
+            "last_due_rules": 0,
+            "overruns": 0,
+            "last_duration": 0.0,
+            "max_duration": 0.0,
+            "last_lag": 0.0,
+            "max_lag": 0.0,
+            "last_completed_at": None
+        }
         
         self.logger.info(
             "规则引擎初始化完成",
-            max_execution_time=self.max_execution_time,
-            batch_size=self.batch_size
+            condition_timeout=self.condition_timeout,
+            max_concurrency=self.max_concurrency
         )
     
     
+    @property
+    def rules(self) -> Dict[int, InspectionRule]:
+        """规则缓存（只读视图，修改请使用 create_rule/update_rule/delete_rule）"""
+        return self.rule_store.rules
+    
+    
     async def create_rule(self, rule_data: InspectionRuleCreate) -> int:
         """
         创建新的巡检规则
@@ -145,27 +260,8 @@ class RuleEngine:
             # 数据验证
             await self._validate_rule_data(rule_data)
             
-            # 生成规则ID
-            self.rule_counter += 1
-            rule_id = self.rule_counter
-            
-            # 创建规则对象
-            rule = InspectionRule(
-                id=rule_id,
-                name=rule_data.name,
-                description=rule_data.description,
-                enabled=rule_data.enabled,
-                conditions=rule_data.conditions,
-                severity=rule_data.severity,
-                notification_channels=rule_data.notification_channels,
-                cooldown_minutes=rule_data.cooldown_minutes,
-                tags=rule_data.tags,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            
-            # 存储规则
-            self.rules[rule_id] = rule
+            rule = await self.rule_store.create(rule_data)
+            rule_id = rule.id
             
             self.logger.info(
                 "规则创建成功",
@@ -194,35 +290,13 @@ class RuleEngine:
             bool: 更新是否成功
         """
         try:
-            if rule_id not in self.rules:
-                raise ValueError(f"规则不存在: {rule_id}")
-            
             # 数据验证
             await self._validate_rule_data(rule_data)
             
-            # 获取现有规则
-            existing_rule = self.rules[rule_id]
-            
-            # 更新规则数据
-            updated_rule = InspectionRule(
-                id=rule_id,
-                name=rule_data.name,
-                description=rule_data.description,
-                enabled=rule_data.enabled,
-                conditions=rule_data.conditions,
-                severity=rule_data.severity,
-                notification_channels=rule_data.notification_channels,
-                cooldown_minutes=rule_data.cooldown_minutes,
-                tags=rule_data.tags,
-                created_at=existing_rule.created_at,
-                updated_at=datetime.now(),
-                last_executed=existing_rule.last_executed,
-                execution_count=existing_rule.execution_count,
-                triggered_count=existing_rule.triggered_count
-            )
-            
-            # 保存更新
-            self.rules[rule_id] = updated_rule
+            # 执行统计和创建时间由存储保留
+            updated_rule = await self.rule_store.update(rule_id, rule_data)
+            if updated_rule is None:
+                raise ValueError(f"规则不存在: {rule_id}")
             
             self.logger.info(
                 "规则更新成功",
@@ -248,13 +322,10 @@ class RuleEngine:
             bool: 删除是否成功
         """
         try:
-            if rule_id not in self.rules:
+            if not await self.rule_store.delete(rule_id):
                 raise ValueError(f"规则不存在: {rule_id}")
             
-            rule_name = self.rules[rule_id].name
-            del self.rules[rule_id]
-            
-            self.logger.info("规则删除成功", rule_id=rule_id, rule_name=rule_name)
+            self.logger.info("规则删除成功", rule_id=rule_id)
             return True
             
         except Exception as e:
@@ -272,6 +343,7 @@ class RuleEngine:
         Returns:
             Optional[InspectionRule]: 规则信息，不存在时返回None
         """
+        await self.rule_store.refresh()
         return self.rules.get(rule_id)
     
     
@@ -285,6 +357,7 @@ class RuleEngine:
         Returns:
             List[InspectionRule]: 规则列表
         """
+        await self.rule_store.refresh()
         rules = list(self.rules.values())
         
         if enabled_only:
@@ -316,6 +389,8 @@ class RuleEngine:
         try:
             self.logger.info("开始批量执行规则", rule_ids=rule_ids, enabled_only=enabled_only)
             
+            await self.rule_store.refresh()
+            
             # 确定要执行的规则列表
             if rule_ids is not None:
                 target_rules = [self.rules[rid] for rid in rule_ids if rid in self.rules]
@@ -325,43 +400,46 @@ class RuleEngine:
             if enabled_only:
                 target_rules = [rule for rule in target_rules if rule.enabled]
             
-            # 执行规则
-            results = []
-            triggered_count = 0
-            alerts_sent = 0
+            # 所有规则并发执行，条件评估的总并发数由信号量限制
+            cycle = EvaluationCycle(end_time=datetime.now())
+            cycle_token = _current_cycle.set(cycle)
+            try:
+                results = list(await asyncio.gather(
+                    *(self._execute_rule_safely(rule) for rule in target_rules)
+                ))
+            finally:
+                _current_cycle.reset(cycle_token)
             
-            for rule in target_rules[:self.batch_size]:  # 限制批量大小
-                try:
-                    result = await self.execute_rule(rule.id)
-                    results.append(result)
-                    
+            # 单次遍历汇总本周期结果
+            triggered_count = 0
+            failed_count = 0
+            condition_timeouts = 0
+            total_duration_ms = 0.0
+            evaluated_ids: List[int] = []
+            triggered_ids: List[int] = []
+            
+            for result in results:
+                total_duration_ms += result.duration_ms
+                if result.triggered:
+                    triggered_count += 1
+                if "error" in result.metadata:
+                    failed_count += 1
+                
+                condition_results = result.metadata.get("condition_results")
+                if condition_results is not None:
+                    evaluated_ids.append(result.rule_id)
                     if result.triggered:
-                        triggered_count += 1
-                        # TODO: 集成通知服务发送告警
-                        alerts_sent += 1
-                        
-                except Exception as e:
-                    self.logger.error("规则执行异常", rule_id=rule.id, error=str(e))
-                    # 创建失败结果
-                    error_result = RuleExecutionResult(
-                        rule_id=rule.id,
-                        rule_name=rule.name,
-                        triggered=False,
-                        severity=rule.severity,
-                        message=f"执行失败: {str(e)}",
-                        conditions_met=0,
-                        total_conditions=len(rule.conditions),
-                        execution_time=datetime.now(),
-                        duration_ms=0.0,
-                        metadata={"error": str(e)}
-                    )
-                    results.append(error_result)
+                        triggered_ids.append(result.rule_id)
+                    condition_timeouts += sum(1 for c in condition_results if c.get("error") == "timeout")
+            
+            # 执行统计每周期批量写入一次
+            await self.rule_store.record_executions(
+                executed_ids=evaluated_ids,
+                triggered_ids=triggered_ids,
+                executed_at=cycle.end_time
+            )
             
-            # 更新统计信息
-            self.execution_stats["total_executions"] += len(results)
-            self.execution_stats["successful_executions"] += len([r for r in results if "error" not in r.metadata])
-            self.execution_stats["failed_executions"] += len([r for r in results if "error" in r.metadata])
-            self.execution_stats["triggered_rules"] += triggered_count
+            alerts_sent = sum(result.metadata.get("alerts_queued", 0) for result in results)
             
             execution_time = time.time() - execution_start
             
@@ -371,8 +449,12 @@ class RuleEngine:
                 "rules_executed": len(results),
                 "rules_triggered": triggered_count,
                 "alerts_sent": alerts_sent,
-                "success_rate": len([r for r in results if "error" not in r.metadata]) / len(results) if results else 0,
-                "average_rule_duration": sum(r.duration_ms for r in results) / len(results) if results else 0
+                "success_rate": (len(results) - failed_count) / len(results) if results else 0,
+                "average_rule_duration": total_duration_ms / len(results) if results else 0,
+                "condition_timeouts": condition_timeouts,
+                "max_concurrency": self.max_concurrency,
+                "queries_fetched": len(cycle.fetches),
+                "queries_shared": cycle.shared_fetches
             }
             
             self.logger.info(
@@ -402,6 +484,36 @@ class RuleEngine:
             raise RuntimeError(f"规则执行失败: {str(e)}")
     
     
+    async def _execute_rule_safely(self, rule: InspectionRule) -> RuleExecutionResult:
+        """
+        执行单个规则，异常时返回失败结果而不是抛出
+        
+        Args:
+            rule: 规则对象
+            
+        Returns:
+            RuleExecutionResult: 规则执行结果
+        """
+        try:
+            return await self.execute_rule(rule.id)
+        except Exception as e:
+            self.logger.error("规则执行异常", rule_id=rule.id, error=str(e))
+            result = RuleExecutionResult(
+                rule_id=rule.id,
+                rule_name=rule.name,
+                triggered=False,
+                severity=rule.severity,
+                message=f"执行失败: {str(e)}",
+                conditions_met=0,
+                total_conditions=len(rule.conditions),
+                execution_time=datetime.now(),
+                duration_ms=0.0,
+                metadata={"error": str(e)}
+            )
+            self.execution_history.record(result)
+            return result
+    
+    
     async def execute_rule(self, rule_id: int) -> RuleExecutionResult:
         """
         执行单个规则
@@ -415,6 +527,11 @@ class RuleEngine:
         execution_start = time.time()
         
         try:
+            # 批量执行周期开始时已刷新过缓存
+            in_cycle = _current_cycle.get() is not None
+            if not in_cycle:
+                await self.rule_store.refresh()
+            
             if rule_id not in self.rules:
                 raise ValueError(f"规则不存在: {rule_id}")
             
@@ -451,36 +568,52 @@ class RuleEngine:
             
             self.logger.debug("开始执行规则", rule_id=rule_id, rule_name=rule.name)
             
-            # 评估所有条件
+            # 并发评估所有条件
+            outcomes = await asyncio.gather(
+                *(self._evaluate_condition_bounded(condition) for condition in rule.conditions),
+                return_exceptions=True
+            )
+            
             conditions_met = 0
             condition_results = []
+            offending_series: Dict[Tuple, Dict[str, str]] = {}
             
-            for i, condition in enumerate(rule.conditions):
-                try:
-                    condition_met = await self._evaluate_condition(condition)
-                    condition_results.append({
-                        "condition_index": i,
-                        "met": condition_met,
-                        "query": condition.metric_query,
-                        "operator": condition.operator.value,
-                        "threshold": condition.threshold
-                    })
-                    
-                    if condition_met:
-                        conditions_met += 1
-                        
-                except Exception as e:
+            for i, (condition, outcome) in enumerate(zip(rule.conditions, outcomes)):
+                if isinstance(outcome, BaseException):
+                    error = "timeout" if isinstance(outcome, asyncio.TimeoutError) else str(outcome)
                     self.logger.warning(
                         "条件评估失败",
                         rule_id=rule_id,
                         condition_index=i,
-                        error=str(e)
+                        error=error
                     )
                     condition_results.append({
                         "condition_index": i,
                         "met": False,
-                        "error": str(e)
+                        "error": error
                     })
+                    continue
+                
+                condition_result = {
+                    "condition_index": i,
+                    "met": outcome.met,
+                    "query": condition.metric_query,
+                    "operator": condition.operator.value,
+                    "threshold": condition.threshold,
+                    "value": outcome.value
+                }
+                if condition.per_series:
+                    condition_result.update({
+                        "series_count": outcome.series_count,
+                        "offending_count": len(outcome.offending_series),
+                        "offending_series": outcome.offending_series[:MAX_REPORTED_SERIES]
+                    })
+                    for labels in outcome.offending_series:
+                        offending_series.setdefault(tuple(sorted(labels.items())), labels)
+                condition_results.append(condition_result)
+                
+                if outcome.met:
+                    conditions_met += 1
             
             # 判断规则是否触发（所有条件都必须满足）
             triggered = conditions_met == len(rule.conditions) and conditions_met > 0
@@ -496,6 +629,14 @@ class RuleEngine:
             rule.last_executed = datetime.now()
             if triggered:
                 rule.triggered_count += 1
+                rule.last_triggered = rule.last_executed
+            
+            # 提交告警：逐序列条件每条违规序列一个告警，否则每个规则一个告警
+            alerts_queued = 0
+            if triggered:
+                alerts_queued = self._submit_alerts(
+                    rule, message, condition_results, list(offending_series.values())
+                )
             
             execution_time = time.time() - execution_start
             
@@ -511,17 +652,22 @@ class RuleEngine:
                 duration_ms=execution_time * 1000,
                 metadata={
                     "condition_results": condition_results,
+                    "alerts_queued": alerts_queued,
                     "tags": rule.tags,
                     "notification_channels": [ch.value for ch in rule.notification_channels]
                 }
             )
             
-            # 记录执行历史
-            self.execution_history.append(result)
+            # 单独执行时立即写入统计，批量执行由 execute_rules 统一写入
+            if not in_cycle:
+                await self.rule_store.record_executions(
+                    executed_ids=[rule_id],
+                    triggered_ids=[rule_id] if triggered else [],
+                    executed_at=rule.last_executed
+                )
             
-            # 限制历史记录长度
-            if len(self.execution_history) > 1000:
-                self.execution_history = self.execution_history[-500:]
+            # 记录执行历史（环形缓冲区，统计增量更新）
+            self.execution_history.record(result)
             
             self.logger.info(
                 "规则执行完成",
@@ -546,6 +692,48 @@ class RuleEngine:
             raise RuntimeError(f"规则执行失败: {str(e)}")
     
     
+    def _submit_alerts(
+        self,
+        rule: InspectionRule,
+        message: str,
+        condition_results: List[Dict[str, Any]],
+        offending_series: List[Dict[str, str]]
+    ) -> int:
+        """
+        为触发的规则生成告警事件并提交到告警管道
+        
+        Args:
+            rule: 触发的规则
+            message: 执行结果消息
+            condition_results: 条件评估结果
+            offending_series: 逐序列条件的违规序列标签
+            
+        Returns:
+            int: 成功进入队列的告警数
+        """
+        context = {"condition_results": [
+            {key: value for key, value in result.items() if key != "offending_series"}
+            for result in condition_results
+        ]}
+        
+        def event(labels: Dict[str, str]) -> AlertEvent:
+            label_text = ", ".join(f"{key}={value}" for key, value in labels.items())
+            return AlertEvent(
+                rule_id=rule.id,
+                title=rule.name,
+                message=f"{message} [{label_text}]" if label_text else message,
+                severity=rule.severity,
+                triggered_at=rule.last_triggered,
+                channels=list(rule.notification_channels),
+                labels=labels,
+                context=context,
+                tags=list(rule.tags)
+            )
+        
+        events = [event(labels) for labels in offending_series] or [event({})]
+        return sum(self.alert_pipeline.submit(item) for item in events)
+    
+    
     async def _validate_rule_data(self, rule_data: InspectionRuleCreate) -> None:
         """
         验证规则数据的有效性
@@ -577,6 +765,11 @@ class RuleEngine:
             # 验证阈值
             if not isinstance(condition.threshold, (int, float)):
                 raise ValueError(f"条件{i+1}的阈值必须是数字")
+            
+            # 持续模式只对大小比较有意义
+            if (condition.evaluation_mode == ConditionEvaluationMode.SUSTAINED
+                    and condition.operator not in _SUSTAINED_FUNCTIONS):
+                raise ValueError(f"条件{i+1}的持续模式只支持 >、>=、<、<= 操作符")
         
         # 验证冷却时间
         if rule_data.cooldown_minutes <= 0:
@@ -596,91 +789,147 @@ class RuleEngine:
         """
         检查规则是否在冷却期内
         
+        冷却期从上次触发开始计算；调度器已把冷却中的规则排到冷却结束后，
+        这里只对手动执行生效。
+        
         Args:
             rule: 规则对象
             
         Returns:
             bool: True表示在冷却期内
         """
-        if rule.last_executed is None:
+        if rule.last_triggered is None:
             return False
         
         cooldown_period = timedelta(minutes=rule.cooldown_minutes)
-        time_since_last = datetime.now() - rule.last_executed
+        time_since_last = datetime.now() - rule.last_triggered
         
         return time_since_last < cooldown_period
 
 
-    async def _evaluate_condition(self, condition: RuleCondition) -> bool:
+    async def _evaluate_condition_bounded(self, condition: RuleCondition) -> ConditionEvaluation:
+        """
+        在并发槽位和超时限制下评估条件
+        
+        Args:
+            condition: 规则条件
+            
+        Returns:
+            ConditionEvaluation: 条件评估结果
+            
+        Raises:
+            asyncio.TimeoutError: 评估超过 RULE_EXECUTION_TIMEOUT 时
+        """
+        async with self._get_evaluation_slots():
+            return await asyncio.wait_for(
+                self._evaluate_condition(condition),
+                timeout=self.condition_timeout
+            )
+    
+    
+    def _get_evaluation_slots(self) -> asyncio.Semaphore:
+        """获取当前事件循环上的条件评估信号量"""
+        loop = asyncio.get_running_loop()
+        if self._evaluation_slots is None or self._evaluation_slots_loop is not loop:
+            self._evaluation_slots = asyncio.Semaphore(self.max_concurrency)
+            self._evaluation_slots_loop = loop
+        return self._evaluation_slots
+
+
+    async def _fetch_condition_data(self, condition: RuleCondition) -> ColumnarRangeResult:
+        """
+        获取条件评估所需的指标数据
+        
+        条件编译为即时查询执行。在 execute_rules 周期内，
+        编译结果相同的条件只发起一次查询，结果分发给所有比较条件；周期外直接查询。
+        
+        Args:
+            condition: 规则条件
+            
+        Returns:
+            ColumnarRangeResult: 列式查询结果（每条序列一个点）
+        """
+        query = compile_condition_query(condition)
+        cycle = _current_cycle.get()
+        
+        if cycle is None:
+            return await self.prometheus_service.query_instant(query, datetime.now(), columnar=True)
+        
+        fetch = cycle.fetches.get(query)
+        if fetch is None:
+            fetch = asyncio.ensure_future(
+                self.prometheus_service.query_instant(query, cycle.end_time, columnar=True)
+            )
+            fetch.add_done_callback(lambda done: done.cancelled() or done.exception())
+            cycle.fetches[query] = fetch
+        else:
+            cycle.shared_fetches += 1
+        
+        # shield: 单个条件超时不会取消其他条件共享的查询
+        return await asyncio.shield(fetch)
+
+
+    async def _evaluate_condition(self, condition: RuleCondition) -> ConditionEvaluation:
         """
         评估单个规则条件
         
+        所有序列的值组成一个数组，用一次向量化比较完成判断。
+        聚合模式比较平均值；逐序列模式逐个比较并返回满足条件的序列标签。
+        
         Args:
             condition: 规则条件
             
         Returns:
-            bool: 条件是否满足
+            ConditionEvaluation: 条件评估结果
         """
         try:
             # 查询Prometheus数据
-            end_time = datetime.now()
-            start_time = end_time - timedelta(minutes=condition.duration_minutes)
+            metrics_result = await self._fetch_condition_data(condition)
             
-            metrics_response = await self.prometheus_service.query_range(
-                query=condition.metric_query,
-                start_time=start_time,
-                end_time=end_time,
-                step="1m"
-            )
-            
-            if not metrics_response.data:
+            series = [item for item in metrics_result.series if len(item)]
+            if not series:
                 self.logger.warning(
                     "查询无数据",
                     query=condition.metric_query,
-                    start_time=start_time,
-                    end_time=end_time
+                    duration_minutes=condition.duration_minutes
                 )
-                return False
-            
-            # 获取最新的数据点值
-            latest_values = []
-            for time_series in metrics_response.data:
-                if time_series.values:
-                    latest_value = time_series.values[-1].value
-                    latest_values.append(latest_value)
-            
-            if not latest_values:
-                return False
-            
-            # 计算聚合值（这里使用平均值，可以根据需要调整）
-            aggregated_value = sum(latest_values) / len(latest_values)
-            
-            # 根据操作符判断条件
-            if condition.operator == RuleOperator.GREATER_THAN:
-                result = aggregated_value > condition.threshold
-            elif condition.operator == RuleOperator.LESS_THAN:
-                result = aggregated_value < condition.threshold
-            elif condition.operator == RuleOperator.GREATER_EQUAL:
-                result = aggregated_value >= condition.threshold
-            elif condition.operator == RuleOperator.LESS_EQUAL:
-                result = aggregated_value <= condition.threshold
-            elif condition.operator == RuleOperator.EQUAL:
-                result = abs(aggregated_value - condition.threshold) < 1e-6
-            elif condition.operator == RuleOperator.NOT_EQUAL:
-                result = abs(aggregated_value - condition.threshold) >= 1e-6
-            else:
+                return ConditionEvaluation(met=False)
+            
+            comparator = _COMPARATORS.get(condition.operator)
+            if comparator is None:
                 raise ValueError(f"不支持的操作符: {condition.operator}")
             
+            # 即时查询每条序列只有一个样本
+            latest_values = np.fromiter((item.values[-1] for item in series), dtype=np.float64, count=len(series))
+            
+            if condition.per_series:
+                mask = comparator(latest_values, condition.threshold)
+                offending_series = [series[index].labels for index in np.flatnonzero(mask)]
+                evaluation = ConditionEvaluation(
+                    met=bool(offending_series),
+                    series_count=len(series),
+                    offending_series=offending_series
+                )
+            else:
+                aggregated_value = float(latest_values.mean())
+                evaluation = ConditionEvaluation(
+                    met=bool(comparator(aggregated_value, condition.threshold)),
+                    value=aggregated_value,
+                    series_count=len(series)
+                )
+            
             self.logger.debug(
                 "条件评估完成",
                 query=condition.metric_query,
-                value=round(aggregated_value, 3),
+                value=round(evaluation.value, 3) if evaluation.value is not None else None,
                 operator=condition.operator.value,
                 threshold=condition.threshold,
-                result=result
+                series_count=evaluation.series_count,
+                offending_count=len(evaluation.offending_series),
+                result=evaluation.met
             )
             
-            return result
+            return evaluation
             
         except Exception as e:
             self.logger.error(
@@ -688,7 +937,7 @@ class RuleEngine:
                 query=condition.metric_query,
                 error=str(e)
             )
-            return False
+            return ConditionEvaluation(met=False)
 
 
     async def get_execution_statistics(self) -> Dict[str, Any]:
@@ -698,31 +947,29 @@ class RuleEngine:
         Returns:
             Dict: 统计信息
         """
+        await self.rule_store.refresh()
         total_rules = len(self.rules)
         enabled_rules = len([r for r in self.rules.values() if r.enabled])
         
-        # 最近24小时的执行历史
-        recent_cutoff = datetime.now() - timedelta(hours=24)
-        recent_executions = [
-            result for result in self.execution_history
-            if result.execution_time >= recent_cutoff
-        ]
-        
         return {
             "total_rules": total_rules,
             "enabled_rules": enabled_rules,
             "disabled_rules": total_rules - enabled_rules,
-            "execution_stats": self.execution_stats.copy(),
-            "recent_24h": {
-                "total_executions": len(recent_executions),
-                "triggered_executions": len([r for r in recent_executions if r.triggered]),
-                "average_duration_ms": sum(r.duration_ms for r in recent_executions) / len(recent_executions) if recent_executions else 0,
-                "success_rate": len([r for r in recent_executions if "error" not in r.metadata]) / len(recent_executions) if recent_executions else 0
-            },
+            "execution_stats": dict(self.execution_history.totals),
+            "recent_24h": self.execution_history.window_summary(),
             "rule_severity_distribution": {
                 severity.value: len([r for r in self.rules.values() if r.severity == severity])
                 for severity in AlertSeverity
-            }
+            },
+            "scheduler": {
+                **self.cycle_stats,
+                **self.scheduler.get_stats(),
+                "interval": settings.RULES_CHECK_INTERVAL,
+                "max_concurrency": self.max_concurrency,
+                "condition_timeout": self.condition_timeout
+            },
+            "rule_store": self.rule_store.get_stats(),
+            "alert_pipeline": self.alert_pipeline.get_stats()
         }
 
 
@@ -730,15 +977,42 @@ class RuleEngine:
         """
         调度规则执行
         
-        定期执行启用的规则检查
+        每次唤醒只执行已到期的规则，每条规则按自己的评估间隔调度，
+        冷却期内的规则在冷却结束前不会被取出。到期规则在同一批次中执行，
+        共享周期内的查询；滞后时间为实际开始时间与最早计划时间之差。
+        休眠时间不超过规则缓存校验间隔，其他进程新增的规则能及时加入调度。
         """
+        interval = settings.RULES_CHECK_INTERVAL
+        
         while True:
             try:
-                # 执行启用的规则
-                await self.execute_rules(enabled_only=True)
+                await self.rule_store.refresh()
+                self.scheduler.sync(self.rules, self.rule_store.version)
+                
+                cycle_start = time.monotonic()
+                due = self.scheduler.pop_due(cycle_start)
                 
-                # 等待下次执行
-                await asyncio.sleep(settings.RULES_CHECK_INTERVAL)
+                if due:
+                    lag = max(0.0, cycle_start - due[0][1])
+                    try:
+                        await self.execute_rules(rule_ids=[rule_id for rule_id, _ in due], enabled_only=True)
+                    finally:
+                        for rule_id, scheduled_at in due:
+                            rule = self.rules.get(rule_id)
+                            if rule is None:
+                                self.scheduler.discard(rule_id)
+                            else:
+                                self.scheduler.complete(rule, scheduled_at)
+                    
+                    self.cycle_stats["last_due_rules"] = len(due)
+                    self._record_cycle(time.monotonic() - cycle_start, lag, interval)
+                
+                # 等待下一个到期规则
+                next_due = self.scheduler.next_due()
+                sleep_seconds = self.rule_store.refresh_interval
+                if next_due is not None:
+                    sleep_seconds = min(sleep_seconds, max(0.0, next_due - time.monotonic()))
+                await asyncio.sleep(sleep_seconds)
                 
             except asyncio.CancelledError:
                 self.logger.info("规则调度执行被取消")
@@ -746,7 +1020,43 @@ class RuleEngine:
             except Exception as e:
                 self.logger.error("规则调度执行异常", error=str(e))
                 await asyncio.sleep(60)  # 出错后等待1分钟再继续
+    
+    
+    def _record_cycle(self, duration: float, lag: float, interval: float) -> None:
+        """
+        记录调度周期的耗时和滞后
+        
+        Args:
+            duration: 周期耗时(秒)
+            lag: 周期开始相对计划时间的滞后(秒)
+            interval: 检查间隔(秒)
+        """
+        stats = self.cycle_stats
+        stats["cycles"] += 1
+        stats["last_duration"] = round(duration, 3)
+        stats["max_duration"] = max(stats["max_duration"], stats["last_duration"])
+        stats["last_lag"] = round(lag, 3)
+        stats["max_lag"] = max(stats["max_lag"], stats["last_lag"])
+        stats["last_completed_at"] = datetime.now().isoformat()
+        
+        if duration > interval:
+            stats["overruns"] += 1
+            self.logger.warning(
+                "规则执行周期超过检查间隔",
+                duration=round(duration, 3),
+                interval=interval,
+                lag=round(lag, 3)
+            )
+        else:
+            self.logger.debug("规则执行周期完成", duration=round(duration, 3), lag=round(lag, 3))
 
 
 # 导出类
-__all__ = ["RuleEngine", "RuleExecutionContext", "RuleExecutionStatus"]
\ No newline at end of file
+__all__ = [
+    "RuleEngine",
+    "RuleExecutionContext",
+    "RuleExecutionStatus",
+    "EvaluationCycle",
+    "ConditionEvaluation",
+    "compile_condition_query"
+]
\ No newline at end of file
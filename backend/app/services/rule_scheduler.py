@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则调度器 - 基于最小堆的按规则间隔调度
+
+原调度方式每个检查间隔唤醒全部规则，再逐条判断冷却期，
+每次唤醒的开销与规则总数成正比，且所有规则集中在每分钟开始时执行。
+本模块为每条规则维护下次到期时间：
+
+1. 每条规则按自己的评估间隔调度，未设置时使用 RULES_CHECK_INTERVAL
+2. 首次调度时间在一个间隔内按规则ID确定性分散，避免整点突发
+3. 触发后冷却期内的规则直接排到冷却结束时，期间不会被取出
+4. 每次只从堆顶取出到期规则，单次调度开销为 O(到期规则数 × log n)
+
+规则的增删改通过惰性删除处理：堆中过期的条目在取出时丢弃，
+只有规则缓存版本变化时才需要与规则集同步。
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.models.schemas import InspectionRule
+
+logger = structlog.get_logger(__name__)
+
+# 黄金分割比例，用于把规则ID均匀分散到调度间隔内
+_SPREAD_RATIO = 0.6180339887498949
+
+
+class RuleScheduler:
+    """
+    规则到期时间堆
+
+    堆条目为 (到期时间, 规则ID)，_due 记录每条规则当前有效的到期时间；
+    条目与 _due 不一致时视为过期条目，取出时直接丢弃。
+    所有时间均为 time.monotonic() 时钟。
+
+    使用示例:
+        scheduler = RuleScheduler()
+
+        scheduler.sync(rules, version)
+        for rule_id, scheduled_at in scheduler.pop_due():
+            ...
+            scheduler.complete(rules[rule_id], scheduled_at)
+    """
+
+    def __init__(self, default_interval: Optional[float] = None):
+        """
+        初始化调度器
+
+        Args:
+            default_interval: 未设置评估间隔的规则使用的间隔(秒)，默认使用 settings.RULES_CHECK_INTERVAL
+        """
+        self.logger = logger.bind(component="RuleScheduler")
+        self.default_interval = default_interval or settings.RULES_CHECK_INTERVAL
+
+        self._heap: List[Tuple[float, int]] = []
+        self._due: Dict[int, float] = {}
+        self._intervals: Dict[int, float] = {}
+        self._rules: Dict[int, InspectionRule] = {}
+        self._running: Set[int] = set()
+        self._synced_version: Optional[int] = None
+
+    def interval_of(self, rule: InspectionRule) -> float:
+        """规则的评估间隔(秒)"""
+        return float(rule.evaluation_interval_seconds or self.default_interval)
+
+    def sync(self, rules: Dict[int, InspectionRule], version: Optional[int] = None, now: Optional[float] = None) -> None:
+        """
+        与规则集同步
+
+        新启用的规则按分散偏移加入调度；间隔变化的规则重新计算到期时间；
+        删除或禁用的规则留在堆中，取出时丢弃；执行中的规则由 complete 重新调度。
+        版本未变化时直接返回。
+
+        Args:
+            rules: 规则缓存
+            version: 规则缓存版本
+            now: 当前单调时钟时间
+        """
+        if version is not None and version == self._synced_version:
+            return
+
+        now = time.monotonic() if now is None else now
+        self._rules = rules
+
+        for rule_id, rule in rules.items():
+            if not rule.enabled or rule_id in self._running:
+                continue
+
+            interval = self.interval_of(rule)
+            if rule_id not in self._due:
+                offset = (rule_id * _SPREAD_RATIO) % 1.0 * interval
+                self._schedule(rule_id, max(now + offset, self._cooldown_end(rule, now)))
+            elif self._intervals.get(rule_id) != interval:
+                self._schedule(rule_id, min(self._due[rule_id], now + interval))
+            self._intervals[rule_id] = interval
+
+        self._synced_version = version
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        取出所有已到期的规则，取出的规则在 complete 或 discard 之前视为执行中
+
+        Args:
+            now: 当前单调时钟时间
+
+        Returns:
+            List[Tuple[int, float]]: (规则ID, 计划执行时间)，按到期时间排序
+        """
+        now = time.monotonic() if now is None else now
+        due_ids = []
+
+        while self._heap and self._heap[0][0] <= now:
+            due, rule_id = heapq.heappop(self._heap)
+            if self._due.get(rule_id) != due:
+                continue
+
+            rule = self._rules.get(rule_id)
+            if rule is None or not rule.enabled:
+                # 已删除或禁用，重新启用时由 sync 重新加入
+                self._due.pop(rule_id, None)
+                self._intervals.pop(rule_id, None)
+                continue
+
+            del self._due[rule_id]
+            self._running.add(rule_id)
+            due_ids.append((rule_id, due))
+
+        return due_ids
+
+    def complete(self, rule: InspectionRule, scheduled_at: Optional[float] = None, now: Optional[float] = None) -> None:
+        """
+        规则执行完成后安排下次执行
+
+        按固定节拍计算下次到期时间，错过的节拍不补执行；
+        规则在冷却期内时推迟到冷却结束。
+
+        Args:
+            rule: 执行完成的规则
+            scheduled_at: 本次计划执行时间，为空时以当前时间为基准
+            now: 当前单调时钟时间
+        """
+        now = time.monotonic() if now is None else now
+        interval = self.interval_of(rule)
+
+        next_due = (scheduled_at if scheduled_at is not None else now) + interval
+        if next_due <= now:
+            next_due = now + interval
+
+        self._running.discard(rule.id)
+        self._intervals[rule.id] = interval
+        self._schedule(rule.id, max(next_due, self._cooldown_end(rule, now)))
+
+    def discard(self, rule_id: int) -> None:
+        """执行期间被删除的规则不再调度"""
+        self._running.discard(rule_id)
+        self._intervals.pop(rule_id, None)
+
+    def next_due(self) -> Optional[float]:
+        """最早的到期时间，没有待调度规则时返回None"""
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def due_at(self, rule_id: int) -> Optional[float]:
+        """规则当前的到期时间"""
+        return self._due.get(rule_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度器统计"""
+        next_due = self.next_due()
+        return {
+            "scheduled_rules": len(self._due),
+            "running_rules": len(self._running),
+            "heap_size": len(self._heap),
+            "default_interval": self.default_interval,
+            "next_due_in": round(max(0.0, next_due - time.monotonic()), 3) if next_due is not None else None
+        }
+
+    def _schedule(self, rule_id: int, due: float) -> None:
+        """设置规则的到期时间，旧条目留在堆中等待惰性丢弃"""
+        self._due[rule_id] = due
+        heapq.heappush(self._heap, (due, rule_id))
+
+    @staticmethod
+    def _cooldown_end(rule: InspectionRule, now: float) -> float:
+        """上次触发后冷却期结束的单调时钟时间"""
+        if rule.last_triggered is None:
+            return now
+        remaining = (rule.last_triggered + timedelta(minutes=rule.cooldown_minutes) - datetime.now()).total_seconds()
+        return now + max(0.0, remaining)
+
+
+# 导出类
+__all__ = ["RuleScheduler"]
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则存储 - 基于数据库的巡检规则持久化
+
+规则保存在 inspection_rules 表中，进程内维护一份只读热缓存，
+调度和条件评估始终从内存读取规则，不会在每个周期访问数据库。
+
+多个uvicorn工作进程各自持有缓存。每个进程最多每
+RULES_CACHE_REFRESH_SECONDS 秒检查一次表签名 (行数, 最大ID, 最大更新时间)，
+签名变化时重新加载全部规则，因此任一进程的增删改都会在一个刷新间隔内
+传播到所有进程。执行统计的写入不修改 updated_at，不会触发其他进程重新加载。
+
+功能特性:
+1. 规则增删改查持久化到数据库
+2. 进程内热缓存，读取不访问数据库
+3. 基于表签名的跨进程缓存失效
+4. 执行统计批量写入
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import structlog
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.database import InspectionRule as InspectionRuleModel
+from app.models.schemas import InspectionRule, InspectionRuleCreate, RuleCondition
+
+logger = structlog.get_logger(__name__)
+
+
+class RuleStore:
+    """
+    巡检规则存储
+
+    写操作直接提交到数据库并同步更新本进程缓存；
+    读操作通过 refresh() 按需校验缓存后从内存返回。
+
+    使用示例:
+        store = RuleStore()
+
+        rule = await store.create(rule_data)
+        await store.refresh()
+        enabled = [rule for rule in store.rules.values() if rule.enabled]
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        refresh_interval: Optional[float] = None
+    ):
+        """
+        初始化规则存储
+
+        Args:
+            session_factory: 异步会话工厂
+            refresh_interval: 缓存校验间隔(秒)，默认使用 settings.RULES_CACHE_REFRESH_SECONDS
+        """
+        self.logger = logger.bind(component="RuleStore")
+        self.session_factory = session_factory
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None else settings.RULES_CACHE_REFRESH_SECONDS
+        )
+
+        # 热缓存，version 在缓存内容每次变化时递增
+        self.rules: Dict[int, InspectionRule] = {}
+        self.version = 0
+        self._signature: Optional[Tuple[Any, ...]] = None
+        self._checked_at: Optional[float] = None
+
+        self.stats = {
+            "reloads": 0,
+            "signature_checks": 0
+        }
+
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        校验缓存，表签名变化时重新加载全部规则
+
+        Args:
+            force: 忽略校验间隔立即校验
+        """
+        now = time.monotonic()
+        if (not force and self._checked_at is not None
+                and now - self._checked_at < self.refresh_interval):
+            return
+
+        # 先记录校验时间，并发调用方在本次校验期间直接使用现有缓存
+        self._checked_at = now
+
+        try:
+            async with self.session_factory() as session:
+                signature = tuple((await session.execute(
+                    select(
+                        func.count(InspectionRuleModel.id),
+                        func.max(InspectionRuleModel.id),
+                        func.max(InspectionRuleModel.updated_at)
+                    )
+                )).one())
+                self.stats["signature_checks"] += 1
+
+                if signature == self._signature:
+                    return
+
+                rows = (await session.execute(select(InspectionRuleModel))).scalars().all()
+
+            self.rules = {row.id: self._to_schema(row) for row in rows}
+            self.version += 1
+            self._signature = signature
+            self.stats["reloads"] += 1
+
+            self.logger.info("规则缓存已重新加载", rules=len(self.rules))
+
+        except Exception as e:
+            # 数据库暂时不可用时保留现有缓存，下个间隔重试
+            self._checked_at = None
+            self.logger.error("规则缓存刷新失败", error=str(e))
+            if self._signature is None:
+                raise RuntimeError(f"规则加载失败: {str(e)}")
+
+
+    async def create(self, rule_data: InspectionRuleCreate) -> InspectionRule:
+        """
+        创建规则
+
+        Args:
+            rule_data: 规则创建数据
+
+        Returns:
+            InspectionRule: 新创建的规则
+        """
+        now = datetime.now()
+
+        async with self.session_factory() as session:
+            row = InspectionRuleModel(
+                **self._to_columns(rule_data),
+                execution_count=0,
+                triggered_count=0,
+                created_at=now,
+                updated_at=now
+            )
+            session.add(row)
+            await session.commit()
+            rule = self._to_schema(row)
+
+        self.rules[rule.id] = rule
+        self.version += 1
+        return rule
+
+
+    async def update(self, rule_id: int, rule_data: InspectionRuleCreate) -> Optional[InspectionRule]:
+        """
+        更新规则配置，执行统计保持不变
+
+        Args:
+            rule_id: 规则ID
+            rule_data: 更新的规则数据
+
+        Returns:
+            Optional[InspectionRule]: 更新后的规则，不存在时返回None
+        """
+        async with self.session_factory() as session:
+            row = await session.get(InspectionRuleModel, rule_id)
+            if row is None:
+                return None
+
+            for column, value in self._to_columns(rule_data).items():
+                setattr(row, column, value)
+            row.updated_at = datetime.now()
+
+            await session.commit()
+            rule = self._to_schema(row)
+
+        self.rules[rule_id] = rule
+        self.version += 1
+        return rule
+
+
+    async def delete(self, rule_id: int) -> bool:
+        """
+        删除规则
+
+        Args:
+            rule_id: 规则ID
+
+        Returns:
+            bool: 规则存在并被删除时返回True
+        """
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(InspectionRuleModel).where(InspectionRuleModel.id == rule_id)
+            )
+            await session.commit()
+
+        if self.rules.pop(rule_id, None) is not None:
+            self.version += 1
+        return result.rowcount > 0
+
+
+    async def record_executions(
+        self,
+        executed_ids: Iterable[int],
+        triggered_ids: Iterable[int],
+        executed_at: datetime
+    ) -> None:
+        """
+        批量写入执行统计
+
+        每个周期最多两条UPDATE语句，计数在数据库端累加，多进程并发执行时不会互相覆盖。
+        updated_at 保持原值，避免统计写入触发所有进程重新加载缓存。
+
+        Args:
+            executed_ids: 本周期实际评估的规则ID
+            triggered_ids: 其中触发的规则ID
+            executed_at: 执行时间，同时作为触发规则的上次触发时间
+        """
+        triggered = set(triggered_ids)
+        untriggered = set(executed_ids) - triggered
+
+        try:
+            async with self.session_factory() as session:
+                if triggered:
+                    await session.execute(
+                        update(InspectionRuleModel)
+                        .where(InspectionRuleModel.id.in_(triggered))
+                        .values(
+                            execution_count=InspectionRuleModel.execution_count + 1,
+                            triggered_count=InspectionRuleModel.triggered_count + 1,
+                            last_executed=executed_at,
+                            last_triggered=executed_at,
+                            updated_at=InspectionRuleModel.updated_at
+                        )
+                    )
+                if untriggered:
+                    await session.execute(
+                        update(InspectionRuleModel)
+                        .where(InspectionRuleModel.id.in_(untriggered))
+                        .values(
+                            execution_count=InspectionRuleModel.execution_count + 1,
+                            last_executed=executed_at,
+                            updated_at=InspectionRuleModel.updated_at
+                        )
+                    )
+                await session.commit()
+        except Exception as e:
+            # 统计写入失败不影响规则执行结果
+            self.logger.warning("规则执行统计写入失败", error=str(e))
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "cached_rules": len(self.rules),
+            "version": self.version,
+            "refresh_interval": self.refresh_interval,
+            **self.stats
+        }
+
+
+    @staticmethod
+    def _to_columns(rule_data: InspectionRuleCreate) -> Dict[str, Any]:
+        """规则数据转换为表字段，条件和通知渠道以JSON保存"""
+        return {
+            "name": rule_data.name,
+            "description": rule_data.description,
+            "enabled": rule_data.enabled,
+            "severity": rule_data.severity,
+            "conditions": [condition.model_dump(mode="json") for condition in rule_data.conditions],
+            "notification_channels": [channel.value for channel in rule_data.notification_channels],
+            "cooldown_minutes": rule_data.cooldown_minutes,
+            "evaluation_interval_seconds": rule_data.evaluation_interval_seconds,
+            "tags": list(rule_data.tags)
+        }
+
+
+    @staticmethod
+    def _to_schema(row: InspectionRuleModel) -> InspectionRule:
+        """表记录转换为规则对象"""
+        return InspectionRule(
+            id=row.id,
+            name=row.name,
+            description=row.description,
+            enabled=row.enabled,
+            conditions=[RuleCondition(**condition) for condition in row.conditions],
+            severity=row.severity,
+            notification_channels=row.notification_channels,
+            cooldown_minutes=row.cooldown_minutes,
+            evaluation_interval_seconds=row.evaluation_interval_seconds,
+            tags=row.tags or [],
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            last_executed=row.last_executed,
+            last_triggered=row.last_triggered,
+            execution_count=row.execution_count,
+            triggered_count=row.triggered_count
+        )
+
+
+# 导出类
+__all__ = ["RuleStore"]
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SMTP连接池 - 复用已登录的SMTP连接发送邮件通知
+
+原实现每封邮件都通过 aiosmtplib.send 新建连接，完成TCP连接、TLS握手和登录后
+只发送一封邮件就断开；告警风暴中几十封邮件意味着几十次握手。
+本模块保持少量已登录的长连接：
+
+1. 空闲连接复用，超过空闲时间的连接关闭后重建
+2. 复用空闲较久的连接前发送NOOP探活
+3. 复用的连接发送失败（服务端断开、超时）时重建连接并重发一次
+4. 每个连接发送一定数量的邮件后主动关闭，避免服务端限制单连接邮件数
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import asyncio
+import time
+from collections import deque
+from email.message import Message
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+import aiosmtplib
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+# 复用连接时出现这些异常说明连接已失效，可以重建连接后重发
+_CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    OSError
+)
+
+
+class SMTPConnectionPool:
+    """
+    SMTP连接池
+
+    连接数受信号量限制，空闲连接按后进先出复用，最近使用的连接最可能仍然有效。
+    信号量按事件循环惰性创建。
+
+    使用示例:
+        pool = SMTPConnectionPool(hostname="smtp.example.com", port=587)
+
+        await pool.send(message)
+        await pool.close()
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        timeout: float = 30.0,
+        max_size: Optional[int] = None,
+        max_messages_per_connection: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        keepalive_interval: Optional[float] = None,
+        client_factory: Optional[Callable[..., Any]] = None
+    ):
+        """
+        初始化SMTP连接池
+
+        Args:
+            hostname: SMTP服务器地址
+            port: SMTP服务器端口
+            username: 登录用户名
+            password: 登录密码
+            use_tls: 是否直接使用TLS连接
+            timeout: 连接和命令超时(秒)
+            max_size: 最大连接数，默认使用 settings.SMTP_POOL_SIZE
+            max_messages_per_connection: 单连接最多发送的邮件数，默认使用 settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+            idle_timeout: 空闲连接最长保留时间(秒)，默认使用 settings.SMTP_IDLE_TIMEOUT
+            keepalive_interval: 空闲超过该时间的连接复用前先探活(秒)，默认使用 settings.SMTP_KEEPALIVE_INTERVAL
+            client_factory: SMTP客户端工厂，默认 aiosmtplib.SMTP
+        """
+        self.logger = logger.bind(component="SMTPConnectionPool")
+        self.client_options = {
+            "hostname": hostname,
+            "port": port,
+            "username": username,
+            "password": password,
+            "use_tls": use_tls,
+            "timeout": timeout
+        }
+        self.max_size = max_size or settings.SMTP_POOL_SIZE
+        self.max_messages_per_connection = (
+            max_messages_per_connection or settings.SMTP_MAX_MESSAGES_PER_CONNECTION
+        )
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.SMTP_IDLE_TIMEOUT
+        self.keepalive_interval = (
+            keepalive_interval if keepalive_interval is not None else settings.SMTP_KEEPALIVE_INTERVAL
+        )
+        self.client_factory = client_factory or aiosmtplib.SMTP
+
+        # 空闲连接：(客户端, 已发送邮件数, 最后使用时间)
+        self._idle: Deque[Tuple[Any, int, float]] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        # 达到邮件数上限后后台关闭中的连接，保留引用避免任务被回收
+        self._closing: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "sent": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "connections_recycled": 0,
+            "reconnects": 0
+        }
+
+
+    async def send(self, message: Message) -> None:
+        """
+        发送一封邮件
+
+        复用的连接发送失败时视为连接失效，重建连接后重发一次；新建连接的失败直接抛出。
+
+        Args:
+            message: 邮件消息
+        """
+        async with self._get_slots():
+            client, sent, reused = await self._checkout()
+            delivered = False
+            try:
+                try:
+                    await client.send_message(message)
+                except _CONNECTION_ERRORS as e:
+                    if not reused:
+                        raise
+                    await self._discard(client)
+                    client = None
+                    self.stats["reconnects"] += 1
+                    self.logger.info("SMTP连接已失效，重建连接", error=str(e) or type(e).__name__)
+                    client, sent = await self._connect(), 0
+                    await client.send_message(message)
+                delivered = True
+            finally:
+                # 发送失败或被取消（如外层超时）时关闭连接，不放回连接池
+                if not delivered and client is not None:
+                    await self._discard(client)
+
+            self.stats["sent"] += 1
+            self._checkin(client, sent + 1)
+
+
+    async def close(self) -> None:
+        """关闭所有空闲连接，并等待后台关闭中的连接"""
+        while self._idle:
+            client, _, _ = self._idle.pop()
+            await self._quit(client)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计"""
+        return {
+            **self.stats,
+            "idle_connections": len(self._idle),
+            "max_size": self.max_size,
+            "max_messages_per_connection": self.max_messages_per_connection
+        }
+
+
+    async def _checkout(self) -> Tuple[Any, int, bool]:
+        """
+        取出可用连接，没有可用的空闲连接时新建
+
+        Returns:
+            Tuple: (客户端, 已发送邮件数, 是否为复用连接)
+        """
+        now = time.monotonic()
+        while self._idle:
+            client, sent, last_used = self._idle.pop()
+            idle = now - last_used
+
+            if idle > self.idle_timeout or not client.is_connected:
+                await self._quit(client)
+                continue
+
+            if idle > self.keepalive_interval:
+                try:
+                    await client.noop()
+                except Exception:
+                    await self._discard(client)
+                    continue
+
+            self.stats["connections_reused"] += 1
+            return client, sent, True
+
+        return await self._connect(), 0, False
+
+
+    def _checkin(self, client: Any, sent: int) -> None:
+        """归还连接，达到单连接邮件数上限时关闭"""
+        if sent >= self.max_messages_per_connection:
+            self.stats["connections_recycled"] += 1
+            task = asyncio.get_running_loop().create_task(self._quit(client))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            return
+        self._idle.append((client, sent, time.monotonic()))
+
+
+    async def _connect(self) -> Any:
+        """新建连接，配置了用户名密码时连接后自动登录"""
+        client = self.client_factory(**self.client_options)
+        await client.connect()
+        self.stats["connections_opened"] += 1
+        return client
+
+
+    async def _quit(self, client: Any) -> None:
+        """正常关闭连接"""
+        try:
+            if client.is_connected:
+                await client.quit()
+        except Exception:
+            client.close()
+
+
+    @staticmethod
+    async def _discard(client: Any) -> None:
+        """直接关闭失效连接"""
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """获取当前事件循环上的连接数信号量"""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_size)
+            self._slots_loop = loop
+            # 其他事件循环上建立的连接不能复用
+            self._idle.clear()
+        return self._slots
+
+
+# 导出类
+__all__ = ["SMTPConnectionPool"]
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式特征提取 - 时间序列特征的增量计算
+
+规则调度和仪表盘每分钟都会重新查询大段重叠的时间窗口，
+如果每次都对整个窗口重算滑动统计和峰值，检测开销与回看时长成正比。
+本模块为每条序列维护O(1)更新的运行状态，新数据到达时只为新增点输出特征，
+稳态下的检测开销只与新数据量相关。
+
+功能特性:
+1. Welford算法维护全局均值和方差
+2. 环形缓冲区 + 滑动Welford更新维护5点/30点滑动均值和标准差
+3. 单调双端队列维护滑动最小值和最大值
+4. 按查询分组、按序列键管理提取器，长时间不活跃的序列自动淘汰
+
+作者: AI监控团队
+版本: 2.0.0
+"""
+
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+from cachetools import TTLCache
+
+from app.core.config import settings
+
+logger = structlog.get_logger(__name__)
+
+
+class _RollingWindow:
+    """
+    固定长度的滑动窗口统计
+
+    环形缓冲区保存窗口内的值，均值和离差平方和按Welford算法增量更新，
+    窗口满后用"替换最旧值"的形式更新，大偏移量（如字节计数）下也不会丢失精度。
+    均值和样本标准差均为O(1)更新。可选维护单调队列以支持滑动最值。
+    """
+
+    def __init__(self, size: int, track_extremes: bool = False):
+        self.size = size
+        self.buffer: Deque[float] = deque(maxlen=size)
+        self._mean = 0.0
+        self._m2 = 0.0
+
+        self.track_extremes = track_extremes
+        self._max_queue: Deque[Tuple[int, float]] = deque()
+        self._min_queue: Deque[Tuple[int, float]] = deque()
+
+    def push(self, index: int, value: float) -> None:
+        """加入新值，超出窗口的旧值自动移出"""
+        if len(self.buffer) == self.size:
+            expired = self.buffer[0]
+            old_mean = self._mean
+            self._mean += (value - expired) / self.size
+            self._m2 += (value - expired) * (value - self._mean + expired - old_mean)
+            if self._m2 < 0:
+                self._m2 = 0.0
+            self.buffer.append(value)
+        else:
+            self.buffer.append(value)
+            delta = value - self._mean
+            self._mean += delta / len(self.buffer)
+            self._m2 += delta * (value - self._mean)
+
+        if self.track_extremes:
+            while self._max_queue and self._max_queue[-1][1] <= value:
+                self._max_queue.pop()
+            self._max_queue.append((index, value))
+            while self._min_queue and self._min_queue[-1][1] >= value:
+                self._min_queue.pop()
+            self._min_queue.append((index, value))
+
+            oldest = index - self.size + 1
+            while self._max_queue[0][0] < oldest:
+                self._max_queue.popleft()
+            while self._min_queue[0][0] < oldest:
+                self._min_queue.popleft()
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.buffer else 0.0
+
+    @property
+    def std(self) -> float:
+        """样本标准差 (ddof=1)，与 pandas rolling().std() 一致"""
+        count = len(self.buffer)
+        if count < 2:
+            return 0.0
+        return math.sqrt(self._m2 / (count - 1))
+
+    @property
+    def max(self) -> float:
+        return self._max_queue[0][1]
+
+    @property
+    def min(self) -> float:
+        return self._min_queue[0][1]
+
+
+class StreamingFeatureExtractor:
+    """
+    单条序列的流式特征提取器
+
+    输出列与批量特征工程 (_feature_kernel) 保持一致，
+    因此已训练的孤立森林模型可以直接对流式特征评分。
+    与批量计算的差异：
+    - 全局Z-Score基于截至当前点的运行统计（批量计算使用整个窗口）
+    - 局部极值无法预知后续点，以"创出5点窗口新高/新低"近似
+
+    使用示例:
+        extractor = StreamingFeatureExtractor()
+
+        # 第一次传入整个回看窗口，之后每次只会为新点输出特征
+        features_df = extractor.update(timestamps_ns, values)
+    """
+
+    FEATURE_NAMES = [
+        "rolling_mean_5m", "rolling_std_5m", "rolling_min_5m", "rolling_max_5m",
+        "rolling_mean_30m", "rolling_std_30m",
+        "diff_1", "diff_2", "pct_change",
+        "z_score_global", "z_score_rolling",
+        "deviation_from_mean", "normalized_deviation",
+        "is_local_max", "is_local_min",
+        "hour", "day_of_week", "is_weekend"
+    ]
+
+    def __init__(self, short_window: int = 5, long_window: int = 30):
+        """
+        初始化流式特征提取器
+
+        Args:
+            short_window: 短窗口长度（点数）
+            long_window: 长窗口长度（点数）
+        """
+        self.short = _RollingWindow(short_window, track_extremes=True)
+        self.long = _RollingWindow(long_window)
+
+        # Welford运行统计
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+        # 最近两个值，用于差分特征
+        self._history: Deque[float] = deque(maxlen=2)
+
+        self.last_timestamp: Optional[int] = None
+
+    @property
+    def global_mean(self) -> float:
+        return self._mean
+
+    @property
+    def global_std(self) -> float:
+        """截至当前点的样本标准差"""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def update(self, timestamps: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+        """
+        追加新数据并输出新增点的特征
+
+        时间戳不大于上次最后时间戳的点视为重叠窗口中的旧数据，直接跳过。
+
+        Args:
+            timestamps: 纳秒精度的时间戳数组 (int64)，升序
+            values: 指标值数组
+
+        Returns:
+            pd.DataFrame: 以时间为索引的新增点特征，没有新点时为空
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+
+        if self.last_timestamp is not None:
+            fresh = timestamps > self.last_timestamp
+            timestamps = timestamps[fresh]
+            values = values[fresh]
+
+        rows = np.zeros((len(values), len(self.FEATURE_NAMES) - 3), dtype=np.float64)
+        for row, value in enumerate(values.tolist()):
+            rows[row] = self._push(value)
+
+        index = pd.to_datetime(timestamps)
+        features_df = pd.DataFrame(rows, index=index, columns=self.FEATURE_NAMES[:-3])
+        features_df["hour"] = index.hour
+        features_df["day_of_week"] = index.dayofweek
+        features_df["is_weekend"] = (index.dayofweek >= 5).astype(int)
+
+        if len(timestamps):
+            self.last_timestamp = int(timestamps[-1])
+
+        return features_df
+
+    def _push(self, value: float) -> List[float]:
+        """更新运行状态并返回当前点的数值特征"""
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+        previous_short_max = self.short.max if self.short.buffer else None
+        previous_short_min = self.short.min if self.short.buffer else None
+
+        self.short.push(self.count, value)
+        self.long.push(self.count, value)
+
+        prev_1 = self._history[-1] if len(self._history) >= 1 else None
+        prev_2 = self._history[0] if len(self._history) == 2 else None
+        self._history.append(value)
+
+        diff_1 = value - prev_1 if prev_1 is not None else 0.0
+        diff_2 = value - prev_2 if prev_2 is not None else 0.0
+        pct_change = diff_1 / prev_1 if prev_1 else 0.0
+
+        global_std = self.global_std
+        z_score_global = (value - self._mean) / global_std if global_std > 0 else 0.0
+
+        long_mean, long_std = self.long.mean, self.long.std
+        z_score_rolling = (value - long_mean) / long_std if long_std > 0 else 0.0
+
+        short_mean, short_std = self.short.mean, self.short.std
+        deviation = value - short_mean
+        normalized_deviation = deviation / short_std if short_std > 0 else 0.0
+
+        is_local_max = float(previous_short_max is not None and value > previous_short_max)
+        is_local_min = float(previous_short_min is not None and value < previous_short_min)
+
+        return [
+            short_mean, short_std, self.short.min, self.short.max,
+            long_mean, long_std,
+            diff_1, diff_2, pct_change if math.isfinite(pct_change) else 0.0,
+            z_score_global, z_score_rolling,
+            deviation, normalized_deviation,
+            is_local_max, is_local_min
+        ]
+
+
+class StreamingFeatureRegistry:
+    """
+    流式特征提取器注册表
+
+    按指标查询分组、组内以标签集为键管理每条序列的提取器，按查询取最新时间戳时
+    只访问该查询的序列。超过 AI_CACHE_TTL 未更新的序列自动淘汰，重新出现时重新预热；
+    超过 AI_CACHE_TTL 未访问的查询整组淘汰。
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None, max_queries: int = 1000):
+        """
+        初始化流式特征注册表
+
+        Args:
+            maxsize: 每个查询最多保留的序列数
+            ttl: 序列和查询的淘汰时间(秒)，默认使用 settings.AI_CACHE_TTL
+            max_queries: 最多保留的查询数
+        """
+        self.logger = logger.bind(component="StreamingFeatureRegistry")
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl is not None else settings.AI_CACHE_TTL
+        self._queries: TTLCache = TTLCache(maxsize=max_queries, ttl=self.ttl)
+
+    @staticmethod
+    def series_key(metric_query: str, labels: Optional[Dict[str, str]] = None) -> Tuple[str, Tuple]:
+        """生成序列键，标签顺序不影响结果"""
+        return metric_query, tuple(sorted((labels or {}).items()))
+
+    def get(self, metric_query: str, labels: Optional[Dict[str, str]] = None) -> StreamingFeatureExtractor:
+        """获取序列的提取器，不存在时创建"""
+        _, labels_key = self.series_key(metric_query, labels)
+        extractors = self._queries.get(metric_query)
+        if extractors is None:
+            extractors = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        # 重新赋值以刷新查询的TTL
+        self._queries[metric_query] = extractors
+
+        extractor = extractors.get(labels_key)
+        if extractor is None:
+            extractor = StreamingFeatureExtractor()
+            self.logger.debug("创建流式特征提取器", metric_query=metric_query, labels=labels)
+        # 重新赋值以刷新序列的TTL
+        extractors[labels_key] = extractor
+        return extractor
+
+    def latest_timestamp(self, metric_query: str) -> Optional[int]:
+        """
+        查询下所有序列都已处理到的时间戳（纳秒）
+
+        取各序列最后时间戳的最小值，增量查询从该时间开始不会遗漏任何序列的数据。
+        """
+        extractors = self._queries.get(metric_query)
+        if extractors is None:
+            return None
+        timestamps = [
+            extractor.last_timestamp
+            for extractor in list(extractors.values())
+            if extractor.last_timestamp is not None
+        ]
+        return min(timestamps) if timestamps else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取注册表统计"""
+        queries = list(self._queries.values())
+        return {
+            "queries": len(queries),
+            "series": sum(len(extractors) for extractors in queries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl
+        }
+
+
+# 全局流式特征注册表
+streaming_feature_registry = StreamingFeatureRegistry()
+
+
+# 导出类
+__all__ = [
+    "StreamingFeatureExtractor",
+    "StreamingFeatureRegistry",
+    "streaming_feature_registry"
+]
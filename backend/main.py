@@ -33,6 +33,13 @@ from prometheus_fastapi_instrumentator import Instrumentator
 
 from app.core.config import settings
 from app.core.database import init_db, close_db
+from app.services.alert_pipeline import alert_pipeline
+from app.services.notification_outbox import notification_outbox
+from app.services.notification_service import notification_service
+from app.services.http_clients import http_clients
+from app.services.live_query_hub import live_query_hub
+from app.services.prometheus_registry import prometheus_services
+from app.services.detection_executor import detection_executor
 from app.models.schemas import APIResponse
 from app.middleware.performance import PerformanceMiddleware
 from app.middleware.error_handler import (
@@ -76,6 +83,9 @@ async def lifespan(app: FastAPI):
         await init_db()
         logger.info("✅ 数据库初始化完成")
         
+        # 继续投递重启前未完成的通知
+        await notification_outbox.start()
+        
         # 初始化其他服务
         # TODO: 初始化Redis、AI服务等
         
@@ -88,13 +98,29 @@ async def lifespan(app: FastAPI):
     
     yield  # 应用运行期间
     
-    # 应用关闭清理
+    # 应用关闭清理 - 每一步单独处理异常，一个组件关闭失败不影响后续步骤
     logger.info("🔄 系统关闭清理中...")
     try:
-        await close_db()
-        logger.info("✅ 数据库连接已关闭")
+        detection_executor.shutdown(wait=False)
     except Exception as e:
-        logger.error("❌ 清理过程出错", error=str(e), exc_info=True)
+        logger.error("❌ 关闭检测执行器出错", error=str(e), exc_info=True)
+    
+    # 排空告警队列后再关闭数据库连接
+    shutdown_steps = [
+        ("告警管道", alert_pipeline.stop),
+        ("通知发件箱", notification_outbox.stop),
+        ("通知服务", notification_service.close),
+        ("实时查询中心", live_query_hub.close),
+        ("Prometheus服务注册表", prometheus_services.close),
+        ("共享HTTP客户端", http_clients.aclose_all),
+        ("数据库连接", close_db)
+    ]
+    for name, step in shutdown_steps:
+        try:
+            await step()
+            logger.info(f"✅ {name}已关闭")
+        except Exception as e:
+            logger.error(f"❌ 关闭{name}出错", error=str(e), exc_info=True)
     
     logger.info("👋 智能监控预警系统已关闭")
 
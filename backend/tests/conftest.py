@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试共用夹具 - 临时SQLite数据库、假通知服务和通知发件箱
+"""
+
+import asyncio
+import time
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.database import Alert, InspectionRule, Notification
+from app.models.schemas import AlertSeverity, NotificationStatus
+from app.services.notification_outbox import NotificationOutbox
+
+
+class FakeNotificationService:
+    """记录投递请求、可按渠道指定前N次投递失败的通知服务"""
+
+    def __init__(self, failures=None, windows=None):
+        self.failures = dict(failures or {})
+        self.windows = dict(windows or {})
+        self.sent = []
+        self.attempts = []
+        self.digests = []
+
+    def digest_window(self, channel, severity):
+        if severity == AlertSeverity.CRITICAL:
+            return 0.0
+        return self.windows.get(channel.value, 0.0)
+
+    async def deliver_digest(self, channel, severity, notifications, recipients=None, notification_id=None):
+        self.digests.append((channel.value, [item["title"] for item in notifications]))
+        statuses = await self.deliver(channels=[channel], notification_id=notification_id)
+        return statuses[channel.value]
+
+    async def deliver(self, **kwargs):
+        self.sent.append(kwargs)
+        statuses = {}
+        for channel in kwargs["channels"]:
+            self.attempts.append(channel.value)
+            failed = self.failures.get(channel.value, 0) > 0
+            if failed:
+                self.failures[channel.value] -= 1
+            statuses[channel.value] = NotificationStatus(
+                notification_id=kwargs["notification_id"],
+                channel=channel,
+                status="failed" if failed else "sent",
+                error_message="connection refused" if failed else None
+            )
+        return statuses
+
+    async def _is_duplicate_notification(self, title, message, severity, labels=None):
+        return False
+
+    async def _record_notification(self, title, message, severity, labels=None):
+        pass
+
+
+def _disable_foreign_keys(dbapi_connection, connection_record):
+    """测试库只创建部分表，每个连接都关闭外键检查"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=OFF")
+    cursor.close()
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    """临时SQLite会话工厂，只创建规则表、告警表和通知表（不检查到用户表的外键）"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/monitoring.db")
+    event.listen(engine.sync_engine, "connect", _disable_foreign_keys)
+    async with engine.begin() as conn:
+        for table in (InspectionRule.__table__, Alert.__table__, Notification.__table__):
+            await conn.run_sync(table.create)
+
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def make_notification_service():
+    """创建假通知服务，参数见 FakeNotificationService"""
+    return FakeNotificationService
+
+
+@pytest_asyncio.fixture
+async def make_outbox(session_factory):
+    """创建使用临时数据库和假通知服务的发件箱，测试结束时停止"""
+    outboxes = []
+
+    def make(service=None, session_factory=session_factory, **kwargs):
+        options = {"retry_base_delay": 0.01, "retry_max_delay": 0.05, "poll_interval": 0.05, **kwargs}
+        outbox = NotificationOutbox(
+            session_factory=session_factory,
+            notification_service=service if service is not None else FakeNotificationService(),
+            **options
+        )
+        outboxes.append(outbox)
+        return outbox
+
+    yield make
+    for outbox in outboxes:
+        await outbox.stop()
+
+
+@pytest.fixture
+def wait_for():
+    """等待后台任务完成，超时后返回最后一次判断结果"""
+    async def wait(predicate, timeout=3.0):
+        deadline = time.monotonic() + timeout
+        while not predicate() and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        return predicate()
+    return wait
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AI异常检测服务测试用例
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.schemas import AlgorithmType, MetricDataPoint, TimeSeriesData
+from app.services.ai_service import AIAnomalyDetector
+from app.services.detection_executor import DetectionExecutor
+from app.services.prometheus_service import SeriesMatrix
+from app.services.streaming_features import StreamingFeatureExtractor, StreamingFeatureRegistry
+
+
+def _slow_sum(values, delay):
+    """在工作进程中执行的测试函数"""
+    time.sleep(delay)
+    return float(values.sum())
+
+
+@pytest.fixture
+def detector():
+    """AI检测器实例"""
+    return AIAnomalyDetector()
+
+
+@pytest.fixture
+def series_matrix():
+    """三条序列的测试矩阵，第二条序列在第50个点有尖峰"""
+    rng = np.random.default_rng(42)
+    timestamps = np.arange(100, dtype=np.float64) * 60 + 1_700_000_000
+    values = rng.normal(50.0, 1.0, size=(3, 100))
+    values[1, 50] = 500.0
+    values[2, 10:20] = np.nan
+    return timestamps, values
+
+
+class TestBatchDetection:
+    """批量异常检测测试"""
+
+    @pytest.mark.asyncio
+    async def test_z_score_batch_isolates_series(self, detector, series_matrix):
+        """Z-Score批量检测只标记出现尖峰的序列"""
+        timestamps, values = series_matrix
+        labels = [{"instance": f"node-{i}"} for i in range(3)]
+
+        results = await detector.detect_anomalies_batch(
+            values=values,
+            timestamps=timestamps,
+            series_labels=labels,
+            algorithm=AlgorithmType.Z_SCORE,
+            sensitivity=0.8
+        )
+
+        assert len(results) == 3
+        assert results[1].labels == {"instance": "node-1"}
+        assert any(point.metadata["index"] == 50 for point in results[1].anomalies)
+        assert not any(point.metadata["is_anomaly"] for point in results[0].anomalies)
+        assert results[2].total_points == 90
+
+    @pytest.mark.asyncio
+    async def test_statistical_batch(self, detector, series_matrix):
+        """IQR批量检测返回每条序列的结果"""
+        timestamps, values = series_matrix
+
+        results = await detector.detect_anomalies_batch(
+            values=values,
+            timestamps=timestamps,
+            algorithm=AlgorithmType.STATISTICAL
+        )
+
+        assert len(results) == 3
+        assert any(point.metadata["index"] == 50 for point in results[1].anomalies)
+        assert all(0.0 <= result.overall_score <= 1.0 for result in results)
+
+    @pytest.mark.asyncio
+    async def test_batch_rejects_unsupported_algorithm(self, detector, series_matrix):
+        """批量模式不支持孤立森林"""
+        timestamps, values = series_matrix
+
+        with pytest.raises(ValueError):
+            await detector.detect_anomalies_batch(
+                values=values,
+                timestamps=timestamps,
+                algorithm=AlgorithmType.ISOLATION_FOREST
+            )
+
+
+class TestTrainedModels:
+    """已训练模型持久化测试"""
+
+    @pytest.fixture
+    def training_data(self):
+        """带一个尖峰的单序列训练数据"""
+        rng = np.random.default_rng(7)
+        base = datetime(2024, 1, 1)
+        values = rng.normal(50.0, 1.0, size=200)
+        values[150] = 120.0
+        return [
+            {"timestamp": (base + timedelta(minutes=i)).isoformat(), "value": float(v)}
+            for i, v in enumerate(values)
+        ]
+
+    def test_model_key_ignores_label_order(self, detector):
+        """模型键与标签顺序无关，与查询相关"""
+        key = detector.build_model_key("cpu_usage", {"a": "1", "b": "2"})
+
+        assert key == detector.build_model_key("cpu_usage", {"b": "2", "a": "1"})
+        assert key != detector.build_model_key("mem_usage", {"a": "1", "b": "2"})
+
+    @pytest.mark.asyncio
+    async def test_train_persists_and_detection_reuses_model(self, detector, training_data, tmp_path):
+        """训练结果写入磁盘，检测时加载已训练模型评分"""
+        detector.model_dir = tmp_path
+        labels = {"instance": "node-1"}
+
+        metadata = await detector.train_model(training_data, metric_query="cpu_usage", labels=labels)
+        model_key = metadata.preprocessing_params["model_key"]
+
+        assert (tmp_path / f"isolation_forest_{model_key}.joblib").exists()
+        assert (tmp_path / f"isolation_forest_{model_key}.json").exists()
+
+        # 清空内存缓存后仍可从磁盘恢复
+        detector.model_cache.clear()
+        assert detector.get_trained_model(model_key).version == metadata.version
+
+        result = await detector.detect_anomalies(
+            training_data,
+            algorithm=AlgorithmType.ISOLATION_FOREST,
+            model_key=model_key
+        )
+
+        assert result.algorithm_info["model_version"] == metadata.version
+        assert any(point.metadata["index"] == 150 for point in result.anomalies)
+
+    @pytest.mark.asyncio
+    async def test_train_rejects_stateless_algorithm(self, detector, training_data):
+        """统计类算法不需要训练"""
+        with pytest.raises(ValueError):
+            await detector.train_model(
+                training_data, metric_query="cpu_usage", algorithm=AlgorithmType.Z_SCORE
+            )
+
+
+class TestStreamingFeatures:
+    """流式特征提取测试"""
+
+    @pytest.fixture
+    def series(self):
+        """100个点的分钟级序列"""
+        rng = np.random.default_rng(3)
+        timestamps = (np.arange(100, dtype=np.int64) * 60 + 1_700_000_000) * 1_000_000_000
+        return timestamps, rng.normal(50.0, 2.0, size=100)
+
+    def test_rolling_features_match_batch(self, series):
+        """滑动窗口特征与pandas批量计算一致"""
+        timestamps, values = series
+        features = StreamingFeatureExtractor().update(timestamps, values)
+        expected = pd.Series(values)
+
+        np.testing.assert_allclose(features["rolling_mean_5m"], expected.rolling(5, min_periods=1).mean())
+        np.testing.assert_allclose(features["rolling_max_5m"], expected.rolling(5, min_periods=1).max())
+        np.testing.assert_allclose(features["rolling_min_5m"], expected.rolling(5, min_periods=1).min())
+        np.testing.assert_allclose(
+            features["rolling_std_30m"], expected.rolling(30, min_periods=1).std().fillna(0)
+        )
+        assert features["z_score_global"].iloc[-1] == pytest.approx(
+            (values[-1] - values.mean()) / values.std(ddof=1)
+        )
+
+    def test_rolling_std_with_large_offset(self):
+        """大偏移量（如字节计数）的滑动标准差不丢失精度"""
+        rng = np.random.default_rng(7)
+        timestamps = (np.arange(200, dtype=np.int64) * 60 + 1_700_000_000) * 1_000_000_000
+        values = 8e9 + rng.normal(0.0, 1.0, size=200)
+        features = StreamingFeatureExtractor().update(timestamps, values)
+        expected = pd.Series(values)
+
+        np.testing.assert_allclose(
+            features["rolling_std_5m"], expected.rolling(5, min_periods=1).std().fillna(0), atol=1e-4
+        )
+        np.testing.assert_allclose(
+            features["rolling_std_30m"], expected.rolling(30, min_periods=1).std().fillna(0), atol=1e-4
+        )
+
+    def test_overlapping_window_emits_only_new_points(self, series):
+        """重叠窗口只为新增点输出特征，结果与一次性计算相同"""
+        timestamps, values = series
+        full = StreamingFeatureExtractor().update(timestamps, values)
+
+        extractor = StreamingFeatureExtractor()
+        extractor.update(timestamps[:60], values[:60])
+        increment = extractor.update(timestamps[30:], values[30:])
+
+        assert len(increment) == 40
+        pd.testing.assert_frame_equal(increment, full.iloc[60:])
+
+    def test_registry_indexes_series_by_query(self, series):
+        """最新时间戳只取同一查询的序列，与其他查询无关"""
+        timestamps, values = series
+        registry = StreamingFeatureRegistry()
+        registry.get("cpu", {"instance": "a"}).update(timestamps, values)
+        registry.get("cpu", {"instance": "b"}).update(timestamps[:50], values[:50])
+        registry.get("mem", {"instance": "a"}).update(timestamps[:10], values[:10])
+
+        assert registry.latest_timestamp("cpu") == timestamps[49]
+        assert registry.latest_timestamp("mem") == timestamps[9]
+        assert registry.latest_timestamp("disk") is None
+        assert registry.get("cpu", {"instance": "b"}) is registry.get("cpu", {"instance": "b"})
+        assert registry.get_stats()["queries"] == 2
+        assert registry.get_stats()["series"] == 3
+
+    @pytest.mark.asyncio
+    async def test_detect_stream_scores_new_points_once(self, series):
+        """增量检测只对新数据评分，尖峰只报告一次"""
+        timestamps, values = series
+        values = values.copy()
+        values[80] = 200.0
+        detector = AIAnomalyDetector(streaming_features=StreamingFeatureRegistry())
+        data = [
+            {"timestamp": pd.Timestamp(ts).isoformat(), "value": float(v)}
+            for ts, v in zip(timestamps, values)
+        ]
+
+        first = await detector.detect_anomalies_stream(data[:70], metric_query="cpu_usage")
+        second = await detector.detect_anomalies_stream(data[40:], metric_query="cpu_usage")
+        third = await detector.detect_anomalies_stream(data[40:], metric_query="cpu_usage")
+
+        assert first.total_points == 70
+        assert not any(point.metadata["is_anomaly"] for point in first.anomalies)
+        assert second.total_points == 30
+        assert [point.value for point in second.anomalies if point.metadata["is_anomaly"]] == [200.0]
+        assert third.total_points == 0
+
+
+class TestDetectionExecutor:
+    """检测执行器测试"""
+
+    @pytest.mark.asyncio
+    async def test_submit_passes_arrays_through_shared_memory(self):
+        """数组通过共享内存传递到工作进程"""
+        executor = DetectionExecutor(max_workers=1, max_queue_depth=4, queue_timeout=5)
+        try:
+            result = await executor.submit(_slow_sum, arrays={"values": np.arange(10.0)}, delay=0)
+        finally:
+            executor.shutdown()
+
+        assert result == 45.0
+        assert executor.get_stats()["completed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_submit_rejects_when_queue_full(self):
+        """队列已满时快速拒绝新任务"""
+        executor = DetectionExecutor(max_workers=1, max_queue_depth=0, queue_timeout=0.05)
+        try:
+            running = asyncio.ensure_future(
+                executor.submit(_slow_sum, arrays={"values": np.ones(3)}, delay=0.5)
+            )
+            await asyncio.sleep(0.01)
+
+            with pytest.raises(RuntimeError):
+                await executor.submit(_slow_sum, arrays={"values": np.ones(3)}, delay=0)
+
+            assert await running == 3.0
+        finally:
+            executor.shutdown()
+
+        assert executor.get_stats()["rejected"] == 1
+
+
+class TestSeriesMatrix:
+    """多序列矩阵构建测试"""
+
+    def test_from_time_series_aligns_timestamps(self):
+        """不同序列的时间戳取并集，缺失位置为NaN"""
+        base = datetime(2024, 1, 1)
+
+        def build(name, offsets):
+            return TimeSeriesData(
+                metric_name=name,
+                labels={"job": name},
+                values=[
+                    MetricDataPoint(timestamp=base + timedelta(minutes=m), value=float(m))
+                    for m in offsets
+                ]
+            )
+
+        matrix = SeriesMatrix.from_time_series([build("a", [0, 1, 2]), build("b", [1, 2, 3])])
+
+        assert matrix.values.shape == (2, 4)
+        assert np.isnan(matrix.values[0, 3])
+        assert np.isnan(matrix.values[1, 0])
+        assert matrix.labels == [{"job": "a"}, {"job": "b"}]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -63,6 +63,16 @@ class TestAnomalyDetectionAPI:
         assert data["success"] is True
         assert "result" in data
         
+    def test_detect_anomalies_batch_rejects_isolation_forest(self):
+        """测试批量检测接口拒绝不支持的算法"""
+        response = client.post("/api/v1/anomaly-detection/detect/batch", json={
+            "metric_query": "cpu_usage",
+            "lookback_hours": 24,
+            "algorithm": "isolation_forest",
+            "sensitivity": 0.8
+        })
+        assert response.status_code == 400
+
     def test_get_algorithms(self, mock_ai_detector):
         """测试获取算法列表接口"""
         response = client.get("/api/v1/anomaly-detection/algorithms")
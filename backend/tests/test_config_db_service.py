@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置数据库服务测试用例
+"""
+
+import tempfile
+
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import app.core.database as database
+import app.services.config_db_service as config_db_module
+from app.models.config import OllamaConfig, PrometheusConfig
+from app.services.config_db_service import ConfigDBService
+
+
+async def _config_db(monkeypatch):
+    """临时SQLite配置库，记录执行的SQL语句数"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/config.db")
+    async with engine.begin() as conn:
+        for table in (PrometheusConfig.__table__, OllamaConfig.__table__):
+            await conn.run_sync(table.create)
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    monkeypatch.setattr(config_db_module, "AsyncSessionLocal", async_sessionmaker(engine, expire_on_commit=False))
+    monkeypatch.setattr(database, "engine", engine)
+
+    return engine, statements
+
+
+class TestConfigCache:
+    """当前配置缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_repeated_reads_served_from_cache(self, monkeypatch):
+        """重复读取当前配置不访问数据库"""
+        engine, statements = await _config_db(monkeypatch)
+        service = ConfigDBService(poll_interval=60)
+        await service.save_prometheus_config({"name": "primary", "url": "http://prom-a:9090"})
+
+        first = await service.get_default_prometheus_config()
+        statements.clear()
+        for _ in range(5):
+            config = await service.get_default_prometheus_config()
+
+        assert first["url"] == config["url"] == "http://prom-a:9090"
+        assert statements == []
+        assert service.get_cache_stats()["hits"] == 5
+
+    @pytest.mark.asyncio
+    async def test_local_writes_invalidate_immediately(self, monkeypatch):
+        """本进程保存或切换配置后立即读到新配置"""
+        await _config_db(monkeypatch)
+        service = ConfigDBService(poll_interval=60)
+        await service.save_prometheus_config({"name": "primary", "url": "http://prom-a:9090"})
+        saved = await service.save_prometheus_config({"name": "secondary", "url": "http://prom-b:9090"})
+        assert (await service.get_default_prometheus_config())["url"] == "http://prom-a:9090"
+
+        await service.set_current_prometheus_config(saved["id"])
+        assert (await service.get_default_prometheus_config())["url"] == "http://prom-b:9090"
+
+        await service.save_prometheus_config({"name": "secondary", "url": "http://prom-c:9090"})
+        assert (await service.get_default_prometheus_config())["url"] == "http://prom-c:9090"
+
+    @pytest.mark.asyncio
+    async def test_other_worker_changes_detected_by_poll(self, monkeypatch):
+        """其他进程切换当前配置后，在下一次检查变更时失效"""
+        engine, statements = await _config_db(monkeypatch)
+        worker = ConfigDBService(poll_interval=0)
+        other = ConfigDBService(poll_interval=0)
+        await other.save_prometheus_config({"name": "primary", "url": "http://prom-a:9090"})
+        saved = await other.save_prometheus_config({"name": "secondary", "url": "http://prom-b:9090"})
+        assert (await worker.get_default_prometheus_config())["url"] == "http://prom-a:9090"
+
+        statements.clear()
+        assert (await worker.get_default_prometheus_config())["url"] == "http://prom-a:9090"
+        assert len(statements) == 1
+
+        await other.set_current_prometheus_config(saved["id"])
+        assert (await worker.get_default_prometheus_config())["url"] == "http://prom-b:9090"
+        assert worker.get_cache_stats()["external_changes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_returned_config_is_a_copy(self, monkeypatch):
+        """调用方修改返回值不影响缓存"""
+        await _config_db(monkeypatch)
+        service = ConfigDBService(poll_interval=60)
+        await service.save_ollama_config({"name": "local", "apiUrl": "http://ollama:11434"})
+
+        config = await service.get_default_ollama_config()
+        config["apiUrl"] = "http://changed"
+
+        assert (await service.get_default_ollama_config())["apiUrl"] == "http://ollama:11434"
+
+    @pytest.mark.asyncio
+    async def test_write_during_load_not_cached(self, monkeypatch):
+        """加载期间发生写操作时，旧结果不写入缓存"""
+        engine, _ = await _config_db(monkeypatch)
+        service = ConfigDBService(poll_interval=60)
+        await service.save_prometheus_config({"name": "primary", "url": "http://prom-a:9090"})
+        original = service._load_default_prometheus_config
+
+        async def racing_load():
+            value = await original()
+            async with engine.begin() as conn:
+                await conn.execute(update(PrometheusConfig).values(url="http://prom-b:9090"))
+            service.invalidate_cache("prometheus")
+            return value
+
+        service._load_default_prometheus_config = racing_load
+        assert (await service.get_default_prometheus_config())["url"] == "http://prom-a:9090"
+
+        service._load_default_prometheus_config = original
+        assert (await service.get_default_prometheus_config())["url"] == "http://prom-b:9090"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
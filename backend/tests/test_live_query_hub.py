@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时查询中心测试用例
+"""
+
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+
+from app.services.live_query_hub import LiveQueryHub
+from app.services.prometheus_service import ColumnarRangeResult, ColumnarSeries
+
+
+class _FakePrometheus:
+    """按调用次数返回递增时间段数据的Prometheus服务"""
+
+    def __init__(self, fail=False, instances=("a",)):
+        self.calls = []
+        self.fail = fail
+        self.instances = list(instances)
+
+    async def query_range(self, query, start_time, end_time, step="1m", columnar=False):
+        self.calls.append((query, start_time, end_time, step))
+        if self.fail:
+            raise RuntimeError("Prometheus不可用")
+        end = end_time.timestamp()
+        timestamps = np.array([end - 30, end - 15, end], dtype=np.float64)
+        return ColumnarRangeResult(
+            query=query,
+            series=[
+                ColumnarSeries("cpu_usage", {"instance": instance}, timestamps, np.array([1.0, np.nan, 3.0]))
+                for instance in self.instances
+            ],
+            step_seconds=15
+        )
+
+
+def _payload(message):
+    """解析SSE事件文本"""
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+class TestLiveQueryHub:
+    """实时查询中心测试"""
+
+    @pytest.mark.asyncio
+    async def test_subscribers_share_one_poll(self):
+        """相同查询的订阅者共享一个轮询任务，收到同一条事件"""
+        service = _FakePrometheus()
+        hub = LiveQueryHub(service=service, min_interval=60)
+        first = hub.subscribe("up", "15s")
+        second = hub.subscribe(" up ", "15")
+        other = hub.subscribe("up", "1m")
+
+        messages = [await first.get(timeout=1), await second.get(timeout=1)]
+
+        assert messages[0] is messages[1]
+        assert hub.get_stats()["queries"] == 2
+        assert len([call for call in service.calls if call[3] == "15s"]) == 1
+
+        event, data = _payload(messages[0])
+        assert event == "samples"
+        assert data["series"][0]["values"] == [1.0, None, 3.0]
+
+        for subscription in (first, second, other):
+            hub.unsubscribe(subscription)
+        assert hub.get_stats()["queries"] == 0
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_only_new_samples_pushed(self, monkeypatch):
+        """后续节拍只推送未推送过的数据点"""
+        hub = LiveQueryHub(service=_FakePrometheus(), min_interval=60)
+        subscription = hub.subscribe("up", "15s")
+        live = hub._queries[subscription.key]
+        _, first = _payload(await subscription.get(timeout=1))
+
+        next_end = live.last_end + 15
+        monkeypatch.setattr(time, "time", lambda: next_end)
+        await hub._tick(live)
+        _, second = _payload(await subscription.get(timeout=1))
+
+        assert second["series"][0]["timestamps"] == [first["series"][0]["timestamps"][-1] + 15]
+        hub.unsubscribe(subscription)
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_vanished_series_forgotten(self, monkeypatch):
+        """结果中消失的序列不再保留已推送位置"""
+        service = _FakePrometheus(instances=("a", "b"))
+        hub = LiveQueryHub(service=service, min_interval=60)
+        subscription = hub.subscribe("up", "15s")
+        live = hub._queries[subscription.key]
+        await subscription.get(timeout=1)
+        assert len(live.last_sent) == 2
+
+        service.instances = ["a"]
+        next_end = live.last_end + 15
+        monkeypatch.setattr(time, "time", lambda: next_end)
+        await hub._tick(live)
+
+        assert list(live.last_sent) == [("cpu_usage", (("instance", "a"),))]
+        hub.unsubscribe(subscription)
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_errors_reported_and_slow_consumer_dropped(self):
+        """查询失败推送错误事件，队列满时丢弃最旧事件"""
+        hub = LiveQueryHub(service=_FakePrometheus(fail=True), min_interval=60, queue_size=1)
+        subscription = hub.subscribe("up", "15s")
+        live = hub._queries[subscription.key]
+        await asyncio.sleep(0.01)
+
+        hub._publish(live, "event: samples\ndata: {}\n\n")
+        stats = hub.get_stats()
+        assert stats["upstream_errors"] == 1
+        assert stats["dropped_events"] == 1
+        assert await subscription.get(timeout=1) == "event: samples\ndata: {}\n\n"
+
+        hub.unsubscribe(subscription)
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_query_limit(self):
+        """唯一查询数达到上限时拒绝新查询"""
+        hub = LiveQueryHub(service=_FakePrometheus(), min_interval=60, max_queries=1)
+        hub.subscribe("up", "15s")
+        with pytest.raises(RuntimeError):
+            hub.subscribe("node_load1", "15s")
+        await hub.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -68,5 +68,14 @@ class TestMetricsAPI:
         assert data["success"] is True
         assert data["data"]["healthy"] is True
 
+    def test_cache_stats(self):
+        """测试范围查询缓存统计接口"""
+        response = client.get("/api/v1/metrics/cache/stats")
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["success"] is True
+        assert "hit_rate" in data["data"]
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知服务测试用例
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+import aiosmtplib
+import jinja2
+import pytest
+from sqlalchemy import insert, select
+
+from app.models.database import Notification
+from app.models.schemas import AlertSeverity, NotificationChannel
+from app.core.config import settings
+from app.services.notification_dedup import NotificationDedupIndex, notification_fingerprint
+from app.services.notification_outbox import NotificationOutbox
+from app.services.notification_service import NotificationService, notification_service
+from app.services.notification_templates import NotificationTemplateRegistry
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+def _service(delays=None, failures=(), timeout=1.0, max_concurrency=10):
+    """创建按URL模拟延迟的通知服务"""
+    service = NotificationService()
+    delays = delays or {}
+    state = {"active": 0, "peak": 0, "calls": []}
+
+    async def post_json(url, payload, request_timeout):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(delays.get(url, 0.05))
+            if url in failures:
+                raise RuntimeError(f"{url} 返回500")
+            state["calls"].append(url)
+        finally:
+            state["active"] -= 1
+
+    service._post_json = post_json
+    for config in service.channel_configs.values():
+        config["timeout"] = timeout
+        config["max_concurrency"] = max_concurrency
+    service.channel_configs[NotificationChannel.SLACK].update(enabled=True, webhook_url="http://slack/hook")
+    return service, state
+
+
+class TestConcurrentFanOut:
+    """渠道和目标并发发送测试"""
+
+    @pytest.mark.asyncio
+    async def test_webhook_latency_is_slowest_target(self):
+        """多个Webhook并发发送，总耗时接近最慢目标"""
+        urls = [f"http://hook/{index}" for index in range(10)]
+        service, state = _service(delays={url: 0.1 for url in urls})
+
+        start = time.perf_counter()
+        status = await service._send_webhook("内容", urls, "n-1")
+        elapsed = time.perf_counter() - start
+
+        assert status.status == "sent"
+        assert len(state["calls"]) == 10
+        assert elapsed < 0.5
+
+    @pytest.mark.asyncio
+    async def test_slow_target_times_out_without_blocking_others(self):
+        """单个目标超时只影响自身"""
+        urls = ["http://hook/fast", "http://hook/slow"]
+        service, state = _service(delays={"http://hook/slow": 5}, timeout=0.2)
+
+        start = time.perf_counter()
+        status = await service._send_webhook("内容", urls, "n-1")
+
+        assert status.status == "sent"
+        assert state["calls"] == ["http://hook/fast"]
+        assert time.perf_counter() - start < 1.0
+
+    @pytest.mark.asyncio
+    async def test_all_targets_failed_reports_error(self):
+        """全部目标失败时返回失败状态和错误描述"""
+        service, _ = _service(delays={"http://hook/slow": 5}, timeout=0.1)
+
+        status = await service._send_webhook("内容", ["http://hook/slow"], "n-1")
+
+        assert status.status == "failed"
+        assert "timeout" in status.error_message
+
+    @pytest.mark.asyncio
+    async def test_channel_concurrency_is_bounded(self):
+        """单个渠道同时进行的发送不超过并发上限"""
+        urls = [f"http://hook/{index}" for index in range(12)]
+        service, state = _service(max_concurrency=3)
+
+        status = await service._send_webhook("内容", urls, "n-1")
+
+        assert status.status == "sent"
+        assert len(state["calls"]) == 12
+        assert state["peak"] == 3
+
+    @pytest.mark.asyncio
+    async def test_channels_sent_concurrently(self):
+        """各渠道并发发送，单个渠道失败不影响其他渠道"""
+        service, state = _service(
+            delays={"http://slack/hook": 0.2, "http://hook/ok": 0.2, "http://hook/bad": 0.2},
+            failures={"http://hook/bad"}
+        )
+
+        start = time.perf_counter()
+        response = await service.send_notification(
+            title="CPU使用率过高",
+            message="node-1 CPU 95%",
+            severity=AlertSeverity.HIGH,
+            channels=[NotificationChannel.SLACK, NotificationChannel.WEBHOOK],
+            recipients=["http://hook/ok", "http://hook/bad"]
+        )
+        elapsed = time.perf_counter() - start
+
+        assert response.success is True
+        assert response.statuses["slack"].status == "sent"
+        assert response.statuses["webhook"].status == "sent"
+        assert sorted(state["calls"]) == ["http://hook/ok", "http://slack/hook"]
+        assert elapsed < 0.5
+
+
+async def _load(session_factory, notification_id):
+    async with session_factory() as session:
+        return await session.get(Notification, notification_id)
+
+
+class TestNotificationOutbox:
+    """通知发件箱测试"""
+
+    @pytest.mark.asyncio
+    async def test_failed_channel_retried_until_delivered(self, session_factory, make_outbox, make_notification_service, wait_for):
+        """失败渠道退避重试直到成功，已成功的渠道不重复发送"""
+        service = make_notification_service(failures={"webhook": 2})
+        outbox = make_outbox(service)
+
+        notification_id = await outbox.enqueue(
+            title="磁盘告警",
+            message="node-1 磁盘使用率95%",
+            severity=AlertSeverity.HIGH,
+            channels=[NotificationChannel.EMAIL, NotificationChannel.WEBHOOK],
+            recipients=["http://hook/1"]
+        )
+        delivered = await wait_for(lambda: outbox.stats["delivered"] == 1)
+        await outbox.stop()
+        row = await _load(session_factory, notification_id)
+
+        assert delivered
+        assert row.status == "sent"
+        assert row.retry_count == 2
+        assert service.attempts.count("email") == 1
+        assert service.attempts.count("webhook") == 3
+        assert row.extra_data["delivered_channels"] == ["email", "webhook"]
+
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_marked_failed(self, session_factory, make_outbox, make_notification_service, wait_for):
+        """超过最大重试次数后标记为失败并保留原因"""
+        outbox = make_outbox(make_notification_service(failures={"email": 100}), max_retries=2)
+
+        notification_id = await outbox.enqueue(
+            title="t", message="m", severity=AlertSeverity.LOW, channels=[NotificationChannel.EMAIL]
+        )
+        finished = await wait_for(lambda: outbox.stats["failed"] == 1)
+        await outbox.stop()
+        row = await _load(session_factory, notification_id)
+
+        assert finished
+        assert row.status == "failed"
+        assert row.retry_count == 3
+        assert "connection refused" in row.failed_reason
+
+    @pytest.mark.asyncio
+    async def test_unfinished_notifications_survive_restart(self, session_factory, make_outbox, make_notification_service, wait_for):
+        """重启前未投递和租约过期的通知在启动后继续投递"""
+        previous = make_outbox(make_notification_service())
+        now = datetime.now()
+        pending = previous.build_row("pending", "m", AlertSeverity.HIGH, [NotificationChannel.EMAIL], now=now)
+        crashed = {
+            **previous.build_row("crashed", "m", AlertSeverity.HIGH, [NotificationChannel.EMAIL], now=now),
+            "status": "sending",
+            "next_attempt_at": now - timedelta(seconds=1)
+        }
+        async with session_factory() as session:
+            await session.execute(insert(Notification), [pending, crashed])
+            await session.commit()
+
+        restarted = make_outbox(make_notification_service())
+        await restarted.start()
+        delivered = await wait_for(lambda: restarted.stats["delivered"] == 2)
+        await restarted.stop()
+
+        async with session_factory() as session:
+            statuses = (await session.scalars(select(Notification.status))).all()
+
+        assert delivered
+        assert statuses == ["sent", "sent"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_claims_do_not_overlap(self, session_factory, make_outbox, make_notification_service):
+        """多个进程同时认领时每条通知只被认领一次"""
+        outbox_a = make_outbox(make_notification_service())
+        outbox_b = make_outbox(make_notification_service())
+        rows = [
+            outbox_a.build_row(f"n-{index}", "m", AlertSeverity.HIGH, [NotificationChannel.EMAIL])
+            for index in range(20)
+        ]
+        async with session_factory() as session:
+            await session.execute(insert(Notification), rows)
+            await session.commit()
+
+        (claimed_a, _), (claimed_b, _) = await asyncio.gather(outbox_a._claim(15), outbox_b._claim(15))
+        claimed_next, _ = await outbox_b._claim(15)
+        ids_a = {row.id for row in claimed_a}
+        ids_b = {row.id for row in claimed_b + claimed_next}
+
+        assert not ids_a & ids_b
+        assert len(ids_a | ids_b) == 20
+        assert outbox_a.stats["claimed"] + outbox_b.stats["claimed"] == 20
+
+    def test_retry_delay_grows_with_jitter(self):
+        """退避时间按指数增长，抖动在 [delay/2, delay] 内，且不超过上限"""
+        outbox = NotificationOutbox(retry_base_delay=5, retry_max_delay=60)
+
+        for attempt, expected in ((1, 5), (2, 10), (3, 20), (10, 60)):
+            delay = outbox.retry_delay(attempt)
+            assert expected / 2 <= delay <= expected
+
+    def test_default_service_shared_with_endpoints(self):
+        """未指定通知服务时使用全局服务，与端点共用去重索引和连接池"""
+        from app.api.v1.endpoints import notifications
+
+        assert NotificationOutbox()._get_service() is notification_service
+        assert notifications.notification_service is notification_service
+
+
+class TestNotificationDigest:
+    """通知合并测试"""
+
+    @staticmethod
+    async def _enqueue_burst(outbox, count, severity=AlertSeverity.HIGH, channel=NotificationChannel.SLACK):
+        return [
+            await outbox.enqueue(title=f"rule-{index}", message="m", severity=severity, channels=[channel])
+            for index in range(count)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_burst_coalesced_into_one_digest(self, session_factory, make_outbox, make_notification_service, wait_for):
+        """窗口内的突发告警合并为一次发送，每条通知都标记为已发送"""
+        service = make_notification_service(windows={"slack": 0.3})
+        outbox = make_outbox(service)
+
+        ids = await self._enqueue_burst(outbox, 20)
+        delivered = await wait_for(lambda: outbox.stats["delivered"] == 20)
+        await outbox.stop()
+
+        assert delivered
+        assert len(service.digests) == 1
+        assert sorted(service.digests[0][1]) == sorted(f"rule-{index}" for index in range(20))
+        assert service.attempts == ["slack"]
+        assert (await _load(session_factory, ids[-1])).status == "sent"
+
+    @pytest.mark.asyncio
+    async def test_critical_alerts_bypass_window(self, make_outbox, make_notification_service, wait_for):
+        """严重告警不进入合并窗口，逐条立即发送"""
+        service = make_notification_service(windows={"slack": 5})
+        outbox = make_outbox(service)
+
+        await self._enqueue_burst(outbox, 5, severity=AlertSeverity.CRITICAL)
+        delivered = await wait_for(lambda: outbox.stats["delivered"] == 5, timeout=1.0)
+        await outbox.stop()
+
+        assert delivered
+        assert service.digests == []
+        assert service.attempts == ["slack"] * 5
+
+    @pytest.mark.asyncio
+    async def test_digest_size_is_capped(self, make_outbox, make_notification_service, wait_for):
+        """单条摘要达到上限时提前发送"""
+        service = make_notification_service(windows={"slack": 0.3})
+        outbox = make_outbox(service)
+        outbox.digest.max_items = 8
+
+        await self._enqueue_burst(outbox, 20)
+        await wait_for(lambda: outbox.stats["delivered"] == 20)
+        await outbox.stop()
+
+        assert sorted(len(titles) for _, titles in service.digests) == [4, 8, 8]
+
+    @pytest.mark.asyncio
+    async def test_failed_digest_retries_each_notification(self, session_factory, make_outbox, make_notification_service, wait_for):
+        """摘要发送失败时窗口内的每条通知按退避重试"""
+        service = make_notification_service(failures={"slack": 1}, windows={"slack": 0.2})
+        outbox = make_outbox(service)
+
+        ids = await self._enqueue_burst(outbox, 3)
+        delivered = await wait_for(lambda: outbox.stats["delivered"] == 3)
+        await outbox.stop()
+        rows = [await _load(session_factory, notification_id) for notification_id in ids]
+
+        assert delivered
+        assert outbox.stats["retried"] == 3
+        assert [row.retry_count for row in rows] == [1, 1, 1]
+        assert len(service.digests) == 2
+
+    @pytest.mark.asyncio
+    async def test_digest_window_configuration(self, monkeypatch):
+        """渠道:严重程度 的配置优先，严重告警和未启用的渠道不合并"""
+        monkeypatch.setattr(settings, "NOTIFICATION_DIGEST_WINDOWS", {"slack": 30, "slack:low": 300})
+        service, _ = _service()
+        service.channel_configs[NotificationChannel.EMAIL]["enabled"] = False
+
+        assert service.digest_window(NotificationChannel.SLACK, AlertSeverity.HIGH) == 30
+        assert service.digest_window(NotificationChannel.SLACK, AlertSeverity.LOW) == 300
+        assert service.digest_window(NotificationChannel.SLACK, AlertSeverity.CRITICAL) == 0
+        assert service.digest_window(NotificationChannel.WEBHOOK, AlertSeverity.HIGH) == 0
+        assert service.digest_window(NotificationChannel.EMAIL, AlertSeverity.HIGH) == 0
+
+    @pytest.mark.asyncio
+    async def test_digest_rendered_as_single_message(self):
+        """摘要渲染为一条消息，只调用一次发送接口"""
+        service, state = _service()
+        payloads = []
+
+        async def post_json(url, payload, timeout):
+            payloads.append(payload)
+
+        service._post_json = post_json
+        status = await service.deliver_digest(
+            NotificationChannel.SLACK,
+            AlertSeverity.HIGH,
+            [{"title": f"rule-{index}", "message": f"value {index}"} for index in range(3)]
+        )
+
+        assert status.status == "sent"
+        assert len(payloads) == 1
+        assert "3条HIGH告警" in payloads[0]["text"]
+        assert "rule-2" in payloads[0]["text"]
+
+
+class TestNotificationDedup:
+    """通知去重测试"""
+
+    def test_fingerprint_uses_labels_instead_of_message(self):
+        """有标签时内容变化不影响指纹，标签不同则指纹不同"""
+        labels = {"instance": "node-1", "job": "node"}
+
+        first = notification_fingerprint("CPU使用率过高", AlertSeverity.HIGH, labels, "CPU 95%")
+        second = notification_fingerprint(" cpu使用率过高 ", AlertSeverity.HIGH, dict(reversed(labels.items())), "CPU 97%")
+        other = notification_fingerprint("CPU使用率过高", AlertSeverity.HIGH, {"instance": "node-2", "job": "node"}, "CPU 95%")
+
+        assert first == second
+        assert first != other
+        assert len(first) == 16
+
+    def test_fingerprint_masks_numbers_without_labels(self):
+        """没有标签时内容中的数值变化不影响指纹"""
+        first = notification_fingerprint("磁盘告警", AlertSeverity.LOW, message="使用率 91.5%")
+        second = notification_fingerprint("磁盘告警", AlertSeverity.LOW, message="使用率 93%")
+        other = notification_fingerprint("磁盘告警", AlertSeverity.LOW, message="inode 耗尽")
+
+        assert first == second
+        assert first != other
+        assert first != notification_fingerprint("磁盘告警", AlertSeverity.HIGH, message="使用率 93%")
+
+    def test_entries_expire_from_heap(self):
+        """指纹在窗口后过期，重复写入会延长过期时间"""
+        index = NotificationDedupIndex(window_seconds=60)
+        index.add(b"a", now=0)
+        index.add(b"b", now=30)
+        index.add(b"a", now=50)
+
+        assert index.contains(b"a", now=70)
+        assert index.contains(b"b", now=70)
+        assert not index.contains(b"b", now=90)
+        assert index.contains(b"a", now=100)
+        assert not index.contains(b"a", now=110)
+        assert len(index) == 0
+        assert index._heap == []
+
+    @pytest.mark.asyncio
+    async def test_same_alert_with_changing_value_is_deduplicated(self):
+        """同一告警的数值变化在去重窗口内只发送一次"""
+        service, state = _service()
+        metadata = {"labels": {"instance": "node-1"}}
+
+        first = await service.send_notification(
+            title="CPU使用率过高", message="CPU 95%", severity=AlertSeverity.HIGH,
+            channels=[NotificationChannel.SLACK], metadata=metadata
+        )
+        second = await service.send_notification(
+            title="CPU使用率过高", message="CPU 97%", severity=AlertSeverity.HIGH,
+            channels=[NotificationChannel.SLACK], metadata=metadata
+        )
+
+        assert first.statuses["slack"].status == "sent"
+        assert second.message == "通知已去重，跳过发送"
+        assert state["calls"] == ["http://slack/hook"]
+
+
+class TestNotificationTemplates:
+    """通知模板注册表测试"""
+
+    def test_channel_template_overrides_default(self):
+        """渠道模板优先，未定制的渠道和严重程度回退到默认模板"""
+        registry = NotificationTemplateRegistry(templates={"slack/high": "S {{ title }}", "digest/email": "D {{ count }}"})
+
+        assert registry.render(NotificationChannel.SLACK, AlertSeverity.HIGH, title="t") == "S t"
+        assert registry.render(NotificationChannel.EMAIL, AlertSeverity.HIGH, title="t", message="m").startswith("🔴")
+        assert registry.render(NotificationChannel.SLACK, AlertSeverity.LOW, title="t", message="m").startswith("⚠️")
+        assert registry.render_digest(NotificationChannel.EMAIL, count=3) == "D 3"
+        assert registry.get_digest(NotificationChannel.SLACK) is registry.get_digest(NotificationChannel.WEBHOOK)
+
+    @pytest.mark.asyncio
+    async def test_send_path_does_not_compile(self, monkeypatch):
+        """发送时只渲染预编译模板，使用同一模板的渠道共享渲染结果"""
+        service, state = _service()
+        compiles = []
+        original = jinja2.Environment.compile
+
+        def counting_compile(self, *args, **kwargs):
+            compiles.append(args)
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(jinja2.Environment, "compile", counting_compile)
+        renders = []
+        original_render = service._render_content
+        service._render_content = lambda *args: renders.append(args) or original_render(*args)
+
+        for index in range(3):
+            await service.deliver(
+                f"告警{index}", "CPU 95%", AlertSeverity.HIGH,
+                [NotificationChannel.SLACK, NotificationChannel.WEBHOOK], recipients=["http://hook-a"]
+            )
+
+        assert compiles == []
+        assert len(renders) == 3
+        assert sorted(state["calls"]) == sorted(["http://slack/hook", "http://hook-a"] * 3)
+
+    def test_hot_reload_from_directory(self, tmp_path):
+        """重新加载读取模板目录，编译失败时保留当前模板"""
+        template_dir = tmp_path / "templates"
+        (template_dir / "slack").mkdir(parents=True)
+        template_file = template_dir / "slack" / "critical.j2"
+        template_file.write_text("v1 {{ title }}", encoding="utf-8")
+        registry = NotificationTemplateRegistry(templates={}, template_dir=template_dir)
+        assert registry.render(NotificationChannel.SLACK, AlertSeverity.CRITICAL, title="t") == "v1 t"
+
+        template_file.write_text("v2 {{ title }}", encoding="utf-8")
+        registry.reload()
+        assert registry.render(NotificationChannel.SLACK, AlertSeverity.CRITICAL, title="t") == "v2 t"
+
+        template_file.write_text("v3 {{ title ", encoding="utf-8")
+        with pytest.raises(RuntimeError):
+            registry.reload()
+        assert registry.render(NotificationChannel.SLACK, AlertSeverity.CRITICAL, title="t") == "v2 t"
+        assert registry.get_stats()["custom_sources"] == 1
+
+    def test_invalid_operator_template_falls_back_to_defaults(self):
+        """自定义模板有误时使用内置模板启动"""
+        registry = NotificationTemplateRegistry(templates={"default/high": "{% if %}"})
+
+        assert registry.render(NotificationChannel.SLACK, AlertSeverity.HIGH, title="t", message="m").startswith("🔴")
+        assert registry.get_stats()["custom_sources"] == 0
+
+    def test_bytecode_cache_reused_across_reloads(self, tmp_path):
+        """配置字节码缓存目录时编译结果写入缓存"""
+        cache_dir = tmp_path / "bytecode"
+        NotificationTemplateRegistry(templates={}, cache_dir=cache_dir)
+        cached = sorted(path.name for path in cache_dir.iterdir())
+
+        second = NotificationTemplateRegistry(templates={}, cache_dir=cache_dir)
+
+        assert len(cached) == 5
+        assert sorted(path.name for path in cache_dir.iterdir()) == cached
+        assert second.render(NotificationChannel.EMAIL, AlertSeverity.LOW, title="t", message="m").startswith("⚠️")
+
+
+class FakeSMTP:
+    """记录连接和发送次数的SMTP客户端"""
+
+    instances = []
+
+    def __init__(self, **options):
+        self.options = options
+        self.is_connected = False
+        self.sent = 0
+        self.drop_next = False
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        await asyncio.sleep(0.01)
+        self.is_connected = True
+
+    async def send_message(self, message):
+        if self.drop_next:
+            self.is_connected = False
+            raise aiosmtplib.SMTPServerDisconnected("Connection lost")
+        await asyncio.sleep(0.01)
+        self.sent += 1
+
+    async def noop(self):
+        pass
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+def _smtp_pool(**kwargs):
+    FakeSMTP.instances = []
+    options = {"max_size": 2, "max_messages_per_connection": 100, "idle_timeout": 60, "keepalive_interval": 30, **kwargs}
+    return SMTPConnectionPool(hostname="smtp.example.com", port=587, client_factory=FakeSMTP, **options)
+
+
+class TestSMTPConnectionPool:
+    """SMTP连接池测试"""
+
+    @pytest.mark.asyncio
+    async def test_connection_reused_across_messages(self):
+        """连续发送复用同一个连接"""
+        pool = _smtp_pool()
+
+        for _ in range(10):
+            await pool.send(MIMEText("内容", "plain", "utf-8"))
+
+        assert pool.stats["connections_opened"] == 1
+        assert FakeSMTP.instances[0].sent == 10
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sends_bounded_by_pool_size(self):
+        """并发发送的连接数不超过连接池上限"""
+        pool = _smtp_pool(max_size=2)
+
+        await asyncio.gather(*(pool.send(MIMEText("内容", "plain", "utf-8")) for _ in range(20)))
+
+        assert pool.stats["sent"] == 20
+        assert pool.stats["connections_opened"] == 2
+
+    @pytest.mark.asyncio
+    async def test_connection_recycled_after_message_cap(self):
+        """单连接达到邮件数上限后关闭并新建连接"""
+        pool = _smtp_pool(max_messages_per_connection=3)
+
+        for _ in range(7):
+            await pool.send(MIMEText("内容", "plain", "utf-8"))
+        await pool.close()
+
+        assert pool.stats["connections_opened"] == 3
+        assert pool.stats["connections_recycled"] == 2
+        assert [client.sent for client in FakeSMTP.instances] == [3, 3, 1]
+        assert not any(client.is_connected for client in FakeSMTP.instances)
+
+    @pytest.mark.asyncio
+    async def test_reconnects_when_server_drops_connection(self):
+        """服务端断开空闲连接后重建连接并重发"""
+        pool = _smtp_pool()
+        await pool.send(MIMEText("第一封", "plain", "utf-8"))
+        FakeSMTP.instances[0].drop_next = True
+
+        await pool.send(MIMEText("第二封", "plain", "utf-8"))
+
+        assert pool.stats["reconnects"] == 1
+        assert pool.stats["sent"] == 2
+        assert FakeSMTP.instances[1].sent == 1
+
+    @pytest.mark.asyncio
+    async def test_idle_connection_replaced(self):
+        """超过空闲时间的连接不再复用"""
+        pool = _smtp_pool(idle_timeout=0)
+        await pool.send(MIMEText("第一封", "plain", "utf-8"))
+        await asyncio.sleep(0.01)
+
+        await pool.send(MIMEText("第二封", "plain", "utf-8"))
+
+        assert pool.stats["connections_opened"] == 2
+        assert FakeSMTP.instances[0].is_connected is False
+
+    @pytest.mark.asyncio
+    async def test_cancelled_send_closes_connection(self):
+        """外层超时取消发送时关闭连接，不放回连接池"""
+        pool = _smtp_pool()
+
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.send(MIMEText("内容", "plain", "utf-8")), timeout=0.015)
+
+        assert pool.get_stats()["idle_connections"] == 0
+        assert FakeSMTP.instances and not any(client.is_connected for client in FakeSMTP.instances)
@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus数据服务测试用例
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import httpx
+import numpy as np
+import pytest
+
+from app.models.schemas import MetricsResponse
+from app.services.prometheus_service import (
+    ColumnarRangeResult,
+    PrometheusService,
+    SeriesMatrix
+)
+import app.services.prometheus_registry as prometheus_registry
+import app.services.prometheus_service as prometheus_module
+from app.services.backend_guard import (
+    AdaptiveLimiter,
+    BackendGuardRegistry,
+    BackendUnavailableError,
+    CircuitBreaker
+)
+from app.services.http_clients import HTTPClientRegistry, http_clients
+from app.services.prometheus_registry import PrometheusServiceRegistry
+from app.services.query_cache import coarsen_step, parse_step_seconds
+
+
+def _range_payload(series_count=2, points=5, start=1_700_000_000):
+    """构造Prometheus范围查询响应"""
+    return {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {
+                    "metric": {"__name__": "cpu_usage", "instance": f"node-{i}"},
+                    "values": [[start + j * 60, str(float(i * 100 + j))] for j in range(points)]
+                }
+                for i in range(series_count)
+            ]
+        }
+    }
+
+
+def _fake_query_range(series_count=2):
+    """模拟Prometheus: 在步长网格上返回 [start, end] 内的点，值等于时间戳"""
+    async def execute(method, url, params=None, **kwargs):
+        step = float(params["step"])
+        start = np.ceil(float(params["start"]) / step) * step
+        end = np.floor(float(params["end"]) / step) * step
+        timestamps = np.arange(start, end + step / 2, step)
+        return {
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
+                "result": [
+                    {
+                        "metric": {"__name__": "cpu_usage", "instance": f"node-{i}"},
+                        "values": [[ts, str(ts + i)] for ts in timestamps.tolist()]
+                    }
+                    for i in range(series_count)
+                ]
+            }
+        }
+    return AsyncMock(side_effect=execute)
+
+
+@pytest.fixture
+def service():
+    """请求层被替换的Prometheus服务"""
+    service = PrometheusService()
+    service._execute_request = _fake_query_range()
+    return service
+
+
+class TestColumnarParsing:
+    """列式解析测试"""
+
+    def test_parse_builds_float64_columns(self, service):
+        """每条序列解析为float64数组，标签去掉__name__"""
+        series = service._parse_range_columnar(_range_payload())
+
+        assert len(series) == 2
+        assert series[1].metric_name == "cpu_usage"
+        assert series[1].labels == {"instance": "node-1"}
+        assert series[1].values.dtype == np.float64
+        np.testing.assert_array_equal(series[1].values, [100.0, 101.0, 102.0, 103.0, 104.0])
+        assert series[0].timestamps[1] - series[0].timestamps[0] == 60
+
+    def test_parse_skips_invalid_samples(self, service):
+        """无效样本被跳过，其余样本正常保留"""
+        payload = _range_payload(series_count=1, points=3)
+        payload["data"]["result"][0]["values"][1][1] = "not-a-number"
+
+        series = service._parse_range_columnar(payload)
+
+        np.testing.assert_array_equal(series[0].values, [0.0, 2.0])
+
+    @pytest.mark.asyncio
+    async def test_query_range_columnar_and_pydantic_views(self, service):
+        """内部调用方拿到列式结果，HTTP边界转换为MetricsResponse"""
+        end_time = datetime(2024, 1, 1, 12, 0)
+        start_time = end_time - timedelta(minutes=9)
+
+        columnar = await service.query_range("cpu_usage", start_time, end_time, columnar=True)
+        response = await service.query_range("cpu_usage", start_time, end_time)
+
+        assert isinstance(columnar, ColumnarRangeResult)
+        assert columnar.total_points == 20
+        assert isinstance(response, MetricsResponse)
+        assert response.data[1].values[2].value == columnar.series[1].values[2]
+        assert response.data[1].values[2].labels == {"instance": "node-1"}
+
+    def test_matrix_from_columnar(self, service):
+        """列式序列构建的矩阵与逐点构建一致"""
+        series = service._parse_range_columnar(_range_payload())
+        response = ColumnarRangeResult(query="cpu_usage", series=series).to_metrics_response()
+
+        from_columnar = SeriesMatrix.from_columnar(series)
+        from_points = SeriesMatrix.from_time_series(response.data)
+
+        np.testing.assert_array_equal(from_columnar.values, from_points.values)
+        np.testing.assert_array_equal(from_columnar.timestamps, from_points.timestamps)
+        assert from_columnar.labels == from_points.labels
+
+    def test_parse_instant_vector_and_scalar(self, service):
+        """即时查询的vector和scalar结果都解析为单点序列"""
+        vector = {
+            "status": "success",
+            "data": {
+                "resultType": "vector",
+                "result": [{"metric": {"instance": "node-0"}, "value": [1_700_000_000, "42.5"]}]
+            }
+        }
+        scalar = {"status": "success", "data": {"resultType": "scalar", "result": [1_700_000_000, "3"]}}
+
+        vector_series = service._parse_instant_columnar(vector)
+        scalar_series = service._parse_instant_columnar(scalar)
+
+        assert vector_series[0].labels == {"instance": "node-0"}
+        np.testing.assert_array_equal(vector_series[0].values, [42.5])
+        assert len(scalar_series) == 1 and scalar_series[0].values[0] == 3.0
+
+
+class TestRangeBlockCache:
+    """分块范围缓存测试"""
+
+    @pytest.mark.asyncio
+    async def test_sliding_window_reuses_completed_blocks(self, service):
+        """滑动窗口再次查询时只请求头部区间"""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(hours=6)
+
+        first = await service.query_range("cpu_usage", start_time, end_time, columnar=True)
+        requests_after_first = service._execute_request.await_count
+
+        second = await service.query_range(
+            "cpu_usage", start_time + timedelta(minutes=1), end_time + timedelta(minutes=1), columnar=True
+        )
+
+        stats = service.get_cache_stats()
+        assert service._execute_request.await_count == requests_after_first + 1
+        assert stats["hits"] >= 5
+        assert stats["head_fetches"] == 2
+
+        # 拼接结果与直接查询一致：步长网格上无重复、无缺口
+        for series in second.series:
+            assert np.all(np.diff(series.timestamps) == 60)
+            assert series.timestamps[0] >= (start_time + timedelta(minutes=1)).timestamp()
+            np.testing.assert_array_equal(series.values - series.timestamps, series.values[0] - series.timestamps[0])
+        assert len(first.series) == len(second.series) == 2
+
+    @pytest.mark.asyncio
+    async def test_missing_blocks_fetched_in_one_request(self, service):
+        """连续的未命中块合并为一次请求"""
+        end_time = datetime.now() - timedelta(days=1)
+        start_time = end_time - timedelta(hours=5)
+
+        await service.query_range("cpu_usage", start_time, end_time, columnar=True)
+
+        # 整个区间都已完成：只有一次合并请求，没有头部查询
+        assert service._execute_request.await_count == 1
+        assert service.get_cache_stats()["head_fetches"] == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_fetches_are_coalesced(self, service):
+        """并发的相同查询只发出一次HTTP请求"""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(minutes=30)
+
+        results = await asyncio.gather(*(
+            service.query_range("cpu_usage", start_time, end_time, columnar=True)
+            for _ in range(5)
+        ))
+
+        # 窗口可能跨越一个已完成的块：每个不同的区间请求只发出一次
+        requests = service._execute_request.await_count
+        assert requests in (1, 2)
+        assert service.get_cache_stats()["coalesced_fetches"] == 4 * requests
+        assert service.get_cache_stats()["inflight_fetches"] == 0
+        assert all(result.total_points == results[0].total_points for result in results)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_instant_queries_are_coalesced(self):
+        """同一秒内的相同即时查询只发出一次HTTP请求"""
+        service = PrometheusService()
+        vector = {"status": "success", "data": {"resultType": "vector", "result": [
+            {"metric": {"instance": "node-0"}, "value": [1_700_000_000, "1"]}
+        ]}}
+
+        async def slow_request(method, url, **kwargs):
+            await asyncio.sleep(0.05)
+            return vector
+
+        service._execute_request = AsyncMock(side_effect=slow_request)
+        timestamp = datetime(2024, 1, 1, 12, 0, 0)
+
+        results = await asyncio.gather(
+            service.query_instant("up", timestamp, columnar=True),
+            service.query_instant("up", timestamp + timedelta(milliseconds=300), columnar=True),
+            service.query_instant("up", timestamp),
+            service.query_instant("node_load1", timestamp)
+        )
+
+        assert service._execute_request.await_count == 2
+        assert service.get_cache_stats()["coalesced_fetches"] == 2
+        assert results[0].series[0].values[0] == results[1].series[0].values[0] == 1.0
+
+    def test_parse_step_seconds(self):
+        """Prometheus步长格式解析"""
+        assert parse_step_seconds("60") == 60
+        assert parse_step_seconds("5m") == 300
+        assert parse_step_seconds("1h30m") == 5400
+        with pytest.raises(ValueError):
+            parse_step_seconds("5 minutes")
+
+
+class TestHTTPClientRegistry:
+    """共享HTTP客户端测试"""
+
+    @pytest.mark.asyncio
+    async def test_clients_shared_per_target(self):
+        """相同地址和认证复用同一客户端，不同认证使用独立客户端"""
+        registry = HTTPClientRegistry()
+
+        first = registry.get("http://prometheus:9090/", timeout=30)
+        second = registry.get("http://prometheus:9090", timeout=30)
+        authed = registry.get("http://prometheus:9090", username="admin", password="secret", timeout=30)
+
+        assert first is second
+        assert authed is not first
+        assert authed.auth is not None
+        assert registry.get_stats()["clients"] == 2
+
+        await registry.aclose_all()
+        assert first.is_closed and authed.is_closed
+        assert registry.get("http://prometheus:9090", timeout=30) is not first
+
+    @pytest.mark.asyncio
+    async def test_services_share_pooled_client(self):
+        """指向同一地址的Prometheus服务实例共享连接池"""
+        first, second = PrometheusService(), PrometheusService()
+        assert first.client is second.client
+        assert first.client is http_clients.get(first.base_url, timeout=first.timeout)
+
+        second.base_url = "http://other-prometheus:9090"
+        assert second.client is not first.client
+
+    def test_http2_requires_h2(self, monkeypatch):
+        """未安装 h2 时不启用HTTP/2"""
+        monkeypatch.setattr("importlib.util.find_spec", lambda name: None)
+        assert HTTPClientRegistry(http2=True).http2 is False
+
+
+class TestChunkedRangeFetch:
+    """长区间分段请求测试"""
+
+    @pytest.mark.asyncio
+    async def test_long_range_split_into_bounded_chunks(self, service):
+        """超过单次点数上限的区间拆分为对齐的分段，并发数受限，拼接后无缺口无重复"""
+        service.max_points_per_request = 100
+        service.range_concurrency = 2
+        fake = _fake_query_range()
+        state = {"active": 0, "peak": 0}
+
+        async def execute(method, url, params=None, **kwargs):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return await fake(method, url, params=params)
+
+        service._execute_request = AsyncMock(side_effect=execute)
+        end_time = datetime.now() - timedelta(days=1)
+        start_time = end_time - timedelta(hours=20)
+
+        result = await service.query_range("cpu_usage", start_time, end_time, columnar=True)
+
+        requests = [call.kwargs["params"] for call in service._execute_request.await_args_list]
+        assert len(requests) >= 12
+        assert all((float(p["end"]) - float(p["start"])) / 60 + 1 <= 100 for p in requests)
+        assert state["peak"] == 2
+        assert service.get_cache_stats()["chunked_fetches"] == 1
+        for series in result.series:
+            assert np.all(np.diff(series.timestamps) == 60)
+            assert len(series) == 20 * 60 + (1 if start_time.timestamp() % 60 == 0 else 0)
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_fails_query(self, service):
+        """任一分段失败时整个查询失败"""
+        service.max_points_per_request = 100
+        fake = _fake_query_range()
+
+        async def execute(method, url, params=None, **kwargs):
+            if float(params["start"]) > float(params["end"]) - 99 * 60:
+                raise RuntimeError("Prometheus 503")
+            return await fake(method, url, params=params)
+
+        service._execute_request = AsyncMock(side_effect=execute)
+        end_time = datetime.now() - timedelta(days=1)
+
+        with pytest.raises(RuntimeError, match="503"):
+            await service.query_range("cpu_usage", end_time - timedelta(hours=5), end_time, columnar=True)
+
+    @pytest.mark.asyncio
+    async def test_max_points_coarsens_step(self, service):
+        """请求的分辨率超过需要时自动放大步长"""
+        end_time = datetime.now() - timedelta(days=1)
+        start_time = end_time - timedelta(days=7)
+
+        result = await service.query_range("cpu_usage", start_time, end_time, columnar=True, max_points=500)
+
+        assert result.step_seconds == 1800
+        assert all(len(series) <= 500 for series in result.series)
+        assert {call.kwargs["params"]["step"] for call in service._execute_request.await_args_list} == {1800}
+
+    def test_coarsen_step(self):
+        """步长只会放大到满足点数限制的最小常用步长"""
+        assert coarsen_step(0, 3600, 60, 1000) == 60
+        assert coarsen_step(0, 86400, 15, 1000) == 120
+        assert coarsen_step(0, 30 * 86400, 60, 11000) == 300
+        assert coarsen_step(0, 1000 * 86400, 60, 100) == 11 * 86400
+
+
+def _registry(monkeypatch, *configs):
+    """当前配置依次返回 configs 的服务注册表"""
+    loader = AsyncMock(side_effect=list(configs))
+    monkeypatch.setattr(prometheus_registry.config_db_service, "get_default_prometheus_config", loader)
+    return PrometheusServiceRegistry()
+
+
+def _prometheus_config(config_id, url, timeout=0.05, **extra):
+    return {"id": config_id, "url": url, "timeout": timeout, "max_retries": 1, **extra}
+
+
+class TestPrometheusServiceRegistry:
+    """Prometheus服务注册表测试"""
+
+    @pytest.mark.asyncio
+    async def test_service_reused_until_config_changes(self, monkeypatch):
+        """配置不变时复用服务，切换配置后替换并关闭旧连接池"""
+        registry = _registry(
+            monkeypatch,
+            _prometheus_config(1, "http://prom-a:9090"),
+            _prometheus_config(1, "http://prom-a:9090"),
+            _prometheus_config(2, "http://prom-b:9090", username="reader", password="secret")
+        )
+
+        first = await registry.get()
+        old_client = first.client
+        assert await registry.get() is first
+        assert (first.base_url, first.timeout, first.max_retries) == ("http://prom-a:9090", 0.05, 1)
+
+        second = await registry.get()
+        assert second is not first
+        assert second.base_url == "http://prom-b:9090"
+        assert second.client.auth is not None
+        assert registry.get_stats()["config_id"] == 2
+
+        await asyncio.sleep(0.1)
+        assert old_client.is_closed
+        assert not second.client.is_closed
+        await registry.close()
+        assert registry.get_stats()["retiring_pools"] == 0
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_settings_without_config(self, monkeypatch):
+        """没有数据库配置时使用默认配置，读取失败时保留现有服务"""
+        registry = _registry(monkeypatch, None, RuntimeError("数据库不可用"))
+
+        service = await registry.get()
+        assert service.base_url == str(prometheus_registry.PrometheusService().base_url)
+        assert await registry.get() is service
+        assert registry.swaps == 0
+
+    @pytest.mark.asyncio
+    async def test_active_proxy_follows_current_service(self, monkeypatch):
+        """代理的异步方法调用前解析当前服务，同步方法读取最近的服务"""
+        registry = _registry(
+            monkeypatch,
+            _prometheus_config(1, "http://prom-a:9090"),
+            _prometheus_config(2, "http://prom-b:9090")
+        )
+        proxy = registry.active()
+
+        async def health_check(self):
+            return self.base_url
+
+        monkeypatch.setattr(prometheus_registry.PrometheusService, "health_check", health_check)
+
+        assert await proxy.health_check() == "http://prom-a:9090"
+        assert await proxy.health_check() == "http://prom-b:9090"
+        assert proxy.base_url == "http://prom-b:9090"
+        assert proxy.get_cache_stats() == registry.current.get_cache_stats()
+
+    @pytest.mark.asyncio
+    async def test_probe_closes_temporary_pool(self, monkeypatch):
+        """连接测试结束后关闭临时连接池，不影响当前服务"""
+        registry = _registry(monkeypatch, _prometheus_config(1, "http://prom-a:9090"))
+        active = await registry.get()
+        active_client = active.client
+        created = []
+
+        async def health_check(self):
+            created.append(self.client)
+            return True
+
+        monkeypatch.setattr(prometheus_registry.PrometheusService, "health_check", health_check)
+
+        assert await registry.probe({"url": "http://prom-test:9090", "timeout": 5})
+        assert await registry.probe(_prometheus_config(1, "http://prom-a:9090"))
+        assert created[0].is_closed
+        assert created[1] is active_client and not active_client.is_closed
+
+
+def _guarded_service(monkeypatch, handler):
+    """请求由 handler 响应、使用独立后端保护的服务"""
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(prometheus_module, "backend_guards", BackendGuardRegistry())
+    monkeypatch.setattr(PrometheusService, "client", property(lambda self: client))
+    service = PrometheusService(base_url="http://prom-guard:9090", max_retries=3)
+    service.retry_backoff = 0
+    return service
+
+
+class TestBackendGuard:
+    """熔断器和自适应并发限制测试"""
+
+    def test_breaker_opens_and_recovers(self):
+        """连续失败后熔断，冷却后放行一个探测请求，成功则关闭"""
+        breaker = CircuitBreaker("prom", failure_threshold=2, reset_timeout=0.05)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.on_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(BackendUnavailableError):
+            breaker.before_call()
+
+        time.sleep(0.06)
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(BackendUnavailableError):
+            breaker.before_call()
+
+        breaker.on_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.get_stats()["opened"] == 1
+        assert breaker.get_stats()["rejected"] == 2
+
+    @pytest.mark.asyncio
+    async def test_limiter_queues_and_rejects(self):
+        """超过并发上限的请求排队，排队超时被拒绝"""
+        limiter = AdaptiveLimiter("prom", initial_limit=1, min_limit=1, max_limit=1, queue_timeout=0.05)
+        await limiter.acquire()
+
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        limiter.release(0.01)
+        assert await waiter >= 0
+
+        with pytest.raises(BackendUnavailableError):
+            await limiter.acquire()
+
+        stats = limiter.get_stats()
+        assert stats["queued"] == 2
+        assert stats["rejected"] == 1
+        assert stats["inflight"] == 1
+        assert stats["queue_seconds_max"] > 0
+
+    @pytest.mark.asyncio
+    async def test_limiter_aimd(self):
+        """正常响应缓慢增加上限，过载时减半且同一窗口只减一次"""
+        limiter = AdaptiveLimiter("prom", initial_limit=8, min_limit=2, max_limit=16, slow_seconds=1.0)
+        for _ in range(9):
+            await limiter.acquire()
+            limiter.release(0.01)
+        assert limiter.get_stats()["limit"] == 9
+
+        for _ in range(3):
+            await limiter.acquire()
+            limiter.release(0.01, overloaded=True)
+        assert limiter.get_stats()["limit"] == 4
+        assert limiter.get_stats()["decreases"] == 1
+
+    @pytest.mark.asyncio
+    async def test_overload_not_retried(self, monkeypatch):
+        """503 和查询错误不重试"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503 if "overloaded" in str(request.url) else 400)
+
+        service = _guarded_service(monkeypatch, handler)
+        for path in ("/overloaded", "/bad-query"):
+            with pytest.raises(RuntimeError):
+                await service._execute_request("GET", f"http://prom-guard:9090{path}")
+
+        assert len(calls) == 2
+        assert service.get_guard_stats()["limiter"]["decreases"] == 1
+
+    @pytest.mark.asyncio
+    async def test_connection_errors_retried_until_breaker_opens(self, monkeypatch):
+        """连接失败会重试，熔断后剩余请求不再发出"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ConnectError("connection refused", request=request)
+
+        service = _guarded_service(monkeypatch, handler)
+        with pytest.raises(RuntimeError):
+            await service._execute_request("GET", "http://prom-guard:9090/api/v1/query")
+        assert len(calls) == 4
+
+        with pytest.raises(BackendUnavailableError):
+            await service._execute_request("GET", "http://prom-guard:9090/api/v1/query")
+        assert len(calls) == 5
+
+        stats = service.get_guard_stats()
+        assert stats["circuit_breaker"]["state"] == CircuitBreaker.OPEN
+        assert stats["circuit_breaker"]["rejected"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
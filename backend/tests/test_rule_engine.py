@@ -0,0 +1,667 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则引擎测试用例
+"""
+
+import asyncio
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models.schemas import (
+    AlertSeverity,
+    ConditionEvaluationMode,
+    InspectionRule,
+    InspectionRuleCreate,
+    NotificationChannel,
+    RuleCondition,
+    RuleExecutionResult,
+    RuleOperator
+)
+from app.services.prometheus_service import ColumnarRangeResult, ColumnarSeries
+from app.models.database import Alert, Notification
+from app.services.alert_pipeline import AlertEvent, AlertPipeline
+from app.services.execution_history import ExecutionHistory
+from app.services.rule_engine import RuleEngine, compile_condition_query
+from app.services.rule_scheduler import RuleScheduler
+from app.services.rule_store import RuleStore
+
+
+class FakePrometheusService:
+    """按查询返回固定值的Prometheus服务"""
+
+    def __init__(self, values=None, delay=0.0):
+        self.values = values or {}
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queries = []
+
+    async def query_instant(self, compiled, timestamp=None, columnar=False):
+        self.calls += 1
+        self.queries.append(compiled)
+        # 还原编译前的原始查询，按原始查询配置返回值
+        query = re.search(r"\(\((.*)\)\[", compiled).group(1)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.values.get(query, {}).get("delay", self.delay))
+        finally:
+            self.in_flight -= 1
+
+        config = self.values.get(query, {})
+        # "series" 配置为 (标签, 值) 列表，未配置时返回单条序列
+        series = config.get("series") or [({"instance": "node-1"}, config.get("value", 1.0))]
+        return ColumnarRangeResult(query=compiled, series=[
+            ColumnarSeries(
+                metric_name=query,
+                labels=labels,
+                timestamps=np.array([timestamp.timestamp()]),
+                values=np.array([value])
+            )
+            for labels, value in series
+        ])
+
+
+@pytest.fixture
+def make_engine(session_factory, make_outbox):
+    """规则存储和告警管道都使用临时数据库的规则引擎"""
+    def make(prometheus):
+        return RuleEngine(
+            prometheus_service=prometheus,
+            rule_store=RuleStore(session_factory=session_factory),
+            alert_pipeline=AlertPipeline(
+                session_factory=session_factory,
+                outbox=make_outbox(),
+                flush_interval=0.05
+            )
+        )
+    return make
+
+
+def _rule(name, queries, threshold=0.5):
+    """构造所有条件都是 > threshold 的规则"""
+    return InspectionRuleCreate(
+        name=name,
+        conditions=[
+            RuleCondition(metric_query=query, operator=RuleOperator.GREATER_THAN, threshold=threshold)
+            for query in queries
+        ],
+        severity=AlertSeverity.HIGH,
+        cooldown_minutes=5
+    )
+
+
+class TestConcurrentExecution:
+    """规则并发执行测试"""
+
+    @pytest.mark.asyncio
+    async def test_executes_all_rules_concurrently(self, make_engine):
+        """所有规则都被执行，条件评估并发进行且受信号量限制"""
+        prometheus = FakePrometheusService(delay=0.05)
+        engine = make_engine(prometheus)
+        engine.max_concurrency = 10
+
+        for i in range(120):
+            await engine.create_rule(_rule(f"rule-{i}", [f"q{i}_a", f"q{i}_b"]))
+
+        start = time.monotonic()
+        response = await engine.execute_rules()
+        elapsed = time.monotonic() - start
+
+        assert response.total_executed == 120
+        assert response.triggered_count == 120
+        assert prometheus.calls == 240
+        assert prometheus.max_in_flight == 10
+        # 串行需要 240 * 0.05 = 12 秒
+        assert elapsed < 3
+
+    @pytest.mark.asyncio
+    async def test_condition_timeout_does_not_block_rule(self, make_engine):
+        """超时的条件记为未满足，其余规则正常完成"""
+        prometheus = FakePrometheusService(values={"slow": {"delay": 5}})
+        engine = make_engine(prometheus)
+        engine.condition_timeout = 0.1
+
+        await engine.create_rule(_rule("slow-rule", ["slow", "fast"]))
+        await engine.create_rule(_rule("fast-rule", ["fast"]))
+
+        response = await engine.execute_rules()
+        results = {result.rule_name: result for result in response.results}
+
+        assert not results["slow-rule"].triggered
+        assert results["slow-rule"].conditions_met == 1
+        assert results["fast-rule"].triggered
+        assert response.execution_summary["condition_timeouts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_shared_query_fetched_once_per_cycle(self, make_engine):
+        """同一查询的多个阈值条件在一个周期内只查询一次"""
+        prometheus = FakePrometheusService(values={"cpu": {"value": 85.0, "delay": 0.05}})
+        engine = make_engine(prometheus)
+
+        await engine.create_rule(_rule("cpu-warning", ["cpu"], threshold=70))
+        await engine.create_rule(_rule("cpu-critical", ["cpu"], threshold=90))
+        await engine.create_rule(_rule("cpu-mixed", ["cpu", "mem"], threshold=50))
+
+        response = await engine.execute_rules()
+        results = {result.rule_name: result for result in response.results}
+
+        assert prometheus.calls == 2
+        assert response.execution_summary["queries_fetched"] == 2
+        assert response.execution_summary["queries_shared"] == 2
+        assert results["cpu-warning"].triggered
+        assert not results["cpu-critical"].triggered
+        assert results["cpu-mixed"].conditions_met == 1
+
+    def test_record_cycle_tracks_overruns(self):
+        """周期耗时超过间隔时记录超时次数和滞后"""
+        engine = RuleEngine(prometheus_service=FakePrometheusService())
+
+        engine._record_cycle(duration=5.0, lag=0.0, interval=60)
+        engine._record_cycle(duration=75.0, lag=2.5, interval=60)
+
+        assert engine.cycle_stats["cycles"] == 2
+        assert engine.cycle_stats["overruns"] == 1
+        assert engine.cycle_stats["max_duration"] == 75.0
+        assert engine.cycle_stats["last_lag"] == 2.5
+
+
+class TestInstantQueryCompilation:
+    """条件编译为即时查询测试"""
+
+    def test_latest_mode_uses_last_over_time(self):
+        """默认模式取窗口内最后一个值并跨序列平均"""
+        condition = RuleCondition(
+            metric_query='rate(http_requests_total{job="api"}[5m])',
+            operator=RuleOperator.GREATER_THAN,
+            threshold=100,
+            duration_minutes=10
+        )
+
+        assert compile_condition_query(condition) == (
+            'avg(last_over_time((rate(http_requests_total{job="api"}[5m]))[10m:1m]))'
+        )
+
+    def test_sustained_mode_picks_window_extreme(self):
+        """持续模式下大于类取窗口最小值，小于类取窗口最大值"""
+        above = RuleCondition(
+            metric_query="cpu", operator=RuleOperator.GREATER_EQUAL, threshold=80,
+            evaluation_mode=ConditionEvaluationMode.SUSTAINED
+        )
+        below = RuleCondition(
+            metric_query="cpu", operator=RuleOperator.LESS_THAN, threshold=10,
+            evaluation_mode=ConditionEvaluationMode.SUSTAINED
+        )
+
+        assert compile_condition_query(above) == "avg(min_over_time((cpu)[5m:1m]))"
+        assert compile_condition_query(below) == "avg(max_over_time((cpu)[5m:1m]))"
+
+    @pytest.mark.asyncio
+    async def test_sustained_mode_rejects_equality(self):
+        """持续模式不支持等于/不等于"""
+        engine = RuleEngine(prometheus_service=FakePrometheusService())
+        rule = InspectionRuleCreate(
+            name="sustained-equal",
+            conditions=[RuleCondition(
+                metric_query="up", operator=RuleOperator.EQUAL, threshold=0,
+                evaluation_mode=ConditionEvaluationMode.SUSTAINED
+            )],
+            severity=AlertSeverity.HIGH
+        )
+
+        with pytest.raises(ValueError):
+            await engine.create_rule(rule)
+
+    @pytest.mark.asyncio
+    async def test_conditions_issue_instant_queries(self, make_engine):
+        """条件评估只发出即时查询，每个条件一个样本"""
+        prometheus = FakePrometheusService(values={"cpu": {"value": 85.0}})
+        engine = make_engine(prometheus)
+
+        await engine.create_rule(_rule("cpu-high", ["cpu"], threshold=70))
+        response = await engine.execute_rules()
+
+        assert response.triggered_count == 1
+        assert prometheus.queries == ["avg(last_over_time((cpu)[5m:1m]))"]
+
+
+class TestPerSeriesEvaluation:
+    """逐序列条件评估测试"""
+
+    @staticmethod
+    def _fleet(hot_instances, size=1000):
+        """构造 size 条磁盘使用率序列，hot_instances 中的实例为95，其余为40"""
+        return [
+            ({"instance": f"node-{i}"}, 95.0 if i in hot_instances else 40.0)
+            for i in range(size)
+        ]
+
+    def _per_series_rule(self, operator=RuleOperator.GREATER_THAN, threshold=90):
+        return InspectionRuleCreate(
+            name="disk-full",
+            conditions=[RuleCondition(
+                metric_query="disk_usage", operator=operator, threshold=threshold, per_series=True
+            )],
+            severity=AlertSeverity.CRITICAL
+        )
+
+    def test_per_series_query_skips_average(self):
+        """逐序列模式不做跨序列平均"""
+        condition = RuleCondition(
+            metric_query="disk_usage", operator=RuleOperator.GREATER_THAN, threshold=90, per_series=True
+        )
+
+        assert compile_condition_query(condition) == "last_over_time((disk_usage)[5m:1m])"
+
+    @pytest.mark.asyncio
+    async def test_single_hot_series_triggers_rule(self, make_engine):
+        """平均值正常时，单条异常序列仍能触发并被报告"""
+        prometheus = FakePrometheusService(values={"disk_usage": {"series": self._fleet({417})}})
+        engine = make_engine(prometheus)
+
+        rule_id = await engine.create_rule(self._per_series_rule())
+        result = await engine.execute_rule(rule_id)
+        condition_result = result.metadata["condition_results"][0]
+
+        assert result.triggered
+        assert condition_result["series_count"] == 1000
+        assert condition_result["offending_count"] == 1
+        assert condition_result["offending_series"] == [{"instance": "node-417"}]
+
+    @pytest.mark.asyncio
+    async def test_evaluation_returns_all_offenders(self, make_engine):
+        """评估结果包含所有违规序列，等于操作符使用容差比较"""
+        prometheus = FakePrometheusService(values={"disk_usage": {"series": self._fleet({3, 7, 11}, size=20)}})
+        engine = make_engine(prometheus)
+
+        above = await engine._evaluate_condition(self._per_series_rule().conditions[0])
+        equal = await engine._evaluate_condition(
+            self._per_series_rule(RuleOperator.EQUAL, 95.0000001).conditions[0]
+        )
+
+        assert [labels["instance"] for labels in above.offending_series] == ["node-3", "node-7", "node-11"]
+        assert above.value is None
+        assert len(equal.offending_series) == 3
+
+    @pytest.mark.asyncio
+    async def test_aggregate_mode_unchanged(self, make_engine):
+        """聚合模式仍比较跨序列平均值"""
+        prometheus = FakePrometheusService(values={"disk_usage": {"series": self._fleet({1}, size=10)}})
+        engine = make_engine(prometheus)
+        condition = RuleCondition(metric_query="disk_usage", operator=RuleOperator.GREATER_THAN, threshold=90)
+
+        evaluation = await engine._evaluate_condition(condition)
+
+        assert not evaluation.met
+        assert evaluation.value == pytest.approx(45.5)
+        assert evaluation.offending_series == []
+
+
+class TestRuleStore:
+    """数据库规则存储测试"""
+
+    @pytest.mark.asyncio
+    async def test_rules_survive_engine_restart(self, make_engine):
+        """规则持久化到数据库，新引擎实例可以读取"""
+        engine = make_engine(FakePrometheusService())
+
+        rule_id = await engine.create_rule(_rule("cpu-high", ["cpu"], threshold=80))
+
+        restarted = make_engine(FakePrometheusService())
+        rule = await restarted.get_rule(rule_id)
+
+        assert rule.name == "cpu-high"
+        assert rule.conditions[0].threshold == 80
+        assert rule.conditions[0].operator == RuleOperator.GREATER_THAN
+
+    @pytest.mark.asyncio
+    async def test_changes_propagate_between_workers(self, session_factory):
+        """一个进程的修改在下次校验时传播到其他进程的缓存"""
+        worker_a = RuleStore(session_factory=session_factory, refresh_interval=0)
+        worker_b = RuleStore(session_factory=session_factory, refresh_interval=0)
+
+        rule = await worker_a.create(_rule("cpu-high", ["cpu"]))
+        await worker_b.refresh()
+        assert worker_b.rules[rule.id].name == "cpu-high"
+
+        await worker_a.update(rule.id, _rule("cpu-very-high", ["cpu"], threshold=95))
+        await worker_b.refresh()
+        assert worker_b.rules[rule.id].conditions[0].threshold == 95
+
+        await worker_a.delete(rule.id)
+        await worker_b.refresh()
+        assert rule.id not in worker_b.rules
+
+    @pytest.mark.asyncio
+    async def test_cache_checked_at_most_once_per_interval(self, session_factory):
+        """校验间隔内的读取不访问数据库"""
+        store = RuleStore(session_factory=session_factory, refresh_interval=60)
+
+        for _ in range(10):
+            await store.refresh()
+
+        assert store.stats["signature_checks"] == 1
+
+    @pytest.mark.asyncio
+    async def test_execution_stats_do_not_invalidate_cache(self, session_factory, make_engine):
+        """执行统计写入数据库，但不触发其他进程重新加载"""
+        engine = make_engine(FakePrometheusService(values={"cpu": {"value": 90.0}}))
+        observer = RuleStore(session_factory=session_factory, refresh_interval=0)
+
+        rule_id = await engine.create_rule(_rule("cpu-high", ["cpu"], threshold=80))
+        await observer.refresh()
+        await engine.execute_rules()
+        await observer.refresh()
+
+        assert observer.stats["reloads"] == 1
+
+        await observer.refresh(force=True)
+        fresh = RuleStore(session_factory=session_factory)
+        await fresh.refresh()
+        assert fresh.rules[rule_id].execution_count == 1
+        assert fresh.rules[rule_id].triggered_count == 1
+        assert fresh.rules[rule_id].last_executed is not None
+
+
+class TestRuleScheduler:
+    """规则调度器测试"""
+
+    @staticmethod
+    def _rules(count, interval=None, cooldown=15):
+        return {
+            rule_id: InspectionRule(
+                id=rule_id,
+                **_rule(f"rule-{rule_id}", ["cpu"]).model_dump(exclude={"cooldown_minutes", "evaluation_interval_seconds"}),
+                cooldown_minutes=cooldown,
+                evaluation_interval_seconds=interval
+            )
+            for rule_id in range(1, count + 1)
+        }
+
+    def test_initial_due_times_spread_over_interval(self):
+        """首次调度在一个间隔内均匀分散，不会集中在同一时刻"""
+        scheduler = RuleScheduler(default_interval=60)
+        scheduler.sync(self._rules(600), version=1, now=0.0)
+
+        per_second = Counter(int(scheduler.due_at(rule_id)) for rule_id in range(1, 601))
+
+        assert all(0 <= scheduler.due_at(rule_id) < 60 for rule_id in range(1, 601))
+        assert len(per_second) == 60
+        assert max(per_second.values()) <= 15
+
+    def test_rules_follow_their_own_interval(self):
+        """每条规则按自己的间隔执行，每次只取出到期规则"""
+        rules = self._rules(2)
+        rules[1].evaluation_interval_seconds = 10
+        scheduler = RuleScheduler(default_interval=60)
+        scheduler.sync(rules, version=1, now=0.0)
+
+        executions = Counter()
+        max_batch = 0
+        for now in range(0, 120):
+            due = scheduler.pop_due(float(now))
+            max_batch = max(max_batch, len(due))
+            for rule_id, scheduled_at in due:
+                executions[rule_id] += 1
+                scheduler.complete(rules[rule_id], scheduled_at, now=float(now))
+
+        assert executions[1] == 12
+        assert executions[2] == 2
+        assert max_batch == 1
+
+    def test_triggered_rule_skipped_until_cooldown_ends(self):
+        """触发后的规则直接排到冷却结束，期间不会被取出"""
+        rules = self._rules(1, interval=60, cooldown=10)
+        scheduler = RuleScheduler()
+        scheduler.sync(rules, version=1, now=0.0)
+        [(rule_id, scheduled_at)] = scheduler.pop_due(now=60.0)
+
+        rules[rule_id].last_triggered = datetime.now()
+        scheduler.complete(rules[rule_id], scheduled_at, now=60.0)
+
+        assert scheduler.due_at(rule_id) == pytest.approx(660.0, abs=1)
+        assert scheduler.pop_due(now=600.0) == []
+
+    def test_deleted_and_disabled_rules_are_dropped(self):
+        """删除或禁用的规则在到期时丢弃，重新启用后恢复调度"""
+        rules = self._rules(3, interval=60)
+        scheduler = RuleScheduler()
+        scheduler.sync(rules, version=1, now=0.0)
+
+        del rules[1]
+        rules[2].enabled = False
+        scheduler.sync(rules, version=2, now=0.0)
+
+        assert [rule_id for rule_id, _ in scheduler.pop_due(now=60.0)] == [3]
+
+        rules[2].enabled = True
+        scheduler.sync(rules, version=3, now=60.0)
+        assert scheduler.due_at(2) is not None and scheduler.due_at(1) is None
+
+    @pytest.mark.asyncio
+    async def test_cooldown_counts_from_last_trigger(self, make_engine):
+        """冷却期从上次触发开始计算，未触发的执行不进入冷却"""
+        prometheus = FakePrometheusService(values={"cpu": {"value": 50.0}})
+        engine = make_engine(prometheus)
+        rule_id = await engine.create_rule(_rule("cpu-high", ["cpu"], threshold=80))
+
+        first = await engine.execute_rule(rule_id)
+        prometheus.values["cpu"]["value"] = 90.0
+        second = await engine.execute_rule(rule_id)
+        third = await engine.execute_rule(rule_id)
+
+        assert not first.triggered
+        assert second.triggered
+        assert third.metadata["status"] == "cooldown"
+        assert engine.rules[rule_id].last_triggered is not None
+
+
+class TestExecutionHistory:
+    """执行历史环形缓冲区和滚动统计测试"""
+
+    @staticmethod
+    def _result(triggered=False, failed=False, duration_ms=10.0):
+        return RuleExecutionResult(
+            rule_id=1,
+            rule_name="rule",
+            triggered=triggered,
+            severity=AlertSeverity.HIGH,
+            message="",
+            conditions_met=0,
+            total_conditions=1,
+            duration_ms=duration_ms,
+            metadata={"error": "boom"} if failed else {}
+        )
+
+    def test_buffer_is_bounded(self):
+        """超过容量后只保留最近的结果，累计统计不受影响"""
+        history = ExecutionHistory(max_results=100)
+
+        for i in range(1000):
+            history.record(self._result(duration_ms=float(i)), now=0.0)
+
+        assert len(history) == 100
+        assert history.recent(1)[0].duration_ms == 999.0
+        assert history.totals["total_executions"] == 1000
+
+    def test_window_rolls_over_minute_buckets(self):
+        """窗口外的分钟桶移出后，窗口统计只包含窗口内的执行"""
+        history = ExecutionHistory(window_minutes=60)
+
+        history.record(self._result(triggered=True, duration_ms=100.0), now=0.0)
+        history.record(self._result(failed=True, duration_ms=50.0), now=30 * 60)
+        history.record(self._result(duration_ms=10.0), now=50 * 60)
+
+        full = history.window_summary(now=59 * 60)
+        rolled = history.window_summary(now=61 * 60)
+
+        assert full["total_executions"] == 3
+        assert full["triggered_executions"] == 1
+        assert rolled["total_executions"] == 2
+        assert rolled["triggered_executions"] == 0
+        assert rolled["average_duration_ms"] == pytest.approx(30.0)
+        assert rolled["success_rate"] == pytest.approx(0.5)
+        assert history.window_summary(now=200 * 60)["total_executions"] == 0
+
+    @pytest.mark.asyncio
+    async def test_engine_statistics_from_history(self, make_engine):
+        """引擎统计来自增量维护的执行历史"""
+        prometheus = FakePrometheusService(values={"cpu": {"value": 90.0}})
+        engine = make_engine(prometheus)
+        await engine.create_rule(_rule("cpu-high", ["cpu"], threshold=80))
+        await engine.create_rule(_rule("cpu-low", ["cpu"], threshold=95))
+
+        await engine.execute_rules()
+        stats = await engine.get_execution_statistics()
+
+        assert stats["execution_stats"]["total_executions"] == 2
+        assert stats["execution_stats"]["triggered_rules"] == 1
+        assert stats["recent_24h"]["total_executions"] == 2
+        assert stats["recent_24h"]["success_rate"] == 1.0
+
+
+class TestAlertGeneration:
+    """规则触发生成告警测试"""
+
+    @pytest.mark.asyncio
+    async def test_triggered_rules_persist_alerts_and_notify(self, session_factory, make_engine, wait_for):
+        """触发的规则写入告警表和待投递通知，未触发的规则不生成告警"""
+        prometheus = FakePrometheusService(values={"cpu": {"value": 90.0}})
+        engine = make_engine(prometheus)
+        await engine.create_rule(_rule("cpu-high", ["cpu"], threshold=80))
+        await engine.create_rule(_rule("cpu-critical", ["cpu"], threshold=95))
+
+        response = await engine.execute_rules()
+        await engine.alert_pipeline.stop()
+        outbox = engine.alert_pipeline.outbox
+        delivered = await wait_for(lambda: outbox.stats["delivered"] == 1)
+        await outbox.stop()
+
+        async with session_factory() as session:
+            alerts = (await session.scalars(select(Alert))).all()
+            notification = await session.scalar(select(Notification))
+
+        assert response.alerts_sent == 1
+        assert [alert.title for alert in alerts] == ["cpu-high"]
+        assert alerts[0].rule_id is not None
+        assert notification.alert_id == alerts[0].id
+        assert delivered
+        assert outbox.notification_service.sent[0]["metadata"]["alert_id"] == alerts[0].id
+
+    @pytest.mark.asyncio
+    async def test_per_series_rule_alerts_each_offending_series(self, session_factory, make_engine):
+        """逐序列规则的每条违规序列生成一条告警，并在少量批次中写入"""
+        fleet = [({"instance": f"node-{i}"}, 95.0 if i % 2 else 40.0) for i in range(2000)]
+        engine = make_engine(FakePrometheusService(values={"disk_usage": {"series": fleet}}))
+        await engine.create_rule(InspectionRuleCreate(
+            name="disk-full",
+            conditions=[RuleCondition(
+                metric_query="disk_usage", operator=RuleOperator.GREATER_THAN, threshold=90, per_series=True
+            )],
+            severity=AlertSeverity.CRITICAL
+        ))
+
+        response = await engine.execute_rules()
+        await engine.alert_pipeline.stop()
+        await engine.alert_pipeline.outbox.stop()
+        stats = engine.alert_pipeline.get_stats()
+
+        async with session_factory() as session:
+            count = await session.scalar(select(func.count(Alert.id)))
+            sample = await session.scalar(select(Alert).where(Alert.id == 1))
+
+        assert response.alerts_sent == 1000
+        assert count == 1000
+        assert stats["batches"] == 2
+        assert sample.metric_data["labels"]["instance"] == "node-1"
+
+
+class TestAlertPipeline:
+    """告警管道测试"""
+
+    @staticmethod
+    def _event(index):
+        return AlertEvent(
+            rule_id=1,
+            title=f"alert-{index}",
+            message="",
+            severity=AlertSeverity.HIGH,
+            triggered_at=datetime.now(),
+            channels=[NotificationChannel.EMAIL]
+        )
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_without_blocking(self, session_factory, make_outbox):
+        """队列满时丢弃告警并计数，提交不会阻塞"""
+        pipeline = AlertPipeline(
+            session_factory=session_factory,
+            outbox=make_outbox(),
+            max_queue_size=10
+        )
+
+        accepted = [pipeline.submit(self._event(i)) for i in range(15)]
+        await pipeline.stop()
+        await pipeline.outbox.stop()
+
+        assert accepted.count(False) == 5
+        assert pipeline.stats["dropped"] == 5
+        assert pipeline.stats["written"] == 10
+        assert pipeline.stats["notifications_queued"] == 10
+
+    @pytest.mark.asyncio
+    async def test_write_failure_is_counted(self, make_outbox):
+        """写入失败的批次记为失败且不生成通知"""
+        broken = async_sessionmaker(create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool))
+        pipeline = AlertPipeline(
+            session_factory=broken, outbox=make_outbox(session_factory=broken), write_retries=2, write_retry_delay=0.01
+        )
+
+        pipeline.submit(self._event(0))
+        await pipeline.stop()
+
+        assert pipeline.stats["write_retries"] == 2
+        assert pipeline.stats["write_failures"] == 1
+        assert pipeline.stats["notifications_queued"] == 0
+        assert pipeline.outbox.notification_service.sent == []
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried(self, session_factory, make_outbox):
+        """一次写入失败后重试整批，告警仍然写入"""
+        calls = []
+
+        def flaky_sessions():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError("INSERT INTO alerts", {}, Exception("database is locked"))
+            return session_factory()
+
+        pipeline = AlertPipeline(
+            session_factory=flaky_sessions, outbox=make_outbox(), write_retries=2, write_retry_delay=0.01
+        )
+
+        for i in range(3):
+            pipeline.submit(self._event(i))
+        await pipeline.stop()
+
+        async with session_factory() as session:
+            written = await session.scalar(select(func.count()).select_from(Alert))
+
+        assert written == 3
+        assert pipeline.stats["write_retries"] == 1
+        assert pipeline.stats["write_failures"] == 0
+        assert pipeline.stats["written"] == 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])